@@ -1,30 +1,40 @@
 #!/usr/bin/env python3
 # encoding: utf-8
 
+import asyncio
 import json
 import time
+import threading
+import hashlib
+import codecs
 import logging
 import typing
 import urllib3
 import warnings
-from typing import Union, Final, final, Optional, ClassVar
+from typing import Union, Final, final, Optional, ClassVar, Tuple
 from collections import OrderedDict
 from urllib.parse import unquote, urlencode
 from functools import wraps
+from contextlib import closing
 
+import requests
 from bs4 import BeautifulSoup
-import lxml
+from lxml import etree
 from sqlalchemy.orm import exc as sqlalchemy_exc
 
-from config import ENABLE_MULTI_THREAD, GITHUB_TOKEN
-from database import DatabaseSession, Saved
-from common import PageCache, request_url as _request_url
+from config import GITHUB_TOKEN, GITHUB_GRAPHQL_BATCH_SIZE, HTML_PARSER_BACKEND
+from database import DatabaseSession, Saved, Validator, UpdateHistory, WriteBehindQueue
+from common import (
+    PageCache, GithubRateLimitDeferred, freeze_json, can_request_async, async_request_url, request_url as _request_url,
+    request_url_stream as _request_url_stream,
+)
+from html_parser import LxmlElement, parse_html, selector_to_soup_strainer
+from json_stream import iter_json_array
+from coordinator import LeaseLostException, get_active_coordinator
 from tgbot import send_message as _send_message
 from logger import print_and_log, record_exceptions
 
 
-del lxml
-
 # 禁用安全请求警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -47,6 +57,13 @@ _KEY_TO_PRINT: Final = {
 
 PAGE_CACHE: Final = PageCache()
 
+# 保存了当前线程中正在执行do_check方法的CheckUpdate对象
+_CHECK_CONTEXT: Final = threading.local()
+
+class NotModifiedException(Exception):
+
+    """ 条件请求返回了304 Not Modified, 或页面内容的指纹与上次检查时相同, 即页面自上次检查以来没有变化 """
+
 InfoDicKeys = typing.Literal[
     "LATEST_VERSION", "BUILD_TYPE", "BUILD_VERSION", "BUILD_DATE", "BUILD_CHANGELOG",
     "FILE_MD5", "FILE_SHA1", "FILE_SHA256", "DOWNLOAD_LINK", "FILE_SIZE",
@@ -55,10 +72,39 @@ InfoDicKeys = typing.Literal[
 class CheckUpdate:
     fullname: str
     enable_pagecache: ClassVar[bool] = False
+    pagecache_ttl: ClassVar[Optional[int]] = None
+    enable_conditional_get: ClassVar[bool] = True
+    enable_fingerprint: ClassVar[bool] = True
+    # get_bs默认只保留与该css选择器匹配的区域, 为None时解析整个页面
+    parse_only: ClassVar[Optional[str]] = None
+    # get_bs默认使用的html解析后端("bs4"或"lxml"), 为None时使用config.HTML_PARSER_BACKEND
+    html_parser_backend: ClassVar[Optional[str]] = None
     tags: typing.Sequence[str] = tuple()
+    # 该检查项目主要请求的主机, 多线程模式下将据此交错安排请求不同主机的检查项目
+    request_host: ClassVar[Optional[str]] = None
+    # 调度模式下该项目的检查间隔(单位: 秒), 为None时使用config.LOOP_CHECK_INTERVAL
+    check_interval: ClassVar[Optional[int]] = None
+    # 多进程模式下是否允许在子进程中执行do_check方法
+    # 依赖主进程中共享数据(比如每轮检查预先获取的数据)的项目应设置为False
+    enable_subprocess: ClassVar[bool] = True
     _skip: ClassVar[bool] = False
 
-    def __init__(self):
+    # asyncio模式下每个项目可以预先请求的页面, 由上一次检查时的do_check方法记录
+    # 键为类名, 值为{<验证器的键>: (<url>, <url参数>)}
+    _prefetch_plans: Final[dict] = {}
+    _prefetch_plans_lock: Final = threading.RLock()
+
+    # 不在进程之间传递的实例属性: 装饰后的方法, 以及由各个进程自行从数据库中读取的数据
+    __UNPICKLABLE_ATTRS: Final = frozenset({
+        "do_check", "after_check", "write_to_database", "get_print_text", "send_message", "save_validators",
+        "is_updated", "_CheckUpdate__prev_saved_info", "_CheckUpdate__prev_validators",
+    })
+
+    def __init__(self, saved_snapshot: Optional[typing.Mapping[str, Saved]] = None):
+        """
+        :param saved_snapshot: 由Saved.get_saved_snapshot方法返回的数据库快照,
+                               不为None时直接从中读取已保存的信息, 而不是单独查询数据库
+        """
         self._abort_if_missing_property("fullname")
         self.__info_dic = OrderedDict([
             ("LATEST_VERSION", None),
@@ -75,10 +121,22 @@ class CheckUpdate:
         self._private_dic = {}
         self.__is_checked = False
         self.__is_updated = None
-        try:
-            self.__prev_saved_info = Saved.get_saved_info(self.name)
-        except sqlalchemy_exc.NoResultFound:
-            self.__prev_saved_info = None
+        self.__pending_validators = {}
+        self.__prev_validators = None
+        # 本次检查中请求过的url, 以及其中内容与上次检查时相同(或返回了304)的url
+        self.__fetched_keys = set()
+        self.__unchanged_keys = set()
+        self.__is_not_modified = False
+        # 本次检查中可以在下次检查时预先请求的页面, 以及asyncio模式下预先请求得到的响应, 键均为验证器的键
+        self.__prefetchable_requests = {}
+        self.__prefetched_responses = {}
+        if saved_snapshot is not None:
+            self.__prev_saved_info = saved_snapshot.get(self.name)
+        else:
+            try:
+                self.__prev_saved_info = Saved.get_saved_info(self.name)
+            except sqlalchemy_exc.NoResultFound:
+                self.__prev_saved_info = None
         # 在初始化实例时装饰这些方法
         # 使得实例执行self.do_check方法之后自动将self.__is_checked赋值为True
         # 并且在self.__is_checked不为True时不允许执行某些方法
@@ -87,12 +145,21 @@ class CheckUpdate:
         self.write_to_database = self.__hook_is_checked(self.write_to_database)
         self.get_print_text = self.__hook_is_checked(self.get_print_text)
         self.send_message = self.__hook_is_checked(self.send_message)
+        self.save_validators = self.__hook_is_checked(self.save_validators)
         self.is_updated = self.__hook_is_updated(self.__hook_is_checked(self.is_updated))
 
     def __hook_do_check(self, method: typing.Callable) -> typing.Callable:
         @wraps(method)
         def hook(*args, **kwargs):
-            method(*args, **kwargs)
+            _CHECK_CONTEXT.check_obj = self
+            try:
+                method(*args, **kwargs)
+            except NotModifiedException:
+                # 页面自上次检查以来没有变化, 直接判定为没有更新
+                self.__is_not_modified = True
+                self.__is_updated = False
+            finally:
+                _CHECK_CONTEXT.check_obj = None
             # 如果上一行语句抛出了异常, 将不会执行下面这行语句
             self.__is_checked = True
             # 必须返回 None
@@ -121,10 +188,31 @@ class CheckUpdate:
     def info_dic(self) -> OrderedDict:
         return self.__info_dic.copy()
 
+    @property
+    def is_not_modified(self) -> bool:
+        """ 执行do_check方法时, 是否因为请求的所有页面都没有变化而提前结束 """
+        return self.__is_not_modified
+
     @property
     def prev_saved_info(self) -> Union[Saved, None]:
         return self.__prev_saved_info
 
+    @final
+    def dump_check_state(self) -> dict:
+        """
+        返回执行do_check方法之后的实例状态, 用于多进程模式
+        子进程执行do_check方法之后调用此方法, 将结果(必须可以被pickle)传回主进程,
+        再由主进程的load_check_state方法恢复, 之后的after_check, write_to_database, send_message等方法均在主进程中执行
+        :return: 实例状态字典
+        """
+        assert self.__is_checked, "Please execute the 'do_check' method first."
+        return {k: v for k, v in self.__dict__.items() if k not in self.__UNPICKLABLE_ATTRS}
+
+    @final
+    def load_check_state(self, state: dict):
+        """ 恢复由dump_check_state方法返回的实例状态, 之后该实例视为已经执行过do_check方法 """
+        self.__dict__.update({k: v for k, v in state.items() if k not in self.__UNPICKLABLE_ATTRS})
+
     def _abort_if_missing_property(self, *props: str):
         if None in (getattr(self, key, None) for key in props):
             raise Exception(
@@ -160,44 +248,372 @@ class CheckUpdate:
             method: typing.Literal["get", "post"] = "get",
             raise_for_status: bool = True,
             encoding: Optional[str] = None,
+            parser: Optional[Tuple[typing.Hashable, typing.Callable[[str], typing.Any]]] = None,
             **kwargs
-    ) -> str:
+    ) -> typing.Any:
         """ 使用requests库请求url并返回解码后的响应text
         timeout, proxies这两个参数有默认值, 也可以根据需要自定义这些参数
         该方法支持使用页面缓存(PageCache)
+        在do_check方法中调用时, 会与上次检查时保存的验证器进行比较,
+        只有在本次检查请求的所有url(以及上次检查时请求过的所有url)都没有变化时, 才会抛出NotModifiedException异常,
+        参见_get_conditional_headers和_mark_unchanged方法
         :param url: 要请求的url
         :param method: 请求方法, 可选: "get"(默认)或"post"
         :param raise_for_status: 为True时, 如果请求返回的状态码是4xx或5xx则抛出异常
         :param encoding: 文本编码, 默认由requests自动识别
+        :param parser: (<解析方式>, <解析函数>), 如果不为None, 则返回使用解析函数解析后的结果,
+                       对于enable_pagecache属性为True的CheckUpdate对象, 解析结果将与页面缓存一同保存,
+                       一般不需要直接使用, 请使用request_url_json和request_url_bs方法
         :param kwargs: 其他需要传递给requests的参数
-        :return: 响应的text(解码后)
+        :return: 响应的text(解码后), 或解析结果
         """
 
+        # 只有没有自定义请求头等参数的get请求才能预先请求
+        is_prefetchable = method == "get" and kwargs.keys() <= {"params"}
+        # 在读取页面缓存之前记录, 以免读取页面缓存的url被误认为没有变化
+        check_obj, validator_key = cls.__get_validating_check_obj(url, method, kwargs)
+        if check_obj is None:
+            is_prefetchable = False
+        if is_prefetchable:
+            check_obj._add_prefetchable_request(validator_key, url, kwargs.get("params"))
+
         def _request_url_text():
-            params = kwargs.get("params")
-            if cls.enable_pagecache and method == "get":
-                saved_page_cache = PAGE_CACHE.read(url, params)
-                if saved_page_cache is not None:
-                    return saved_page_cache
-            req = _request_url(url, method=method, raise_for_status=raise_for_status, **kwargs)
+            req = check_obj._pop_prefetched_response(validator_key) if is_prefetchable else None
+            if req is not None and req.status_code == 304:
+                # 预先请求时总是发送条件请求, 只有其他url也都没有变化时才能据此提前结束检查, 否则需要重新请求完整的内容
+                if check_obj._mark_unchanged(validator_key):
+                    raise NotModifiedException(url)
+                req = None
+            if req is None:
+                req = _request_url(url, method=method, raise_for_status=raise_for_status, **kwargs)
+            if req.status_code == 304:
+                # 只有在其他url都已确认没有变化时才会发送条件请求, 参见_get_conditional_headers方法
+                raise NotModifiedException(url)
+            if check_obj is not None:
+                fingerprint = hashlib.blake2b(req.content, digest_size=16).hexdigest()
+                check_obj._set_pending_validator(
+                    validator_key, req.headers.get("ETag"), req.headers.get("Last-Modified"), fingerprint
+                )
+                if check_obj._is_content_unchanged(validator_key, fingerprint):
+                    if check_obj._mark_unchanged(validator_key):
+                        # 所有页面的内容都与上次检查时完全相同, 无需再进行解析
+                        raise NotModifiedException(url)
             if encoding is not None:
                 req.encoding = encoding
-            req_text = req.text
-            if cls.enable_pagecache:
-                PAGE_CACHE.save(url, params, req_text)
-            return req_text
-
-        # 在多线程模式下, 同时只允许一个enable_pagecache属性为True的CheckUpdate对象进行请求
-        # 在其他线程上的enable_pagecache属性为True的CheckUpdate对象必须等待
-        # 这样才能避免重复请求, 同时避免了PAGE_CACHE的读写冲突
-        if cls.enable_pagecache and ENABLE_MULTI_THREAD:
-            with PAGE_CACHE.threading_lock:
-                return _request_url_text()
+            return req.text
+
+        # 对于enable_pagecache属性为True的CheckUpdate对象, 同一个url同时只允许一个线程进行请求
+        # 其他线程上请求同一个url的CheckUpdate对象将等待请求完成并直接读取页面缓存
+        # 这样既能避免重复请求, 也不会阻塞其他url的请求
+        if cls.enable_pagecache and method == "get":
+            if parser is not None:
+                kind, parse_func = parser
+                return PAGE_CACHE.read_or_fetch_parsed(
+                    url, kwargs.get("params"), kind, _request_url_text, parse_func, ttl=cls.pagecache_ttl
+                )
+            return PAGE_CACHE.read_or_fetch(url, kwargs.get("params"), _request_url_text, ttl=cls.pagecache_ttl)
+        if parser is not None:
+            return parser[1](_request_url_text())
         return _request_url_text()
 
     # 向后兼容
     request_url = request_url_text
 
+    @classmethod
+    def __get_validating_check_obj(cls, url: str, method: str, kwargs: dict) -> Tuple[Optional["CheckUpdate"], str]:
+        """
+        如果当前线程正在执行本类实例的do_check方法, 并且该实例启用了条件请求或指纹比较, 则返回该实例,
+        同时记录该实例请求了这个url, 并将条件请求所需的请求头添加到kwargs中
+        :return: (<CheckUpdate对象或None>, <验证器的键>)
+        """
+        params = kwargs.get("params")
+        validator_key = url if not params else "%s?%s" % (url, urlencode(sorted(params.items())))
+        check_obj = getattr(_CHECK_CONTEXT, "check_obj", None)
+        if method != "get" or not isinstance(check_obj, cls):
+            return None, validator_key
+        if not (check_obj.enable_conditional_get or check_obj.enable_fingerprint):
+            return None, validator_key
+        check_obj._add_fetched_key(validator_key)
+        kwargs["headers"] = {
+            **(kwargs.get("headers") or {}), **check_obj._get_conditional_headers(validator_key)
+        }
+        return check_obj, validator_key
+
+    @classmethod
+    @final
+    def iter_url_content(cls, url: str, *, chunk_size: int = 64 * 1024, **kwargs) -> typing.Iterator[bytes]:
+        """
+        流式请求url, 边下载边逐块返回响应内容(bytes), 不会在内存中保存完整的响应
+        停止迭代或关闭生成器时, 将立即关闭连接, 不再下载剩下的内容
+        与request_url_text方法相同, 在do_check方法中调用时会与上次检查时保存的验证器进行比较,
+        但页面内容的指纹在读取完整个响应之后才能确定, 因此此时内容已经解析完毕, 只是不再进行后续的处理
+        不会使用页面缓存
+        :param url: 要请求的url
+        :param chunk_size: 每次读取的字节数
+        :param kwargs: 其他需要传递给requests的参数
+        :return: 响应内容的迭代器
+        """
+        check_obj, validator_key = cls.__get_validating_check_obj(url, "get", kwargs)
+        with _request_url_stream(url, **kwargs) as req:
+            if req.status_code == 304:
+                raise NotModifiedException(url)
+            hasher = hashlib.blake2b(digest_size=16)
+            for chunk in req.iter_content(chunk_size):
+                hasher.update(chunk)
+                yield chunk
+            if check_obj is not None:
+                fingerprint = hasher.hexdigest()
+                check_obj._set_pending_validator(
+                    validator_key, req.headers.get("ETag"), req.headers.get("Last-Modified"), fingerprint
+                )
+                if check_obj._is_content_unchanged(validator_key, fingerprint):
+                    if check_obj._mark_unchanged(validator_key):
+                        raise NotModifiedException(url)
+
+    @classmethod
+    @final
+    def iter_json_items(
+            cls,
+            url: str,
+            path: typing.Sequence[str] = (),
+            *,
+            encoding: Optional[str] = None,
+            chunk_size: int = 64 * 1024,
+            **kwargs
+    ) -> typing.Iterator[typing.Any]:
+        """
+        流式请求并解析json, 边下载边解析, 逐个返回path所指向的数组中的元素
+        停止迭代(比如找到所需的元素之后break)或关闭生成器时, 将立即关闭连接, 不再下载剩下的内容
+        与request_url_text方法相同, 在do_check方法中调用时可能会发送条件请求, 服务器返回304时抛出NotModifiedException异常,
+        但由于不一定会读取完整的响应, 因此不会计算页面内容的指纹, 也不会使用页面缓存
+        :param url: 要请求的url
+        :param path: 从根对象到目标数组所经过的键, 默认为空(即根元素就是数组), 比如("os_list", )
+        :param encoding: 文本编码, 默认由requests自动识别, 无法识别时为utf-8
+        :param chunk_size: 每次读取的字节数
+        :param kwargs: 其他需要传递给requests的参数
+        :return: 数组元素的迭代器
+        """
+        check_obj, validator_key = cls.__get_validating_check_obj(url, "get", kwargs)
+        with _request_url_stream(url, **kwargs) as req:
+            if req.status_code == 304:
+                raise NotModifiedException(url)
+            if check_obj is not None:
+                check_obj._set_pending_validator(
+                    validator_key, req.headers.get("ETag"), req.headers.get("Last-Modified"), None
+                )
+            decoder = codecs.getincrementaldecoder(encoding or req.encoding or "utf-8")(errors="replace")
+            yield from iter_json_array(
+                (decoder.decode(chunk) for chunk in req.iter_content(chunk_size)), path
+            )
+
+    @classmethod
+    @final
+    def find_json_item(
+            cls,
+            url: str,
+            predicate: typing.Callable[[typing.Any], bool],
+            path: typing.Sequence[str] = (),
+            **kwargs
+    ) -> typing.Any:
+        """
+        流式请求并解析json, 返回path所指向的数组中第一个满足predicate的元素, 找到之后立即关闭连接
+        :param url: 要请求的url
+        :param predicate: 判断元素是否满足条件的函数
+        :param path: 参见iter_json_items方法
+        :param kwargs: 需要传递给iter_json_items方法的参数
+        :return: 满足条件的元素, 找不到时返回None
+        """
+        with closing(cls.iter_json_items(url, path, **kwargs)) as items:
+            for item in items:
+                if predicate(item):
+                    return item
+        return None
+
+    @classmethod
+    @final
+    def request_url_json(cls, url: str, **kwargs) -> typing.Any:
+        """
+        请求url并使用json库解析响应text, 返回只读的FrozenDict或FrozenList(需要修改时请先复制)
+        对于enable_pagecache属性为True的CheckUpdate对象, 解析结果将与页面缓存一同保存,
+        请求同一个url的其他检查项目将直接获得同一个解析结果, 无需重复解析
+        :param url: 要请求的url
+        :param kwargs: 需要传递给self.request_url_text方法的参数
+        :return: 解析结果
+        """
+        return cls.request_url_text(url, parser=("json", lambda text: freeze_json(json.loads(text))), **kwargs)
+
+    @classmethod
+    @final
+    def request_url_bs(cls, url: str, **kwargs) -> Union[BeautifulSoup, LxmlElement]:
+        """
+        请求url并使用get_bs方法解析响应text
+        对于enable_pagecache属性为True的CheckUpdate对象, lxml后端的解析结果(只读)将与页面缓存一同保存,
+        请求同一个url的其他检查项目将直接获得同一个解析结果, 无需重复解析
+        BeautifulSoup对象是可修改的, 因此不会被缓存
+        :param url: 要请求的url
+        :param kwargs: 需要传递给self.request_url_text方法的参数, 另外可以传递parse_only参数, 参见get_bs方法
+        :return: LxmlElement对象或BeautifulSoup对象
+        """
+        parse_only = kwargs.pop("parse_only", cls.parse_only)
+        if (cls.html_parser_backend or HTML_PARSER_BACKEND) == "lxml":
+            return cls.request_url_text(
+                url, parser=(("lxml", parse_only), lambda text: parse_html(text, parse_only=parse_only)), **kwargs
+            )
+        return cls.get_bs(cls.request_url_text(url, **kwargs), parse_only=parse_only)
+
+    def __get_prev_validators(self) -> dict[str, Validator]:
+        """ 返回上次检查时保存的所有验证器, 键为包含url参数的url, 数据库中没有已保存的数据时返回空字典 """
+        if self.__prev_validators is None:
+            if self.__prev_saved_info is None:
+                self.__prev_validators = {}
+            else:
+                self.__prev_validators = Validator.get_validators(self.name)
+        return self.__prev_validators
+
+    def __get_prev_validator(self, validator_key: str) -> Union[Validator, None]:
+        """ 返回上次检查时保存的验证器, 数据库中没有已保存的数据时返回None """
+        return self.__get_prev_validators().get(validator_key)
+
+    def __is_all_unchanged(self, validator_key: str) -> bool:
+        """ 假如validator_key没有变化, 上次检查时和本次检查中请求过的所有url是否都没有变化 """
+        keys = self.__get_prev_validators().keys() | self.__fetched_keys
+        return keys - self.__unchanged_keys <= {validator_key}
+
+    def _add_fetched_key(self, validator_key: str):
+        self.__fetched_keys.add(validator_key)
+
+    def _add_prefetchable_request(self, validator_key: str, url: str, params: Optional[dict]):
+        self.__prefetchable_requests[validator_key] = (url, tuple(params.items()) if params else None)
+
+    def _pop_prefetched_response(self, validator_key: str) -> Optional[requests.models.Response]:
+        """ 返回并移除预先请求得到的响应, 没有预先请求该页面时返回None """
+        return self.__prefetched_responses.pop(validator_key, None)
+
+    @final
+    def set_prefetched_responses(self, responses: typing.Mapping[str, requests.models.Response]):
+        """ 在执行do_check方法之前设置由prefetch_async方法预先请求得到的响应 """
+        self.__prefetched_responses = {}
+        for validator_key, req in responses.items():
+            if req.status_code == 304:
+                # 与_get_conditional_headers方法一致, 没有已保存的验证器时不能相信304
+                if not self.enable_conditional_get or self.__get_prev_validator(validator_key) is None:
+                    continue
+                # 这些页面已经确认没有变化, 请求其他页面时即可据此判断是否所有页面都没有变化
+                self.__unchanged_keys.add(validator_key)
+            self.__prefetched_responses[validator_key] = req
+
+    @final
+    def update_prefetch_plan(self):
+        """ 顺利完成检查之后, 记录下次检查时可以预先请求的页面 """
+        with self._prefetch_plans_lock:
+            plan = self.__prefetchable_requests
+            if self.__is_not_modified:
+                # 提前结束检查时没有请求剩下的页面, 它们仍然需要预先请求
+                plan = {**self._prefetch_plans.get(self.name, {}), **plan}
+            self._prefetch_plans[self.name] = plan
+
+    @classmethod
+    @final
+    async def prefetch_async(cls, session) -> dict:
+        """
+        asyncio模式下使用aiohttp并发地预先请求该项目上次检查时通过request_url_text方法请求过的页面
+        (只包括没有自定义请求头等参数的get请求), 之后执行do_check方法时, request_url_text方法将直接使用这些响应
+        有已保存的验证器时总是发送条件请求, 只保留状态码为200或304的响应, 请求失败的页面留给do_check方法重新请求
+        :param session: 由common.new_async_session函数创建的aiohttp.ClientSession对象
+        :return: {<验证器的键>: <requests.models.Response对象>}, 需要传递给set_prefetched_responses方法
+        """
+        with cls._prefetch_plans_lock:
+            plan = {
+                key: request for key, request in cls._prefetch_plans.get(cls.__name__, {}).items()
+                if can_request_async(request[0])
+            }
+        if not plan:
+            return {}
+        validators = {}
+        if cls.enable_conditional_get:
+            validators = await asyncio.to_thread(Validator.get_validators, cls.__name__)
+
+        async def _prefetch(validator_key: str, url: str, params: Optional[tuple]):
+            headers = {}
+            if (validator := validators.get(validator_key)) is not None:
+                if validator.ETAG:
+                    headers["If-None-Match"] = validator.ETAG
+                if validator.LAST_MODIFIED:
+                    headers["If-Modified-Since"] = validator.LAST_MODIFIED
+            try:
+                req = await async_request_url(session, url, params=params, headers=headers)
+            except Exception:
+                return validator_key, None
+            return validator_key, req if req.status_code in (200, 304) else None
+
+        results = await asyncio.gather(*(_prefetch(key, *request) for key, request in plan.items()))
+        return {key: req for key, req in results if req is not None}
+
+    def _mark_unchanged(self, validator_key: str) -> bool:
+        """
+        记录该url的内容与上次检查时相同
+        :return: 上次检查时和本次检查中请求过的所有url是否都已确认没有变化, 为True时可以提前结束检查
+        """
+        self.__unchanged_keys.add(validator_key)
+        return self.__is_all_unchanged(validator_key)
+
+    def _get_conditional_headers(self, validator_key: str) -> dict:
+        """ 返回条件请求所需的请求头, 强制更新或数据库中没有已保存的数据时返回空字典
+        服务器返回304时没有响应内容, 无法继续解析, 因此只有在其他url都已确认没有变化时才发送条件请求,
+        此时返回304即可判定整个检查项目没有变化
+        """
+        if not self.enable_conditional_get:
+            return {}
+        if (validator := self.__get_prev_validator(validator_key)) is None:
+            return {}
+        if not self.__is_all_unchanged(validator_key):
+            return {}
+        headers = {}
+        if validator.ETAG:
+            headers["If-None-Match"] = validator.ETAG
+        if validator.LAST_MODIFIED:
+            headers["If-Modified-Since"] = validator.LAST_MODIFIED
+        return headers
+
+    def _is_content_unchanged(self, validator_key: str, fingerprint: Optional[str]) -> bool:
+        """ 页面内容的指纹是否与上次检查时的相同 """
+        if not self.enable_fingerprint or fingerprint is None:
+            return False
+        if (validator := self.__get_prev_validator(validator_key)) is None:
+            return False
+        return validator.FINGERPRINT == fingerprint
+
+    def _set_pending_validator(
+            self,
+            validator_key: str,
+            etag: Optional[str],
+            last_modified: Optional[str],
+            fingerprint: Optional[str],
+    ):
+        if not self.enable_conditional_get:
+            etag = last_modified = None
+        if not self.enable_fingerprint:
+            fingerprint = None
+        self.__pending_validators[validator_key] = (etag, last_modified, fingerprint)
+
+    @final
+    def save_validators(self, write_queue: Optional[WriteBehindQueue] = None):
+        """ 保存本次检查中得到的验证器
+        只有在检查结果已经写入数据库(或确认没有更新)之后才能调用此方法,
+        否则下次检查时可能会因为304或指纹相同而错过本次的更新
+        本次检查中请求过但没有得到验证器的url(比如读取了页面缓存)也会被记录, 下次检查时它们不会被视为没有变化
+        :param write_queue: 不为None时放入延迟写入队列, 与检查结果在同一个事务中写入
+        """
+        validators = {key: (None, None, None) for key in self.__fetched_keys}
+        validators.update(self.__pending_validators)
+        if write_queue is not None:
+            coordinator = get_active_coordinator()
+            write_queue.put_validators(
+                self.name, validators, lease_owner=coordinator.node_id if coordinator is not None else None
+            )
+        else:
+            Validator.save_validators(self.name, validators)
+
     @classmethod
     @final
     def get_hash_from_file(cls, url: str, **kwargs) -> str:
@@ -209,17 +625,30 @@ class CheckUpdate:
         """
         return cls.request_url_text(url, **kwargs).strip().split()[0]
 
-    @staticmethod
+    @classmethod
     @final
-    def get_bs(url_text: str, **kwargs) -> BeautifulSoup:
+    def get_bs(cls, url_text: str, **kwargs) -> Union[BeautifulSoup, LxmlElement]:
         """
-        对BeautifulSoup函数进行了简单的包装, 默认解析器为lxml
+        解析html, 默认使用cls.html_parser_backend或config.HTML_PARSER_BACKEND指定的后端
+        "bs4": 对BeautifulSoup函数进行了简单的包装, 默认解析器为lxml
+        "lxml": 使用lxml.html直接构建文档树(需要安装cssselect, 否则抛出ImportError异常), 比BeautifulSoup快得多
+                返回的LxmlDocument对象兼容BeautifulSoup的select, select_one, find, get_text, get, []等常用接口
+        如果传递了其他需要传递给BeautifulSoup的参数(比如features="xml"), 则总是使用BeautifulSoup
+        如果设置了parse_only(默认为cls.parse_only), 则只保留与该css选择器匹配的区域:
+        对于BeautifulSoup, 选择器将被转换为SoupStrainer, 只为这些区域构建对象, 可以减少解析耗时和内存占用,
+        但只支持单个复合选择器(参见html_parser.selector_to_soup_strainer函数), 并且区域的祖先元素不会被保留;
+        对于lxml后端, 支持任意css选择器, 并且保留区域的祖先元素, 但仍然需要先解析整个页面再进行裁剪
         :param url_text: url源码
         :param kwargs: 其他需要传递给BeautifulSoup的参数
-        :return: BeautifulSoup对象
+        :return: LxmlDocument对象或BeautifulSoup对象
         """
-        features = kwargs.pop("features", "lxml")
-        return BeautifulSoup(url_text, features=features, **kwargs)
+        backend = kwargs.pop("backend", cls.html_parser_backend or HTML_PARSER_BACKEND)
+        parse_only = kwargs.pop("parse_only", cls.parse_only)
+        if backend == "lxml" and not kwargs:
+            return parse_html(url_text, parse_only=parse_only)
+        if parse_only is not None:
+            kwargs["parse_only"] = selector_to_soup_strainer(parse_only)
+        return BeautifulSoup(url_text, features=kwargs.pop("features", "lxml"), **kwargs)
 
     @staticmethod
     @final
@@ -262,8 +691,25 @@ class CheckUpdate:
         pass
 
     @final
-    def write_to_database(self):
-        """ 将CheckUpdate实例的info_dic数据写入数据库 """
+    def write_to_database(self, write_queue: Optional[WriteBehindQueue] = None):
+        """ 将CheckUpdate实例的info_dic数据写入数据库
+        多节点模式下(协调器已经由loop_check启动), 如果本节点已经失去了该项目的租约, 则不写入并抛出LeaseLostException异常
+        :param write_queue: 不为None时放入延迟写入队列, 而不是立即写入
+        """
+        if (coordinator := get_active_coordinator()) is not None and not coordinator.holds(self.name):
+            raise LeaseLostException("Lease of %s is not held by node %s" % (self.name, coordinator.node_id))
+        if write_queue is not None:
+            # 与prev_saved_info比较即可, 在一轮检查中每个项目最多写入一次
+            is_changed = self.__prev_saved_info is not None and any(
+                getattr(self.__prev_saved_info, key) != value for key, value in self.__info_dic.items()
+            )
+            write_queue.put_saved(
+                {"ID": self.name, "FULL_NAME": self.fullname, **self.__info_dic},
+                update_time=time.time() if is_changed else None,
+                # 放入队列之后租约仍可能过期, 因此由write_queue在提交数据的事务中再次确认
+                lease_owner=coordinator.node_id if coordinator is not None else None,
+            )
+            return
         with DatabaseSession() as session:
             if (saved_data := session.query(Saved).filter_by(ID=self.name).one_or_none()) is None:
                 new_data = Saved(
@@ -274,8 +720,14 @@ class CheckUpdate:
                 session.add(new_data)
             else:
                 saved_data.FULL_NAME = self.fullname
+                is_changed = False
                 for key, value in self.__info_dic.items():
-                    setattr(saved_data, key, value)
+                    if getattr(saved_data, key) != value:
+                        is_changed = True
+                        setattr(saved_data, key, value)
+                if is_changed:
+                    # 记录更新发生的时间, 用于调度模式下自适应地调整检查间隔
+                    session.add(UpdateHistory(ID=self.name, UPDATE_TIME=time.time()))
             session.commit()
 
     @classmethod
@@ -376,7 +828,7 @@ class CheckUpdateWithBuildDate(CheckUpdate):
     该类现已弃用, 现在请直接从CheckUpdate继承, 并实现date_transform方法即可
     """
 
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         warnings.warn(
             "%s: CheckUpdateWithBuildDate is deprecated. Please inherit from CheckUpdate" % cls.__name__,
             DeprecationWarning,
@@ -435,6 +887,17 @@ class SfCheck(CheckUpdate):
     project_name: ClassVar[str]
     sub_path: ClassVar[str] = ""
     minimum_file_size_mb: ClassVar[int] = 500
+    # 请求RSS时最多返回多少个文件(SourceForge默认为100), 为None时不限制
+    rss_item_limit: ClassVar[Optional[int]] = 100
+    request_host = "sourceforge.net"
+    # 依赖主进程中共享的RSS
+    enable_subprocess = False
+
+    # 本轮检查中共享的RSS, 键为(<project_name>, <请求的路径>)
+    # 值为{"limit": <请求的数量>, "records": <解析后的记录列表>, "lock": <锁>},
+    # 请求之后还有"validator_key"和"validator", 参见__get_shared_feed方法
+    _shared_feeds: Final[dict] = {}
+    _shared_feeds_lock: Final = threading.RLock()
 
     _MONTH_TO_NUMBER: Final = {
         "Jan": "01", "Feb": "02", "Mar": "03",
@@ -443,9 +906,9 @@ class SfCheck(CheckUpdate):
         "Oct": "10", "Nov": "11", "Dec": "12",
     }
 
-    def __init__(self):
+    def __init__(self, saved_snapshot: Optional[typing.Mapping[str, Saved]] = None):
         self._abort_if_missing_property("project_name")
-        super().__init__()
+        super().__init__(saved_snapshot)
 
     @classmethod
     def date_transform(cls, date_str: str) -> time.struct_time:
@@ -460,45 +923,169 @@ class SfCheck(CheckUpdate):
         """ 文件名过滤规则 """
         return True
 
+    @staticmethod
+    def iter_rss_items(chunks: typing.Iterable[Union[bytes, str]]) -> typing.Iterator[dict]:
+        """
+        增量解析SourceForge的RSS, 逐个返回<item>的记录
+        解析完一个<item>之后立即释放其占用的内存, 因此不会在内存中构建整个文档树
+        :param chunks: RSS源码的分块, 比如iter_url_content方法返回的迭代器, 边下载边解析; 也可以是完整的RSS源码
+        :return: 记录的迭代器, 每个记录为{"guid", "pubDate", "filesize", "md5"}字典
+        """
+        media_ns = "{http://search.yahoo.com/mrss/}"
+        parser = etree.XMLPullParser(events=("end",), tag="item")
+
+        def _read_items() -> typing.Iterator[dict]:
+            for _, item in parser.read_events():
+                media_content = item.find(media_ns + "content")
+                yield {
+                    "guid": item.findtext("guid"),
+                    "pubDate": item.findtext("pubDate"),
+                    "filesize": int(media_content.get("filesize")),
+                    "md5": media_content.findtext('%shash[@algo="md5"]' % media_ns),
+                }
+                # 释放已解析完毕的<item>
+                item.clear()
+                while item.getprevious() is not None:
+                    del item.getparent()[0]
+
+        if isinstance(chunks, (bytes, str)):
+            chunks = (chunks, )
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from _read_items()
+        parser.close()
+        yield from _read_items()
+
+    @classmethod
+    def prepare_shared_feeds(cls, check_list: typing.Iterable[type]) -> int:
+        """
+        找出check_list中project_name和sub_path都相同的多个SfCheck子类, 本轮检查中它们将共享同一份RSS,
+        只请求和解析一次, 然后由各个子类按照各自的minimum_file_size_mb和filter_rule过滤
+        sub_path不同的子类不共享RSS, 因为请求公共父路径时, SourceForge最多只返回limit(默认为100)个文件,
+        较窄的子路径中的文件可能会被其他路径中更新的文件挤出RSS
+        :param check_list: 本轮要检查的CheckUpdate子类
+        :return: 共享的RSS的数量
+        """
+        feeds = {}
+        for c in check_list:
+            if isinstance(c, type) and issubclass(c, cls) and getattr(c, "project_name", None):
+                feeds.setdefault((c.project_name, "/" + c.sub_path), []).append(c)
+        with cls._shared_feeds_lock:
+            for (project_name, path), classes in feeds.items():
+                if len(classes) < 2:
+                    continue
+                limits = [c.rss_item_limit for c in classes]
+                cls._shared_feeds[(project_name, path)] = {
+                    "limit": None if None in limits else max(limits),
+                    "records": None,
+                    "lock": threading.Lock(),
+                }
+            return len(cls._shared_feeds)
+
+    @classmethod
+    def clear_shared_feeds(cls):
+        with cls._shared_feeds_lock:
+            cls._shared_feeds.clear()
+
+    def __get_feed_url(self) -> str:
+        return "https://sourceforge.net/projects/%s/rss" % self.project_name
+
+    def __iter_feed_records(self, params: dict) -> typing.Iterator[dict]:
+        """ 流式请求并解析该项目的RSS """
+        return self.iter_rss_items(self.iter_url_content(self.__get_feed_url(), params=params))
+
+    def __get_feed_path(self) -> str:
+        return "/" + self.sub_path
+
+    def __get_shared_feed(self) -> Union[dict, None]:
+        """
+        返回本轮检查中共享的RSS, 如果该项目不共享RSS则返回None
+        共享的RSS不属于任何一个项目, 因此不发送条件请求, 也不会因为某个项目的内容没有变化而提前结束,
+        由各个项目自行根据保存的指纹判断是否没有变化
+        :return: {"records": <解析后的记录列表>, "validator_key": <验证器的键>, "validator": (<ETag>, <Last-Modified>, <指纹>)}
+        """
+        with self._shared_feeds_lock:
+            shared_feed = self._shared_feeds.get((self.project_name, self.__get_feed_path()))
+        if shared_feed is None:
+            return None
+        with shared_feed["lock"]:
+            if shared_feed["records"] is None:
+                url = self.__get_feed_url()
+                params = {"path": self.__get_feed_path()}
+                if shared_feed["limit"]:
+                    params["limit"] = shared_feed["limit"]
+                hasher = hashlib.blake2b(digest_size=16)
+
+                def _iter_content(req_: requests.models.Response) -> typing.Iterator[bytes]:
+                    for chunk in req_.iter_content(64 * 1024):
+                        hasher.update(chunk)
+                        yield chunk
+
+                # 不使用iter_url_content方法, 以免受到当前正在检查的项目的验证器的影响
+                with _request_url_stream(url, params=params) as req:
+                    records = list(self.iter_rss_items(_iter_content(req)))
+                shared_feed["validator_key"] = "%s?%s" % (url, urlencode(sorted(params.items())))
+                shared_feed["validator"] = (
+                    req.headers.get("ETag"), req.headers.get("Last-Modified"), hasher.hexdigest()
+                )
+                shared_feed["records"] = records
+            return shared_feed
+
     def do_check(self):
-        url = "https://sourceforge.net/projects/%s/rss" % self.project_name
-        bs_obj = self.get_bs(
-            self.request_url_text(url, params={"path": "/"+self.sub_path}),
-            features="xml",
-        )
-        builds = list(bs_obj.select("item"))
-        if not builds:
-            print_and_log("%s: No builds found!" % self.name, level=logging.WARNING)
-            return
-        builds.sort(key=lambda x: self.date_transform(x.pubDate.get_text()), reverse=True)
-        for build in builds:
-            file_size = int(build.find("media:content")["filesize"])
+        if (shared_feed := self.__get_shared_feed()) is not None:
+            records = shared_feed["records"]
+            if self.enable_conditional_get or self.enable_fingerprint:
+                validator_key = shared_feed["validator_key"]
+                etag, last_modified, fingerprint = shared_feed["validator"]
+                self._add_fetched_key(validator_key)
+                self._set_pending_validator(validator_key, etag, last_modified, fingerprint)
+                if self._is_content_unchanged(validator_key, fingerprint) and self._mark_unchanged(validator_key):
+                    raise NotModifiedException(validator_key)
+        else:
+            params = {"path": self.__get_feed_path()}
+            if self.rss_item_limit:
+                params["limit"] = self.rss_item_limit
+            records = self.__iter_feed_records(params)
+        # 只保留到目前为止最新的符合条件的文件, 无需对所有文件进行排序
+        latest_build, latest_build_date, has_builds = None, None, False
+        for build in records:
+            has_builds = True
             # 过滤小于`minimum_file_size_mb`的文件
-            if file_size / 1000 / 1000 < self.minimum_file_size_mb:
+            if build["filesize"] / 1000 / 1000 < self.minimum_file_size_mb:
                 continue
-            file_version = build.guid.get_text().split("/")[-2]
-            if self.filter_rule(file_version):
-                self.update_info("LATEST_VERSION", file_version)
-                self.update_info("DOWNLOAD_LINK", build.guid.get_text())
-                self.update_info("BUILD_DATE", build.pubDate.get_text())
-                self.update_info("FILE_MD5", build.find("media:hash", {"algo": "md5"}).get_text())
-                self.update_info("FILE_SIZE", self.get_human_readable_file_size(file_size, decimal_system=True))
-                break
+            if not self.filter_rule(build["guid"].split("/")[-2]):
+                continue
+            build_date = self.date_transform(build["pubDate"])
+            if latest_build_date is None or build_date > latest_build_date:
+                latest_build, latest_build_date = build, build_date
+        if not has_builds:
+            print_and_log("%s: No builds found!" % self.name, level=logging.WARNING)
+            return
+        if latest_build is None:
+            return
+        self.update_info("LATEST_VERSION", latest_build["guid"].split("/")[-2])
+        self.update_info("DOWNLOAD_LINK", latest_build["guid"])
+        self.update_info("BUILD_DATE", latest_build["pubDate"])
+        self.update_info("FILE_MD5", latest_build["md5"])
+        self.update_info(
+            "FILE_SIZE", self.get_human_readable_file_size(latest_build["filesize"], decimal_system=True)
+        )
 
 class SfProjectCheck(SfCheck):
     developer: ClassVar[str]
 
-    def __init__(self):
+    def __init__(self, saved_snapshot: Optional[typing.Mapping[str, Saved]] = None):
         self._abort_if_missing_property("developer")
         self.fullname = "New rom release by %s" % self.developer
-        super().__init__()
+        super().__init__(saved_snapshot)
 
 class PlingCheck(CheckUpdate):
     p_id: ClassVar[int]
+    request_host = "www.pling.com"
 
-    def __init__(self):
+    def __init__(self, saved_snapshot: Optional[typing.Mapping[str, Saved]] = None):
         self._abort_if_missing_property("p_id")
-        super().__init__()
+        super().__init__(saved_snapshot)
         self.latest_build = {}
 
     @classmethod
@@ -513,7 +1100,7 @@ class PlingCheck(CheckUpdate):
 
     def do_check(self):
         url = "https://www.pling.com/p/%s/loadFiles" % self.p_id
-        json_dic_files = json.loads(self.request_url_text(url)).get("files")
+        json_dic_files = self.request_url_json(url).get("files")
         if not json_dic_files:
             print_and_log("%s: No files found!" % self.name, level=logging.WARNING)
             return
@@ -559,14 +1146,29 @@ class PlingCheck(CheckUpdate):
             )
         )
 
+_GITHUB_GRAPHQL_RELEASE_FIELDS: Final = """
+fragment ReleaseFields on Release {
+  name tagName url isDraft isPrerelease publishedAt
+  releaseAssets(first: 100) { nodes { name size downloadUrl } }
+}
+"""
+
 class GithubReleases(CheckUpdate):
     repository_url: ClassVar[str]
     ignore_prerelease: ClassVar[bool] = True
     auth_token: ClassVar[str] = GITHUB_TOKEN
+    request_host = "api.github.com"
+    # 依赖主进程中通过GraphQL批量获取到的Releases信息
+    enable_subprocess = False
+
+    # 通过GraphQL批量获取到的Releases信息, 键为(<repository_url>, <ignore_prerelease>)
+    # 值为与REST api格式相同的字典, 没有Releases时为None
+    _prefetched_releases: Final[dict] = {}
+    _prefetched_releases_lock: Final = threading.RLock()
 
-    def __init__(self):
+    def __init__(self, saved_snapshot: Optional[typing.Mapping[str, Saved]] = None):
         self._abort_if_missing_property("repository_url")
-        super().__init__()
+        super().__init__(saved_snapshot)
         self.response_json_dic = {}
 
     @classmethod
@@ -574,13 +1176,106 @@ class GithubReleases(CheckUpdate):
         # 例: "2022-02-02T08:21:26Z"
         return time.strptime(date_str, "%Y-%m-%dT%H:%M:%SZ")
 
+    @staticmethod
+    def _graphql_release_to_rest(release: Union[dict, None]) -> Union[dict, None]:
+        """ 将GraphQL api返回的Release转换为与REST api格式相同的字典 """
+        if release is None:
+            return None
+        return {
+            "name": release["name"],
+            "tag_name": release["tagName"],
+            "html_url": release["url"],
+            "draft": release["isDraft"],
+            "prerelease": release["isPrerelease"],
+            "published_at": release["publishedAt"],
+            "assets": [
+                {"name": asset["name"], "size": asset["size"], "browser_download_url": asset["downloadUrl"]}
+                for asset in release["releaseAssets"]["nodes"]
+            ],
+        }
+
+    @classmethod
+    def prefetch_releases(cls, check_list: typing.Iterable[type]) -> int:
+        """
+        使用一个(或分块的几个)带别名的GraphQL查询, 批量获取check_list中所有GithubReleases子类的最新Release
+        获取到的结果将在do_check方法中直接使用, 不再单独请求REST api
+        GraphQL api需要认证, 因此没有配置token时什么也不做, 所有子类仍然使用REST api
+        :param check_list: 本轮要检查的CheckUpdate子类
+        :return: 成功获取到的仓库数量
+        """
+        if not cls.auth_token:
+            return 0
+        keys = sorted({
+            (c.repository_url, c.ignore_prerelease)
+            for c in check_list
+            if isinstance(c, type) and issubclass(c, cls) and getattr(c, "repository_url", None)
+            and c.auth_token == cls.auth_token
+        })
+        prefetched_count = 0
+        for i in range(0, len(keys), GITHUB_GRAPHQL_BATCH_SIZE):
+            chunk = keys[i:i+GITHUB_GRAPHQL_BATCH_SIZE]
+            query_lines = []
+            for j, (repository_url, ignore_prerelease) in enumerate(chunk):
+                owner, name = repository_url.split("/", 1)
+                if ignore_prerelease:
+                    release_query = "latestRelease { ...ReleaseFields }"
+                else:
+                    release_query = (
+                        "releases(first: 1, orderBy: {field: CREATED_AT, direction: DESC}) "
+                        "{ nodes { ...ReleaseFields } }"
+                    )
+                query_lines.append(
+                    "r%d: repository(owner: %s, name: %s) { %s }" % (j, json.dumps(owner), json.dumps(name), release_query)
+                )
+            query = "query {\n%s\n}\n%s" % ("\n".join(query_lines), _GITHUB_GRAPHQL_RELEASE_FIELDS)
+            try:
+                response_json = _request_url(
+                    "https://api.github.com/graphql",
+                    method="post",
+                    json={"query": query},
+                    headers={"Authorization": "Bearer " + cls.auth_token},
+                ).json()
+            except GithubRateLimitDeferred as exc:
+                print_and_log("GithubReleases: Prefetch deferred! %s." % exc, level=logging.WARNING)
+                break
+            except Exception:
+                record_exceptions("GithubReleases: Failed to prefetch releases via GraphQL, fall back to REST api.")
+                continue
+            data = response_json.get("data") or {}
+            with cls._prefetched_releases_lock:
+                for j, (repository_url, ignore_prerelease) in enumerate(chunk):
+                    # 查询出错(比如仓库不存在)的仓库将回退到REST api
+                    if (repository := data.get("r%d" % j)) is None:
+                        continue
+                    if ignore_prerelease:
+                        release = repository["latestRelease"]
+                    else:
+                        release = (repository["releases"]["nodes"] or [None])[0]
+                    cls._prefetched_releases[(repository_url, ignore_prerelease)] = cls._graphql_release_to_rest(release)
+                    prefetched_count += 1
+        return prefetched_count
+
+    @classmethod
+    def clear_prefetched_releases(cls):
+        with cls._prefetched_releases_lock:
+            cls._prefetched_releases.clear()
+
     def do_check(self):
+        with self._prefetched_releases_lock:
+            prefetched_key = (self.repository_url, self.ignore_prerelease)
+            is_prefetched = prefetched_key in self._prefetched_releases
+            prefetched_json = self._prefetched_releases.get(prefetched_key)
         url = "https://api.github.com/repos/%s/releases" % self.repository_url
         if self.auth_token:
             req_headers = {"Authorization": "Bearer " + self.auth_token}
         else:
             req_headers = None
-        if self.ignore_prerelease:
+        if is_prefetched:
+            latest_json = prefetched_json
+            if not latest_json:
+                print_and_log("%s: No releases found!" % self.name, level=logging.WARNING)
+                return
+        elif self.ignore_prerelease:
             latest_json = json.loads(self.request_url_text(url + "/latest", headers=req_headers))
             if not latest_json:
                 print_and_log("%s: No releases found!" % self.name, level=logging.WARNING)
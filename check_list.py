@@ -22,6 +22,7 @@ class Linux510Y(CheckUpdate):
     fullname = "Linux Kernel stable v5.10.y"
     tags = ("Linux", "Kernel")
     re_pattern = r'5\.10\.(\d+)'
+    parse_only = "#releases"
 
     def do_check(self):
         url = "https://www.kernel.org"
@@ -62,13 +63,17 @@ class GoogleClangPrebuilt(CheckMultiUpdate):
     fullname = "Google Clang Prebuilt"
     tags = ("clang",)
     BASE_URL = "https://android.googlesource.com/platform/prebuilts/clang/host/linux-x86"
+    request_host = "android.googlesource.com"
     BRANCH = "mirror-goog-main-prebuilts"
+    parse_only = ".CommitLog"
+    # 短时间内重复检查(比如失败重试)时可以直接使用缓存的页面及其解析结果
+    enable_pagecache = True
 
     def do_check(self):
         url = self.BASE_URL + "/+log"
         if self.BRANCH:
             url += '/' + self.BRANCH
-        bs_obj = self.get_bs(self.request_url_text(url))
+        bs_obj = self.request_url_bs(url)
         commits = bs_obj.select_one(".CommitLog").select("li")
         sp_commits = {}
         for commit in commits:
@@ -90,7 +95,7 @@ class GoogleClangPrebuilt(CheckMultiUpdate):
     def send_message_single(self, key, item):
 
         def _get_detailed_version(url: str) -> str:
-            bs_obj_2 = self.get_bs(self.request_url_text(url))
+            bs_obj_2 = self.request_url_bs(url, parse_only="pre")
             commit_text = bs_obj_2.find("pre").get_text().splitlines()[2]
             if commit_text[-1] == ".":
                 commit_text = commit_text[:-1]
@@ -113,6 +118,7 @@ class GoogleClangPrebuilt(CheckMultiUpdate):
 class BeyondCompare5(CheckUpdate):
     fullname = "Beyond Compare 5"
     BASE_URL = "https://www.scootersoftware.com"
+    parse_only = "#content"
 
     def do_check(self):
         fetch_url = "%s/download" % self.BASE_URL
@@ -129,6 +135,9 @@ class RaspberryPi4EepromStable(CheckUpdate):
     fullname = "Raspberry Pi4 bootloader EEPROM Stable"
     tags = ("RaspberryPi", "eeprom")
     file_path = "firmware-2711/latest"
+    request_host = "api.github.com"
+    # 需要遵守主进程中的GitHub api配额跟踪和主机限流
+    enable_subprocess = False
 
     @classmethod
     def date_transform(cls, date_str: str) -> int:
@@ -139,16 +148,15 @@ class RaspberryPi4EepromStable(CheckUpdate):
         return re.sub(r'\D', '', file_name)
 
     def do_check(self):
-        files = json.loads(
-            self.request_url_text(
-                "https://api.github.com/repos/raspberrypi/rpi-eeprom/contents/%s" % self.file_path,
-                headers={"Authorization": "Bearer " + GITHUB_TOKEN} if GITHUB_TOKEN else None,
-                params={"ref": "master"},
-            )
+        files = self.request_url_json(
+            "https://api.github.com/repos/raspberrypi/rpi-eeprom/contents/%s" % self.file_path,
+            headers={"Authorization": "Bearer " + GITHUB_TOKEN} if GITHUB_TOKEN else None,
+            params={"ref": "master"},
+        )
+        latest_file = max(
+            (f for f in files if re.match(r'^pieeprom-[\d-]+.bin$', f["name"])),
+            key=lambda f: self.date_transform(self._get_build_date(f["name"])),
         )
-        files = [f for f in files if re.match(r'^pieeprom-[\d-]+.bin$', f["name"])]
-        files.sort(key=lambda f: self.date_transform(self._get_build_date(f["name"])))
-        latest_file = files[-1]
         self.update_info("LATEST_VERSION", latest_file["name"])
         self.update_info("DOWNLOAD_LINK", latest_file["download_url"])
         self.update_info("FILE_SIZE", self.get_human_readable_file_size(int(latest_file["size"])))
@@ -170,22 +178,22 @@ class RaspberryPiOS64(CheckUpdate):
     def do_check(self):
         url = "https://downloads.raspberrypi.org/os_list_imagingutility_v3.json"
         item_name = self.fullname
-        json_dic = json.loads(self.request_url_text(url))
-        for item in json_dic["os_list"]:
-            if item["name"] == item_name:
-                self.update_info("BUILD_DATE", item["release_date"])
-                self.update_info(
-                    "FILE_SIZE",
-                    self.get_human_readable_file_size(int(item["image_download_size"]))
-                )
-                self.update_info("DOWNLOAD_LINK", item["url"])
-                self.update_info("LATEST_VERSION", item["url"].rsplit('/', 1)[1])
-                self.update_info(
-                    "BUILD_CHANGELOG",
-                    "https://downloads.raspberrypi.org/raspios_arm64/release_notes.txt"
-                )
-                return
-        print_and_log('%s: Cannot found item: "%s".' % (self.name, item_name), level=logging.WARNING)
+        # 目录文件很大, 找到所需的项目之后就停止下载
+        item = self.find_json_item(url, lambda item_: item_["name"] == item_name, path=("os_list", ))
+        if item is None:
+            print_and_log('%s: Cannot found item: "%s".' % (self.name, item_name), level=logging.WARNING)
+            return
+        self.update_info("BUILD_DATE", item["release_date"])
+        self.update_info(
+            "FILE_SIZE",
+            self.get_human_readable_file_size(int(item["image_download_size"]))
+        )
+        self.update_info("DOWNLOAD_LINK", item["url"])
+        self.update_info("LATEST_VERSION", item["url"].rsplit('/', 1)[1])
+        self.update_info(
+            "BUILD_CHANGELOG",
+            "https://downloads.raspberrypi.org/raspios_arm64/release_notes.txt"
+        )
 
     @classmethod
     def date_transform(cls, date_str: str):
@@ -194,6 +202,8 @@ class RaspberryPiOS64(CheckUpdate):
 class PhoronixLinuxKernelNews(CheckMultiUpdate):
     fullname = "Linux Kernel News Archives"
     BASE_URL = "https://www.phoronix.com"
+    check_interval = 30 * 60
+    parse_only = "#main"
 
     def do_check(self):
         bs_obj = self.get_bs(self.request_url_text(
@@ -239,6 +249,7 @@ class PhoronixLinuxKernelNews(CheckMultiUpdate):
 
 class RaspberrypiNXEZ(CheckMultiUpdate):
     fullname = "树莓派实验室"
+    parse_only = "#main-content"
 
     def do_check(self):
         bs_obj = self.get_bs(self.request_url_text(
@@ -294,6 +305,7 @@ class Switch520(CheckMultiUpdate):
     fullname = "Switch520"
     BASE_URL = "https://www.gamer520.com/"
     TG_SENDTO_SP = os.getenv("TG_SENDTO_SP", "")
+    parse_only = "article"
 
     def do_check(self):
         if 0 <= datetime.datetime.now().hour <= 7:
@@ -345,6 +357,8 @@ class Switch520(CheckMultiUpdate):
 
 class AckAndroid12510LTS(CheckUpdate):
     fullname = "android12-5.10-lts"
+    # 需要遵守主进程中的主机限流(config.HOST_REQUESTS_PER_SECOND["googlesource.com"])
+    request_host = "android-review.googlesource.com"
 
     def do_check(self):
         json_text = self.request_url_text(
@@ -399,15 +413,15 @@ class CloParrotKernel(CheckUpdate):
     tag_name_re_pattern = r'KERNEL\.PLATFORM\.1\.0\.r\d-\d+-kernel\.0'
 
     def do_check(self):
-        tags = json.loads(
-            self.request_url_text("https://git.codelinaro.org/api/v4/projects/%s/repository/tags" % self.project_id)
+        tag = self.find_json_item(
+            "https://git.codelinaro.org/api/v4/projects/%s/repository/tags" % self.project_id,
+            lambda tag_: re.match(self.tag_name_re_pattern, tag_["name"]),
         )
-        for tag in tags:
-            if re.match(self.tag_name_re_pattern, tag["name"]):
-                self.update_info("LATEST_VERSION", tag["name"])
-                self._private_dic["tag"] = tag
-                return
-        print_and_log("%s: No items found after filtering." % self.name, level=logging.WARNING)
+        if tag is None:
+            print_and_log("%s: No items found after filtering." % self.name, level=logging.WARNING)
+            return
+        self.update_info("LATEST_VERSION", tag["name"])
+        self._private_dic["tag"] = tag
 
     def get_print_text(self):
         return "\n".join([
@@ -424,6 +438,11 @@ class CloParrotVendor(CloParrotKernel):
 class RealVNCViewer(CheckUpdate):
     fullname = "RealVNC Viewer"
     fetch_url = "https://www.realvnc.com/en/connect/download/viewer/"
+    # 下载页面很少变化, 缓存12小时
+    enable_pagecache = True
+    pagecache_ttl = 12 * 60 * 60
+    check_interval = 12 * 60 * 60
+    parse_only = "select[data-os-selected]"
     _OS_TYPES = {
         'windows': "Windows",
         'macos': "Mac OS",
@@ -434,7 +453,7 @@ class RealVNCViewer(CheckUpdate):
     def do_check(self):
         download_links = {}
         version = ""
-        bs_obj = self.get_bs(self.request_url(self.fetch_url))
+        bs_obj = self.request_url_bs(self.fetch_url)
         for download_selection in bs_obj.select('select[data-os-selected]'):
             if not (os_type := download_selection.get('data-os-selected')):
                 continue
@@ -508,9 +527,10 @@ class Magisk(GithubReleases):
 class MagiskCanary(CheckUpdate):
     fullname = "Magisk Canary"
     req_url = "https://github.com/topjohnwu/magisk-files/raw/master/canary.json"
+    check_interval = 30 * 60
 
     def do_check(self):
-        json_dic = json.loads(self.request_url_text(self.req_url))
+        json_dic = self.request_url_json(self.req_url)
         magisk_info = json_dic.get("magisk")
         assert magisk_info
         self.update_info("LATEST_VERSION", magisk_info["versionCode"])
@@ -521,6 +541,7 @@ class MagiskCanary(CheckUpdate):
 class MagiskBeta(MagiskCanary):
     fullname = "Magisk Beta"
     req_url = "https://github.com/topjohnwu/magisk-files/raw/master/beta.json"
+    check_interval = None
 
 class Jadx(GithubReleases):
     fullname = "jadx (Dex to Java decompiler)"
@@ -1,45 +1,819 @@
 #!/usr/bin/env python3
 # encoding: utf-8
 
+import asyncio
+import random
+import socket
 import threading
-from typing import Union, Final, Literal
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import ExitStack, closing, contextmanager, asynccontextmanager
+from typing import (
+    Union, Final, Literal, ContextManager, Iterator, AsyncIterator, Callable, Dict, Hashable, Any, Optional, Sequence, Tuple,
+)
+from urllib.parse import urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 
-from config import PROXIES, TIMEOUT
+try:
+    # aiohttp是可选的依赖, 只有asyncio模式需要
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
+from config import (
+    PROXIES, TIMEOUT, SESSION_POOL_SIZE, SESSION_IDLE_TIMEOUT, PAGE_CACHE_TTL, PAGE_CACHE_MAX_BYTES,
+    PAGE_CACHE_COMPRESS, GITHUB_RATE_LIMIT_RESERVE, GITHUB_RATE_LIMIT_MAX_WAIT, HOST_MAX_CONCURRENCY,
+    HOST_REQUESTS_PER_SECOND, CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_BASE_BACKOFF,
+    CIRCUIT_BREAKER_MAX_BACKOFF, NETWORK_ERROR_MIN_FAILED_HOSTS,
+)
+
+
+class CheckTimeoutException(Exception):
+
+    """ 检查超出了时间预算(或被取消), 正在进行的请求已被中断 """
+
+class CancelScope:
+
+    """ 一次检查的时间预算
+    在作用域内(同一线程)发起的请求所使用的套接字都会被登记,
+    超出时间预算或调用cancel方法时, 关闭这些套接字, 以立即中断正在进行的请求(包括正在读取响应内容的请求),
+    之后在作用域内发起的请求将直接抛出CheckTimeoutException异常
+    使用SOCKS代理时无法登记连接, 只能依靠请求的超时时间
+    """
+
+    def __init__(self, budget: Union[int, float]):
+        self.deadline: Final = time.monotonic() + budget
+        self.reason: Optional[str] = None
+        self.__sockets = set()
+        self.__timer = threading.Timer(max(budget, 0), self.cancel, args=("Timed out", ))
+        self.__timer.daemon = True
+        self.threading_lock: Final = threading.RLock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> float:
+        """ 返回剩余的时间(单位: 秒) """
+        return self.deadline - time.monotonic()
+
+    def check(self):
+        """ 已经被取消或超出时间预算时抛出CheckTimeoutException异常 """
+        if not self.cancelled and self.remaining() <= 0:
+            self.cancel("Timed out")
+        if self.cancelled:
+            raise CheckTimeoutException(self.reason)
+
+    def register(self, sock: socket.socket):
+        """ 登记一个即将用于请求的套接字, 已经被取消时抛出CheckTimeoutException异常 """
+        with self.threading_lock:
+            self.check()
+            self.__sockets.add(sock)
+
+    def cancel(self, reason: str = "Cancelled"):
+        """ 取消该作用域, 并中断所有已登记的套接字 """
+        with self.threading_lock:
+            if self.cancelled:
+                return
+            self.reason = reason
+            sockets, self.__sockets = self.__sockets, set()
+        for sock in sockets:
+            # 连接对象可能已经放弃了套接字(比如响应头中有Connection: close), 但响应对象仍在读取, 因此直接关闭套接字
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        self.__timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.__timer.cancel()
+        with self.threading_lock:
+            self.__sockets.clear()
+
+_CANCEL_SCOPE: Final = threading.local()
+
+def get_cancel_scope() -> Optional[CancelScope]:
+    """ 返回当前线程所在的CancelScope, 不在任何作用域内时返回None """
+    return getattr(_CANCEL_SCOPE, "scope", None)
+
+@contextmanager
+def cancel_scope(budget: Union[int, float]) -> ContextManager[CancelScope]:
+    """ 在当前线程中进入一个时间预算为budget秒的CancelScope """
+    prev_scope = get_cancel_scope()
+    with CancelScope(budget) as scope:
+        _CANCEL_SCOPE.scope = scope
+        try:
+            yield scope
+        finally:
+            _CANCEL_SCOPE.scope = prev_scope
+
+class _CancellableConnectionMixin:
+
+    """ 将连接所使用的套接字登记到当前线程的CancelScope """
+
+    def connect(self):
+        if (scope := get_cancel_scope()) is not None:
+            scope.check()
+        super().connect()
+        if scope is not None:
+            scope.register(self.sock)
+
+    def request(self, *args, **kwargs):
+        if (scope := get_cancel_scope()) is not None:
+            if self.sock is not None:
+                # 复用的连接
+                scope.register(self.sock)
+            else:
+                scope.check()
+        super().request(*args, **kwargs)
+
+class _CancellableHTTPConnection(_CancellableConnectionMixin, HTTPConnection):
+    pass
+
+class _CancellableHTTPSConnection(_CancellableConnectionMixin, HTTPSConnection):
+    pass
+
+class _CancellableHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CancellableHTTPConnection
+
+class _CancellableHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+class _CancellableHTTPAdapter(HTTPAdapter):
+
+    """ 使用可以被CancelScope中断的连接的HTTPAdapter """
+
+    POOL_CLASSES: Final = {"http": _CancellableHTTPConnectionPool, "https": _CancellableHTTPSConnectionPool}
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.POOL_CLASSES
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            proxy_manager.pool_classes_by_scheme = self.POOL_CLASSES
+        return proxy_manager
+
+class SessionPool:
+
+    """ 长连接会话池
+    键为(<scheme://host>, <代理>), 值为空闲的requests.Session对象列表
+    每个Session在同一时间只会被一个线程借用, 用完之后归还至会话池, 以便复用已建立的TCP/TLS连接
+    空闲时间超过SESSION_IDLE_TIMEOUT的Session将被关闭
+    同时统计复用连接和新建连接的次数, 便于确认长连接的效果
+    """
+
+    def __init__(self, pool_size: int = SESSION_POOL_SIZE, idle_timeout: Union[int, float] = SESSION_IDLE_TIMEOUT):
+        self.pool_size: Final = pool_size
+        self.idle_timeout: Final = idle_timeout
+        self.__idle_sessions = dict()
+        self.__stats = {"reused": 0, "new": 0, "failed": 0}
+        self.threading_lock: Final = threading.RLock()
+
+    @staticmethod
+    def __get_key(url: str, proxies: Union[dict, None]) -> tuple:
+        url_parsed = urlsplit(url)
+        if proxies:
+            proxy = proxies.get(url_parsed.scheme) or None
+        else:
+            proxy = None
+        return "%s://%s" % (url_parsed.scheme, url_parsed.netloc), proxy
+
+    def __new_session(self) -> requests.Session:
+        session = requests.Session()
+        # 阻止requests从环境变量中读取代理设置
+        session.trust_env = False
+        adapter = _CancellableHTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def __evict_idle_sessions(self):
+        deadline = time.monotonic() - self.idle_timeout
+        with self.threading_lock:
+            for key in list(self.__idle_sessions.keys()):
+                sessions = self.__idle_sessions[key]
+                while sessions and sessions[0][0] < deadline:
+                    sessions.pop(0)[1].close()
+                if not sessions:
+                    del self.__idle_sessions[key]
+
+    @staticmethod
+    def __count_connections(session: requests.Session) -> int:
+        """ 返回该Session至今为止新建的连接总数 """
+        count = 0
+        for adapter in set(session.adapters.values()):
+            pool_managers = [adapter.poolmanager, *adapter.proxy_manager.values()]
+            for pool_manager in pool_managers:
+                if pool_manager is None:
+                    continue
+                for pool_key in pool_manager.pools.keys():
+                    if (pool := pool_manager.pools.get(pool_key)) is not None:
+                        count += pool.num_connections
+        return count
+
+    def __record_stats(self, session: requests.Session, connections_count: int, is_failed: bool):
+        """ 统计本次借用期间新建的连接数, 失败的请求单独计数, 不计入复用 """
+        new_connections_count = self.__count_connections(session) - connections_count
+        with self.threading_lock:
+            if new_connections_count > 0:
+                self.__stats["new"] += new_connections_count
+            elif is_failed:
+                self.__stats["failed"] += 1
+            else:
+                self.__stats["reused"] += 1
+
+    @contextmanager
+    def borrow(self, url: str, proxies: Union[dict, None]) -> ContextManager[requests.Session]:
+        """ 从会话池中借用一个Session, 退出上下文时自动归还 """
+        key = self.__get_key(url, proxies)
+        self.__evict_idle_sessions()
+        with self.threading_lock:
+            sessions = self.__idle_sessions.get(key)
+            session = sessions.pop()[1] if sessions else self.__new_session()
+        connections_count = self.__count_connections(session)
+        try:
+            yield session
+        except:
+            # 必须在关闭Session之前统计, 关闭之后连接池已被清空
+            self.__record_stats(session, connections_count, is_failed=True)
+            # 出现异常时不再复用这个Session
+            session.close()
+            raise
+        self.__record_stats(session, connections_count, is_failed=False)
+        with self.threading_lock:
+            sessions = self.__idle_sessions.setdefault(key, [])
+            if len(sessions) < self.pool_size:
+                sessions.append((time.monotonic(), session))
+                return
+        session.close()
+
+    def pop_stats(self) -> dict:
+        """ 返回并重置连接复用统计 """
+        with self.threading_lock:
+            stats = self.__stats.copy()
+            self.__stats = {"reused": 0, "new": 0, "failed": 0}
+        return stats
+
+    def clear(self):
+        with self.threading_lock:
+            for sessions in self.__idle_sessions.values():
+                for _, session in sessions:
+                    session.close()
+            self.__idle_sessions.clear()
+
+SESSION_POOL: Final = SessionPool()
+
+class HostThrottle:
+
+    """ 按主机限制请求的并发数和速率
+    并发数由每个主机各自的信号量限制, 速率由每个主机各自的令牌桶限制(桶的容量与每秒请求数相同, 最少为1)
+    主机名同时匹配其子域名, 比如"sourceforge.net"也适用于"downloads.sourceforge.net"
+    """
+
+    # 异步请求等待并发名额时的轮询间隔(单位: 秒)
+    ASYNC_POLL_INTERVAL: Final = 0.05
+
+    def __init__(
+            self,
+            max_concurrency: Dict[str, int] = HOST_MAX_CONCURRENCY,
+            requests_per_second: Dict[str, float] = HOST_REQUESTS_PER_SECOND,
+    ):
+        self.max_concurrency: Final = max_concurrency
+        self.requests_per_second: Final = requests_per_second
+        self.__semaphores = dict()
+        # 键为主机名, 值为[<令牌数>, <上次补充令牌的时间>]
+        self.__buckets = dict()
+        self.threading_lock: Final = threading.RLock()
+
+    @staticmethod
+    def __match_host(host: str, config_dic: dict) -> Union[str, None]:
+        """ 返回config_dic中与host匹配的键 """
+        while host:
+            if host in config_dic:
+                return host
+            host = host.partition(".")[2]
+        return None
+
+    def is_limited(self, host: str) -> bool:
+        """ 该主机是否受并发数或速率限制 """
+        return (
+            self.__match_host(host, self.max_concurrency) is not None
+            or self.__match_host(host, self.requests_per_second) is not None
+        )
+
+    def __get_semaphore(self, host: str) -> Union[threading.BoundedSemaphore, None]:
+        if (key := self.__match_host(host, self.max_concurrency)) is None or self.max_concurrency[key] <= 0:
+            return None
+        with self.threading_lock:
+            if key not in self.__semaphores:
+                self.__semaphores[key] = threading.BoundedSemaphore(self.max_concurrency[key])
+            return self.__semaphores[key]
+
+    def __try_take_token(self, host: str) -> float:
+        """ 尝试从该主机的令牌桶中取出一个令牌, 成功时返回0, 否则返回需要等待的时间 """
+        if (key := self.__match_host(host, self.requests_per_second)) is None:
+            return 0
+        if (rate := self.requests_per_second[key]) <= 0:
+            return 0
+        capacity = max(rate, 1)
+        with self.threading_lock:
+            now = time.monotonic()
+            bucket = self.__buckets.setdefault(key, [capacity, now])
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def __take_token(self, host: str):
+        while (wait_time := self.__try_take_token(host)) > 0:
+            time.sleep(wait_time)
+
+    @contextmanager
+    def limit(self, url: str) -> ContextManager:
+        """ 在上下文中占用一个该主机的并发名额, 进入上下文前按速率限制等待令牌 """
+        host = urlsplit(url).hostname or ""
+        semaphore = self.__get_semaphore(host)
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            self.__take_token(host)
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+    @asynccontextmanager
+    async def limit_async(self, url: str) -> AsyncIterator[None]:
+        """ limit方法的异步版本, 与同步的请求共享同一个主机的并发名额和令牌, 等待时不会阻塞事件循环 """
+        host = urlsplit(url).hostname or ""
+        semaphore = self.__get_semaphore(host)
+        if semaphore is not None:
+            # 信号量同时被其他线程中同步的请求使用, 只能以非阻塞的方式轮询
+            while not semaphore.acquire(blocking=False):
+                await asyncio.sleep(self.ASYNC_POLL_INTERVAL)
+        try:
+            while (wait_time := self.__try_take_token(host)) > 0:
+                await asyncio.sleep(wait_time)
+            yield
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+
+HOST_THROTTLE: Final = HostThrottle()
+
+class CircuitOpenException(Exception):
+
+    """ 该主机的熔断器处于打开状态, 请求被直接拒绝 """
+
+class HostCircuitBreakers:
+
+    """ 按主机划分的熔断器
+    每个主机的熔断器有三种状态:
+    closed: 正常放行请求, 连续失败failure_threshold次后转为open
+    open: 直接拒绝请求(抛出CircuitOpenException异常), 等待时间结束后转为half-open
+    half-open: 只放行一个试探请求, 成功则转为closed, 失败则重新转为open, 并且等待时间翻倍
+    等待时间从base_backoff开始指数增长, 最长为max_backoff, 并加入随机抖动
+    只有网络错误(连接错误, 超时)和5xx响应才视为失败
+    """
+
+    CLOSED: Final = "closed"
+    OPEN: Final = "open"
+    HALF_OPEN: Final = "half-open"
+
+    def __init__(
+            self,
+            failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            base_backoff: Union[int, float] = CIRCUIT_BREAKER_BASE_BACKOFF,
+            max_backoff: Union[int, float] = CIRCUIT_BREAKER_MAX_BACKOFF,
+    ):
+        self.failure_threshold: Final = failure_threshold
+        self.base_backoff: Final = base_backoff
+        self.max_backoff: Final = max_backoff
+        # 键为主机名, 值为{"state", "failures", "trips", "open_until", "probing"}
+        self.__breakers = dict()
+        self.threading_lock: Final = threading.RLock()
+
+    def __get_breaker(self, host: str) -> dict:
+        return self.__breakers.setdefault(
+            host, {"state": self.CLOSED, "failures": 0, "trips": 0, "open_until": 0, "probing": False}
+        )
+
+    def before_request(self, host: str):
+        """ 在请求之前调用, 如果熔断器不允许放行, 则抛出CircuitOpenException异常 """
+        with self.threading_lock:
+            breaker = self.__get_breaker(host)
+            if breaker["state"] == self.CLOSED:
+                return
+            if breaker["state"] == self.OPEN:
+                if time.time() < breaker["open_until"]:
+                    raise CircuitOpenException("Circuit breaker for %s is open" % host)
+                breaker["state"] = self.HALF_OPEN
+            if breaker["probing"]:
+                raise CircuitOpenException("Circuit breaker for %s is half-open and probing" % host)
+            breaker["probing"] = True
+
+    def record_success(self, host: str):
+        with self.threading_lock:
+            breaker = self.__get_breaker(host)
+            breaker.update(state=self.CLOSED, failures=0, trips=0, probing=False)
+
+    def record_failure(self, host: str):
+        with self.threading_lock:
+            breaker = self.__get_breaker(host)
+            breaker["failures"] += 1
+            breaker["probing"] = False
+            if breaker["state"] == self.OPEN:
+                # 熔断之前就已经发出的请求失败了, 不重复熔断
+                return
+            if breaker["state"] == self.HALF_OPEN or breaker["failures"] >= self.failure_threshold:
+                breaker["trips"] += 1
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (breaker["trips"] - 1))
+                breaker["state"] = self.OPEN
+                breaker["open_until"] = time.time() + random.uniform(backoff / 2, backoff)
+
+    def cancel_probe(self, host: str):
+        """ 试探请求没有真正完成时调用, 允许下一个请求重新试探 """
+        with self.threading_lock:
+            self.__get_breaker(host)["probing"] = False
+
+    def get_states(self) -> dict:
+        """ 返回所有不处于closed状态的熔断器, 键为主机名 """
+        with self.threading_lock:
+            return {
+                host: breaker.copy()
+                for host, breaker in self.__breakers.items()
+                if breaker["state"] != self.CLOSED
+            }
+
+CIRCUIT_BREAKERS: Final = HostCircuitBreakers()
+
+class ConnectivityDetector:
+
+    """ 全局网络连通性检测
+    记录自上一次请求成功以来, 发生网络错误的不同主机
+    如果这样的主机达到min_failed_hosts个, 则判定为网络(或代理)异常
+    因此单个主机的故障不会被误判为网络异常
+    """
+
+    def __init__(self, min_failed_hosts: int = NETWORK_ERROR_MIN_FAILED_HOSTS):
+        self.min_failed_hosts: Final = min_failed_hosts
+        self.__failed_hosts = set()
+        self.threading_lock: Final = threading.RLock()
+
+    def record_success(self, host: str):
+        with self.threading_lock:
+            self.__failed_hosts.clear()
+
+    def record_failure(self, host: str):
+        with self.threading_lock:
+            self.__failed_hosts.add(host)
+
+    def is_offline(self) -> bool:
+        with self.threading_lock:
+            return len(self.__failed_hosts) >= self.min_failed_hosts
+
+    def get_failed_hosts(self) -> frozenset:
+        """ 返回自上一次请求成功以来发生网络错误的主机 """
+        with self.threading_lock:
+            return frozenset(self.__failed_hosts)
+
+    def reset(self):
+        with self.threading_lock:
+            self.__failed_hosts.clear()
+
+CONNECTIVITY_DETECTOR: Final = ConnectivityDetector()
+
+class GithubRateLimitDeferred(Exception):
+
+    """ GitHub api的配额即将耗尽(或被要求稍后重试), 且需要等待的时间过长, 本次请求被推迟 """
+
+class GithubRateLimiter:
+
+    """ GitHub api配额跟踪器
+    从每个api.github.com的响应中读取X-RateLimit-*和Retry-After响应头, 并按资源(core, graphql等)记录剩余配额
+    在请求api.github.com之前:
+    如果剩余配额不高于reserve, 或服务器要求稍后重试, 则等待配额重置;
+    如果需要等待的时间超过max_wait, 则抛出GithubRateLimitDeferred异常, 将该请求推迟到下一轮检查
+    """
+
+    API_HOST: Final = "api.github.com"
+
+    def __init__(self, reserve: int = GITHUB_RATE_LIMIT_RESERVE, max_wait: Union[int, float] = GITHUB_RATE_LIMIT_MAX_WAIT):
+        self.reserve: Final = reserve
+        self.max_wait: Final = max_wait
+        # 键为资源名, 值为{"limit": <配额>, "remaining": <剩余配额>, "reset": <重置时间(Unix时间)>}
+        self.__budgets = dict()
+        self.__retry_after_until = 0
+        self.__deferred_count = 0
+        self.threading_lock: Final = threading.RLock()
+
+    @classmethod
+    def is_github_api(cls, url: str) -> bool:
+        return urlsplit(url).hostname == cls.API_HOST
+
+    @staticmethod
+    def __get_resource(url: str) -> str:
+        return "graphql" if urlsplit(url).path.startswith("/graphql") else "core"
+
+    def before_request(self, url: str):
+        """ 在请求GitHub api之前调用, 必要时等待配额重置, 或者抛出GithubRateLimitDeferred异常 """
+        resource = self.__get_resource(url)
+        while True:
+            with self.threading_lock:
+                now = time.time()
+                wait_time = self.__retry_after_until - now
+                budget = self.__budgets.get(resource)
+                if budget is not None and budget["remaining"] <= self.reserve:
+                    wait_time = max(wait_time, budget["reset"] - now)
+                if wait_time <= 0:
+                    return
+                if wait_time > self.max_wait:
+                    self.__deferred_count += 1
+                    raise GithubRateLimitDeferred(
+                        "GitHub api rate limit is nearly exhausted, resets in %d seconds" % wait_time
+                    )
+            time.sleep(wait_time)
+
+    def update(self, url: str, response: requests.models.Response):
+        """ 从GitHub api的响应中更新配额信息 """
+        headers = response.headers
+        resource = headers.get("X-RateLimit-Resource") or self.__get_resource(url)
+        with self.threading_lock:
+            try:
+                self.__budgets[resource] = {
+                    "limit": int(headers["X-RateLimit-Limit"]),
+                    "remaining": int(headers["X-RateLimit-Remaining"]),
+                    "reset": int(headers["X-RateLimit-Reset"]),
+                }
+            except (KeyError, ValueError):
+                pass
+            if response.status_code in (403, 429) and (retry_after := headers.get("Retry-After")):
+                retry_after = int(retry_after) if retry_after.isdigit() else 60
+                self.__retry_after_until = max(self.__retry_after_until, time.time() + retry_after)
+
+    def pop_stats(self) -> dict:
+        """ 返回当前的配额信息, 并返回和重置被推迟的请求数 """
+        with self.threading_lock:
+            stats = {"budgets": {k: v.copy() for k, v in self.__budgets.items()}, "deferred": self.__deferred_count}
+            self.__deferred_count = 0
+        return stats
+
+GITHUB_RATE_LIMITER: Final = GithubRateLimiter()
+
+def _send_request(
+        url: str,
+        method: Literal["get", "post"],
+        raise_for_status: bool,
+        use_circuit_breaker: bool,
+        **kwargs
+) -> Tuple[requests.models.Response, ExitStack]:
+    """
+    发送请求, 参数与request_url相同
+    :return: (<requests.models.Response对象>, <仍然占用着的主机并发名额和会话池中的Session>),
+             调用者必须在读取完响应内容之后关闭后者, 以释放并发名额并归还Session
+    """
+
+    if method not in ("get", "post"):
+        raise Exception("Unknown request method: %s" % method)
+    timeout = kwargs.pop("timeout", TIMEOUT)
+    proxies = kwargs.pop("proxies", PROXIES)
+    host = urlsplit(url).hostname or ""
+    if (scope := get_cancel_scope()) is not None:
+        scope.check()
+    if use_circuit_breaker:
+        CIRCUIT_BREAKERS.before_request(host)
+    is_github_api = GITHUB_RATE_LIMITER.is_github_api(url)
+    try:
+        with ExitStack() as stack:
+            if is_github_api:
+                GITHUB_RATE_LIMITER.before_request(url)
+            stack.enter_context(HOST_THROTTLE.limit(url))
+            session = stack.enter_context(SESSION_POOL.borrow(url, proxies))
+            if scope is not None:
+                # 等待并发名额和令牌时也可能超出时间预算
+                scope.check()
+                if isinstance(timeout, (int, float)):
+                    timeout = max(min(timeout, scope.remaining()), 0.001)
+            requests_func = session.get if method == "get" else session.post
+            req = requests_func(url, timeout=timeout, proxies=proxies, **kwargs)
+            # 请求成功时不释放, 交给调用者
+            resources = stack.pop_all()
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+        if scope is not None and (scope.cancelled or scope.remaining() <= 0):
+            # 请求是被主动中断的(或者因为时间预算耗尽而超时), 不能算作该主机或网络的故障
+            CIRCUIT_BREAKERS.cancel_probe(host)
+            scope.cancel("Timed out")
+            raise CheckTimeoutException(scope.reason) from exc
+        CIRCUIT_BREAKERS.record_failure(host)
+        CONNECTIVITY_DETECTOR.record_failure(host)
+        raise
+    except:
+        # 其他原因(比如GitHub api配额不足)导致的异常不影响熔断器的状态, 只需要结束试探
+        CIRCUIT_BREAKERS.cancel_probe(host)
+        raise
+    CONNECTIVITY_DETECTOR.record_success(host)
+    if req.status_code >= 500:
+        CIRCUIT_BREAKERS.record_failure(host)
+    else:
+        CIRCUIT_BREAKERS.record_success(host)
+    if is_github_api:
+        GITHUB_RATE_LIMITER.update(url, req)
+    if raise_for_status:
+        try:
+            req.raise_for_status()
+        except:
+            req.close()
+            resources.close()
+            raise
+    return req, resources
 
 def request_url(
         url: str,
         *,
         method: Literal["get", "post"] = "get",
         raise_for_status: bool = True,
+        use_circuit_breaker: bool = True,
         **kwargs
 ) -> requests.models.Response:
     """ 对requests进行了简单的包装
     timeout, proxies这两个参数有默认值, 也可以根据需要自定义这些参数
+    请求将复用会话池(SESSION_POOL)中的长连接会话
+    请求GitHub api时将遵守GITHUB_RATE_LIMITER跟踪到的配额
+    每个主机的并发数和请求速率受HOST_THROTTLE限制
+    请求的结果将反馈给该主机的熔断器(CIRCUIT_BREAKERS)和全局网络连通性检测(CONNECTIVITY_DETECTOR)
+    在CancelScope内发起的请求, 超时时间不超过剩余的时间预算, 被中断时抛出CheckTimeoutException异常
+    返回之前已经读取了完整的响应内容, 流式请求请使用request_url_stream函数
     :param url: 要请求的url
     :param method: 请求方法, 可选: "get"(默认)或"post"
     :param raise_for_status: 为True时, 如果请求返回的状态码是4xx或5xx则抛出异常
+    :param use_circuit_breaker: 为True时, 如果该主机的熔断器处于打开状态, 则直接抛出CircuitOpenException异常
     :param kwargs: 其他需要传递给requests的参数
     :return: requests.models.Response对象
     """
+    if kwargs.get("stream"):
+        # 返回之后就会释放并发名额并归还Session, 而此时响应内容还没有读取
+        raise ValueError("request_url does not support stream=True, use request_url_stream instead")
+    req, resources = _send_request(url, method, raise_for_status, use_circuit_breaker, **kwargs)
+    resources.close()
+    return req
 
-    with requests.Session() as session:
-        # 阻止requests从环境变量中读取代理设置
-        session.trust_env = False
-        if method == "get":
-            requests_func = session.get
-        elif method == "post":
-            requests_func = session.post
-        else:
-            raise Exception("Unknown request method: %s" % method)
-        timeout = kwargs.pop("timeout", TIMEOUT)
-        proxies = kwargs.pop("proxies", PROXIES)
-        req = requests_func(url, timeout=timeout, proxies=proxies, **kwargs)
-        if raise_for_status:
-            req.raise_for_status()
-        return req
+@contextmanager
+def request_url_stream(
+        url: str,
+        *,
+        method: Literal["get", "post"] = "get",
+        raise_for_status: bool = True,
+        use_circuit_breaker: bool = True,
+        **kwargs
+) -> Iterator[requests.models.Response]:
+    """
+    request_url的流式版本, 在上下文中返回还没有读取响应内容的requests.models.Response对象
+    在退出上下文之前一直占用着该主机的并发名额和会话池中的Session, 退出上下文时关闭响应, 然后释放它们
+    参数与request_url相同
+    """
+    req, resources = _send_request(url, method, raise_for_status, use_circuit_breaker, stream=True, **kwargs)
+    try:
+        with closing(req):
+            yield req
+    finally:
+        # 在上下文中引发的异常(比如停止迭代)与这次请求本身无关, 不影响Session的复用
+        resources.close()
+
+def new_async_session(max_connections: int) -> "aiohttp.ClientSession":
+    """
+    创建用于async_request_url的aiohttp.ClientSession, 在同一个事件循环中复用长连接
+    请求头与requests的默认请求头相同, 以免服务器返回与同步的请求不同的内容
+    :param max_connections: 同时建立的连接数的上限, 即同时进行的请求数的上限
+    :return: aiohttp.ClientSession对象, 需要在事件循环中使用async with关闭
+    """
+    if aiohttp is None:
+        raise ImportError("The asyncio mode requires the aiohttp package")
+    return aiohttp.ClientSession(
+        headers={
+            "User-Agent": requests.utils.default_user_agent(),
+            "Accept": "*/*",
+            # aiohttp只能解码这两种压缩格式
+            "Accept-Encoding": "gzip, deflate",
+        },
+        connector=aiohttp.TCPConnector(limit=max_connections, limit_per_host=SESSION_POOL_SIZE),
+        # 与SESSION_POOL一致, 不从环境变量中读取代理设置
+        trust_env=False,
+    )
+
+def can_request_async(url: str) -> bool:
+    """
+    该url是否可以使用async_request_url请求
+    GitHub api的配额跟踪(GITHUB_RATE_LIMITER)是同步的, aiohttp也不支持SOCKS代理, 这些请求只能以同步的方式进行
+    """
+    if GITHUB_RATE_LIMITER.is_github_api(url):
+        return False
+    proxy = (PROXIES or {}).get(urlsplit(url).scheme) or ""
+    return not proxy.startswith("socks")
+
+async def async_request_url(
+        session: "aiohttp.ClientSession",
+        url: str,
+        *,
+        params: Optional[Sequence[Tuple[str, Any]]] = None,
+        headers: Optional[dict] = None,
+) -> requests.models.Response:
+    """
+    request_url的异步版本, 只支持get请求, 不会在响应的状态码为4xx或5xx时抛出异常
+    与request_url一样受HOST_THROTTLE限制(与同步的请求共享并发名额和令牌), 并遵守该主机的熔断器,
+    请求的结果也会反馈给熔断器和CONNECTIVITY_DETECTOR
+    为了与同步的请求得到相同的url和解码结果, url由requests构建, 返回的也是requests.models.Response对象
+    :param session: 由new_async_session函数创建的aiohttp.ClientSession对象
+    :param url: 要请求的url, 必须满足can_request_async函数
+    :param params: url参数
+    :param headers: 额外的请求头
+    :return: requests.models.Response对象
+    """
+    if not can_request_async(url):
+        raise ValueError("Cannot request %s asynchronously" % url)
+    url = requests.Request("GET", url, params=params).prepare().url
+    host = urlsplit(url).hostname or ""
+    proxy = (PROXIES or {}).get(urlsplit(url).scheme) or None
+    if isinstance(TIMEOUT, (int, float)):
+        timeout = aiohttp.ClientTimeout(sock_connect=TIMEOUT, sock_read=TIMEOUT)
+    else:
+        timeout = aiohttp.ClientTimeout(sock_connect=TIMEOUT[0], sock_read=TIMEOUT[1])
+    CIRCUIT_BREAKERS.before_request(host)
+    try:
+        async with HOST_THROTTLE.limit_async(url):
+            async with session.get(url, headers=headers, proxy=proxy, timeout=timeout) as resp:
+                content = await resp.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        CIRCUIT_BREAKERS.record_failure(host)
+        CONNECTIVITY_DETECTOR.record_failure(host)
+        raise
+    except BaseException:
+        # 被取消等其他原因导致的异常不影响熔断器的状态, 只需要结束试探
+        CIRCUIT_BREAKERS.cancel_probe(host)
+        raise
+    CONNECTIVITY_DETECTOR.record_success(host)
+    if resp.status >= 500:
+        CIRCUIT_BREAKERS.record_failure(host)
+    else:
+        CIRCUIT_BREAKERS.record_success(host)
+    req = requests.models.Response()
+    req.status_code = resp.status
+    req.reason = resp.reason
+    req.url = str(resp.url)
+    req.headers = requests.structures.CaseInsensitiveDict(resp.headers)
+    req.encoding = requests.utils.get_encoding_from_headers(req.headers)
+    # requests没有提供设置响应内容的公开接口
+    req._content = content
+    return req
+
+class FrozenDict(dict):
+
+    """ 只读的dict, 用于在多个检查项目之间共享解析结果
+    任何修改操作都会抛出TypeError, 需要修改时请先复制: dict(obj)
+    """
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError("'%s' object is read-only" % type(self).__name__)
+
+    __setitem__ = __delitem__ = __ior__ = __readonly
+    clear = pop = popitem = setdefault = update = __readonly
+
+    def __reduce__(self):
+        return type(self), (dict(self), )
+
+class FrozenList(list):
+
+    """ 只读的list, 用于在多个检查项目之间共享解析结果
+    任何修改操作都会抛出TypeError, 需要修改时请先复制: list(obj)
+    """
+
+    def __readonly(self, *args, **kwargs):
+        raise TypeError("'%s' object is read-only" % type(self).__name__)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = __readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = __readonly
+
+    def __reduce__(self):
+        return type(self), (list(self), )
+
+def freeze_json(obj: Any) -> Any:
+    """ 将json.loads返回的对象递归地转换为FrozenDict和FrozenList """
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze_json(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return FrozenList(freeze_json(v) for v in obj)
+    return obj
 
 class PageCache:
 
@@ -54,12 +828,40 @@ class PageCache:
     因为url参数可能是字典,
     而字典是不可哈希的, 也就用不了lru_cache了.
     在PageCache中, 字典参数会被适当地处理.
+
+    多线程时, 对于同一个(<url>, <url参数>), 同时只有一个线程进行请求(single-flight),
+    其他线程等待该请求完成后直接读取结果, 而不同的(<url>, <url参数>)之间互不影响
+
+    每条缓存都有各自的有效期(ttl), 过期后视为不存在, 因此缓存可以跨越多轮检查
+    缓存的总大小超过max_bytes时, 将淘汰最久未使用的缓存
+    compress为True时, 页面源码将使用zlib压缩后保存
+
+    每条缓存还可以附带页面源码的解析结果(以解析方式区分, 比如json, html),
+    解析结果与页面源码同时失效, 因此请求同一个url的检查项目无需重复解析
+    解析结果在多个线程之间共享, 必须是只读的
+    解析结果的大小不计入max_bytes
     """
 
-    def __init__(self):
-        self.__page_cache = dict()
+    def __init__(
+            self,
+            ttl: Union[int, float] = PAGE_CACHE_TTL,
+            max_bytes: int = PAGE_CACHE_MAX_BYTES,
+            compress: bool = PAGE_CACHE_COMPRESS,
+    ):
+        self.ttl: Final = ttl
+        self.max_bytes: Final = max_bytes
+        self.compress: Final = compress
+        # 值为[<过期时间>, <编码后的页面源码>, {<解析方式>: <解析结果>}]
+        self.__page_cache = OrderedDict()
+        self.__total_bytes = 0
+        self.__in_flight = dict()
+        self.__stats = self.__new_stats()
         self.threading_lock: Final = threading.RLock()
 
+    @staticmethod
+    def __new_stats() -> dict:
+        return {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "parsed_hits": 0}
+
     @staticmethod
     def __params_change(params: Union[dict, None]) -> Union[frozenset, None]:
         if params is None:
@@ -68,16 +870,149 @@ class PageCache:
             return frozenset(params.items())
         raise TypeError("'params' must be a dict or None")
 
-    def read(self, url: str, params: Union[dict, None]) -> str:
-        params = self.__params_change(params)
+    def __encode(self, page_source: str) -> bytes:
+        data = page_source.encode("utf-8")
+        if self.compress:
+            data = zlib.compress(data)
+        return data
+
+    def __decode(self, data: bytes) -> str:
+        if self.compress:
+            data = zlib.decompress(data)
+        return data.decode("utf-8")
+
+    def __pop(self, key: tuple):
+        _, data, _ = self.__page_cache.pop(key)
+        self.__total_bytes -= len(data)
+
+    def __get_entry(self, key: tuple) -> Union[list, None]:
+        # 调用者必须持有self.threading_lock
+        if (entry := self.__page_cache.get(key)) is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self.__pop(key)
+            self.__stats["expired"] += 1
+            return None
+        self.__page_cache.move_to_end(key)
+        return entry
+
+    def __read_entry(self, key: tuple) -> tuple:
+        with self.threading_lock:
+            if (entry := self.__get_entry(key)) is None:
+                self.__stats["misses"] += 1
+                return None, None
+            self.__stats["hits"] += 1
+        return self.__decode(entry[1]), entry
+
+    def __save(self, key: tuple, page_source: str, ttl: Union[int, float, None]) -> Union[list, None]:
+        data = self.__encode(page_source)
+        if len(data) > self.max_bytes:
+            return None
+        expire_time = time.monotonic() + (self.ttl if ttl is None else ttl)
+        entry = [expire_time, data, {}]
+        with self.threading_lock:
+            if key in self.__page_cache:
+                self.__pop(key)
+            self.__page_cache[key] = entry
+            self.__total_bytes += len(data)
+            while self.__total_bytes > self.max_bytes:
+                self.__pop(next(iter(self.__page_cache)))
+                self.__stats["evictions"] += 1
+        return entry
+
+    def read(self, url: str, params: Union[dict, None]) -> Union[str, None]:
+        return self.__read_entry((url, self.__params_change(params)))[0]
+
+    def save(self, url: str, params: Union[dict, None], page_source: str, ttl: Union[int, float, None] = None):
+        self.__save((url, self.__params_change(params)), page_source, ttl)
+
+    def read_or_fetch(
+            self,
+            url: str,
+            params: Union[dict, None],
+            fetch_func: Callable[[], str],
+            ttl: Union[int, float, None] = None,
+    ) -> str:
+        """ 读取页面缓存, 如果没有缓存, 则调用fetch_func请求页面源码并保存
+        如果其他线程正在请求同一个(<url>, <url参数>), 则等待其完成
+        如果其他线程的请求失败了, 则由当前线程重新请求
+        :param url: 要请求的url
+        :param params: url参数
+        :param fetch_func: 请求页面源码的函数
+        :param ttl: 缓存的有效期(单位: 秒), 默认为self.ttl
+        :return: 页面源码
+        """
+        return self.__read_or_fetch((url, self.__params_change(params)), fetch_func, ttl)[0]
+
+    def __read_or_fetch(self, key: tuple, fetch_func: Callable[[], str], ttl: Union[int, float, None]) -> tuple:
+        while True:
+            page_source, entry = self.__read_entry(key)
+            if page_source is not None:
+                return page_source, entry
+            with self.threading_lock:
+                if (event := self.__in_flight.get(key)) is None:
+                    event = self.__in_flight[key] = threading.Event()
+                    break
+            event.wait()
+        try:
+            page_source = fetch_func()
+            return page_source, self.__save(key, page_source, ttl)
+        finally:
+            with self.threading_lock:
+                del self.__in_flight[key]
+            event.set()
+
+    def read_or_fetch_parsed(
+            self,
+            url: str,
+            params: Union[dict, None],
+            kind: Hashable,
+            fetch_func: Callable[[], str],
+            parse_func: Callable[[str], Any],
+            ttl: Union[int, float, None] = None,
+    ) -> Any:
+        """ 与read_or_fetch相同, 但返回的是页面源码的解析结果
+        解析结果将附带在该页面的缓存中, 请求同一个(<url>, <url参数>)并使用相同解析方式的调用者将直接获得同一个对象
+        :param url: 要请求的url
+        :param params: url参数
+        :param kind: 解析方式, 可以是任何可哈希的对象, 比如"json", ("lxml", <css选择器>)
+        :param fetch_func: 请求页面源码的函数
+        :param parse_func: 解析页面源码的函数, 返回的对象必须是只读的
+        :param ttl: 缓存的有效期(单位: 秒), 默认为self.ttl
+        :return: 解析结果
+        """
+        key = (url, self.__params_change(params))
+        with self.threading_lock:
+            if (entry := self.__get_entry(key)) is not None and kind in entry[2]:
+                self.__stats["parsed_hits"] += 1
+                return entry[2][kind]
+        page_source, entry = self.__read_or_fetch(key, fetch_func, ttl)
+        parsed = parse_func(page_source)
+        if entry is not None:
+            with self.threading_lock:
+                # 解析期间缓存可能已被替换或淘汰, 此时不保存解析结果
+                if self.__page_cache.get(key) is entry:
+                    parsed = entry[2].setdefault(kind, parsed)
+        return parsed
+
+    def remove_expired(self):
+        """ 移除所有已过期的缓存 """
+        now = time.monotonic()
         with self.threading_lock:
-            return self.__page_cache.get((url, params))
+            for key in [k for k, (expire_time, _, _) in self.__page_cache.items() if expire_time <= now]:
+                self.__pop(key)
+                self.__stats["expired"] += 1
 
-    def save(self, url: str, params: Union[dict, None], page_source: str):
-        params = self.__params_change(params)
+    def pop_stats(self) -> dict:
+        """ 返回并重置缓存命中统计, 同时附带当前的缓存数量和总大小 """
         with self.threading_lock:
-            self.__page_cache[(url, params)] = page_source
+            stats = self.__stats
+            self.__stats = self.__new_stats()
+            stats["entries"] = len(self.__page_cache)
+            stats["bytes"] = self.__total_bytes
+        return stats
 
     def clear(self):
         with self.threading_lock:
             self.__page_cache.clear()
+            self.__total_bytes = 0
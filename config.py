@@ -22,6 +22,70 @@ ENABLE_MULTI_THREAD: Final = True
 # 多线程模式时使用的线程数(默认: 4, 建议不要超过8)
 MAX_THREADS_NUM: Final = 4
 
+# 是否启用多进程模式(优先于多线程模式)
+# 多进程模式下do_check方法在子进程中执行, 不受GIL限制, 适合页面解析耗时较多的情况
+# after_check, write_to_database, send_message以及页面缓存仍由主进程负责,
+# 启用了页面缓存, request_host为GitHub api或受主机限流(HOST_MAX_CONCURRENCY, HOST_REQUESTS_PER_SECOND),
+# 或者enable_subprocess属性为False的项目仍在主进程中以多线程模式执行
+ENABLE_MULTI_PROCESS: Final = False
+
+# 多进程模式时使用的进程数(默认: 2)
+MAX_PROCESSES_NUM: Final = 2
+
+# 是否启用asyncio模式(优先于多线程模式, 需要安装aiohttp)
+# asyncio模式下, 每个项目上次检查时通过request_url_text请求过的页面(只包括没有自定义请求头等参数的get请求),
+# 将在同一个事件循环中使用aiohttp并发地预先请求, 同样遵守主机限流(HOST_MAX_CONCURRENCY, HOST_REQUESTS_PER_SECOND),
+# 熔断器和条件请求, 之后do_check方法在MAX_THREADS_NUM个线程中执行, 直接解析预先请求得到的响应,
+# 其他请求(包括GitHub api, 流式请求以及使用SOCKS代理的请求)仍以同步的方式进行
+# 每个项目第一次检查时还没有可以预先请求的页面, 此时相当于多线程模式
+ENABLE_ASYNCIO: Final = False
+
+# asyncio模式时最多同时进行多少个预先请求(默认: 64)
+ASYNCIO_MAX_CONCURRENCY: Final = 64
+
+# 每个(主机, 代理)组合最多保留多少个长连接会话(默认与MAX_THREADS_NUM相同)
+SESSION_POOL_SIZE: Final = MAX_THREADS_NUM
+
+# 长连接会话的最大空闲时间, 超过后将被关闭(单位: 秒)(默认: 5分钟)
+SESSION_IDLE_TIMEOUT: Final = 5 * 60
+
+# 每个主机同时最多进行多少个请求, 键为主机名(同时匹配其子域名), 未列出的主机不限制
+HOST_MAX_CONCURRENCY: Final[Dict[str, int]] = {
+    "api.github.com": 4,
+    "sourceforge.net": 2,
+    "www.pling.com": 2,
+}
+
+# 每个主机每秒最多发起多少个请求(令牌桶), 键为主机名(同时匹配其子域名), 未列出的主机不限制
+HOST_REQUESTS_PER_SECOND: Final[Dict[str, float]] = {
+    "api.github.com": 5,
+    "sourceforge.net": 1,
+    "www.pling.com": 1,
+    "googlesource.com": 2,
+}
+
+# 同一主机连续请求失败多少次后熔断, 熔断期间该主机的请求将直接失败(默认: 3)
+CIRCUIT_BREAKER_FAILURE_THRESHOLD: Final = 3
+
+# 熔断的初始等待时间, 之后每次熔断翻倍(单位: 秒)(默认: 60秒)
+CIRCUIT_BREAKER_BASE_BACKOFF: Final = 60
+
+# 熔断等待时间的上限(单位: 秒)(默认: 60分钟)
+CIRCUIT_BREAKER_MAX_BACKOFF: Final = 60 * 60
+
+# 自上一次请求成功以来, 有多少个不同的主机发生网络错误时判定为网络或代理异常(默认: 4)
+NETWORK_ERROR_MIN_FAILED_HOSTS: Final = 4
+
+# 页面缓存的默认有效期, 过期前页面缓存可以跨越多轮检查使用(单位: 秒)(默认: 10分钟)
+# 检查项目也可以通过pagecache_ttl类属性单独设置有效期
+PAGE_CACHE_TTL: Final = 10 * 60
+
+# 页面缓存的容量上限, 超过后将淘汰最久未使用的缓存(单位: 字节)(默认: 32 MB)
+PAGE_CACHE_MAX_BYTES: Final = 32 * 1024 * 1024
+
+# 是否使用zlib压缩页面缓存
+PAGE_CACHE_COMPRESS: Final = True
+
 # 是否启用日志
 ENABLE_LOGGER: Final = True
 
@@ -31,6 +95,120 @@ LESS_LOG: Final = False
 # 循环检查的间隔时间(单位: 秒)(默认: 180分钟)
 LOOP_CHECK_INTERVAL: Final = 180 * 60
 
+# 是否启用错峰检查
+# 错峰检查时不再在每轮开始时同时启动所有项目, 而是把它们均匀地分散到整个检查间隔内依次启动,
+# 每个项目在一轮中的位置由其类名的哈希值决定(每轮都相同), 再加上一定的随机抖动
+# 错峰检查时总是以多线程的方式执行检查, 不受ENABLE_MULTI_THREAD等选项的影响
+ENABLE_STAGGERED_DISPATCH: Final = False
+
+# 错峰检查时用于分散启动项目的时间占检查间隔的比例, 剩下的时间留给失败重试(默认: 0.8)
+STAGGERED_DISPATCH_WINDOW_RATIO: Final = 0.8
+
+# 错峰检查时每个项目的启动时间随机抖动的幅度, 相对于相邻两个项目启动时间的间隔, 取值范围为0~1(默认: 0.5)
+STAGGERED_DISPATCH_JITTER: Final = 0.5
+
+# 错峰检查时每隔多少秒为接下来这段时间内启动的项目批量预先获取一次GitHub Release(GraphQL api),
+# 而不是在每轮开始时一次性获取, 以免较晚启动的项目使用过时的数据(单位: 秒)(默认: 60秒)
+STAGGERED_PREFETCH_SLICE: Final = 60
+
+# 每个项目检查的时间预算, 超过后正在进行的请求将被中断(关闭连接), 该项目视为检查失败(单位: 秒)(默认: 2分钟)
+CHECK_TIME_BUDGET: Final = 2 * 60
+
+# 每轮检查(包括重试)的时间预算, 超过后正在进行的检查将被中断, 剩下的项目也将直接视为检查超时(单位: 秒)
+# (默认与LOOP_CHECK_INTERVAL相同, 即保证每轮检查在下一轮开始之前结束)
+CYCLE_TIME_BUDGET: Final = LOOP_CHECK_INTERVAL
+
+# 每轮检查结束后, 检查失败的项目最多重试多少次(默认: 3)
+# 失败的项目将以多线程的方式同时重试, 每个项目的重试间隔各自按指数增长
+RETRY_MAX_ATTEMPTS: Final = 3
+
+# 重试的初始等待时间, 之后每次重试翻倍, 最长为RETRY_MAX_BACKOFF, 并加入随机抖动(单位: 秒)(默认: 10秒)
+RETRY_BASE_BACKOFF: Final = 10
+
+# 重试等待时间的上限(单位: 秒)(默认: 2分钟)
+RETRY_MAX_BACKOFF: Final = 2 * 60
+
+# 重试阶段的总时长上限, 超过后不再发起新的重试(单位: 秒)(默认: 10分钟)
+RETRY_DEADLINE: Final = 10 * 60
+
+# 重试时同一主机(request_host)最多同时重试多少个项目(默认: 1)
+RETRY_MAX_PER_HOST: Final = 1
+
+# 连续多少轮检查(包括重试)都失败的项目视为长期失败, 将在每轮检查结束时列出(默认: 3)
+CHRONIC_FAILURE_THRESHOLD: Final = 3
+
+# 是否启用调度模式
+# 调度模式下不再每隔LOOP_CHECK_INTERVAL集中检查所有项目, 而是按照每个项目各自的检查间隔单独安排检查,
+# 项目的检查间隔由CheckUpdate子类的check_interval属性指定, 没有指定时为LOOP_CHECK_INTERVAL
+# 下次检查的时间保存在数据库中, 重启之后仍然有效
+# 调度模式下总是以多线程的方式执行检查, 不受ENABLE_MULTI_THREAD等选项的影响
+ENABLE_SCHEDULER: Final = False
+
+# 调度模式时最多同时进行多少项检查(默认与MAX_THREADS_NUM相同)
+SCHEDULER_MAX_WORKERS: Final = MAX_THREADS_NUM
+
+# 调度模式下检查失败的项目在多久之后重试(单位: 秒)(默认: 10分钟)
+SCHEDULER_RETRY_INTERVAL: Final = 10 * 60
+
+# 调度模式下是否根据每个项目的更新历史自适应地调整检查间隔
+# 更新历史足够多的项目, 检查间隔为最近的更新间隔的中位数乘以ADAPTIVE_INTERVAL_FACTOR,
+# 如果距离上次更新的时间已经超过了这个中位数, 则以距离上次更新的时间代替, 因此长期没有更新的项目检查得越来越少
+# 更新历史不足的项目仍然使用check_interval属性或LOOP_CHECK_INTERVAL
+ENABLE_ADAPTIVE_INTERVAL: Final = True
+
+# 自适应检查间隔的系数, 即希望在更新发生之后多久发现(相对于典型的更新间隔)(默认: 0.1)
+ADAPTIVE_INTERVAL_FACTOR: Final = 0.1
+
+# 自适应检查间隔的最小值和最大值(单位: 秒)(默认: 15分钟, 24小时)
+ADAPTIVE_INTERVAL_MIN: Final = 15 * 60
+ADAPTIVE_INTERVAL_MAX: Final = 24 * 60 * 60
+
+# 至少有多少个更新间隔才开始自适应地调整检查间隔(默认: 3)
+ADAPTIVE_INTERVAL_MIN_SAMPLES: Final = 3
+
+# 只使用最近多少个更新间隔(默认: 20)
+ADAPTIVE_INTERVAL_HISTORY_SIZE: Final = 20
+
+# 调度模式下每隔多久进行一次例行维护, 包括重新发送之前发送失败的消息, 清理页面缓存, 记录统计信息等(单位: 秒)(默认: 30分钟)
+SCHEDULER_MAINTENANCE_INTERVAL: Final = 30 * 60
+
+# 是否启用多节点模式
+# 多节点模式下可以同时运行多个实例(比如在不同的机器或网络出口上), 它们共享同一个数据库(SQLITE_FILE),
+# 每个节点定期在数据库中续约自己的租约, 并按类名的一致性哈希只检查分配给自己的项目,
+# 某个节点的租约过期(比如该节点已经停止运行)后, 其负责的项目将由其他存活的节点接管
+# 检查和写入数据库之前还需要获得该项目的租约, 因此同一个项目不会被多个节点重复检查, 也不会重复发送消息
+# 项目的数据写入数据库(或者检查失败)之后立即释放其租约, 接管该项目的节点无需等待租约过期
+# 多节点模式只作用于自动循环检查(-a), 通过命令行(-c)或Bot检查单个项目时不参与分片, 也不会被登记为节点
+ENABLE_SHARDING: Final = False
+
+# 多节点模式下本节点的名字, 每个节点必须不同, 默认为"<主机名>-<进程号>"
+NODE_ID: Final[str] = os.getenv("NODE_ID", "")
+
+# 多节点模式下节点租约的有效期, 每隔三分之一的有效期续约一次(单位: 秒)(默认: 90秒)
+SHARD_NODE_LEASE_TTL: Final = 90
+
+# 多节点模式下项目租约的有效期, 应当长于单个项目检查的时间预算(单位: 秒)(默认: CHECK_TIME_BUDGET + 60秒)
+SHARD_ITEM_LEASE_TTL: Final = CHECK_TIME_BUDGET + 60
+
+# 一致性哈希环上每个节点的虚拟节点数, 越多则项目分配得越均匀(默认: 64)
+SHARD_VIRTUAL_NODES: Final = 64
+
+# 是否启用延迟写入
+# 启用后, 循环检查时各个项目的检查结果(以及验证器)先暂存在队列中, 之后在同一个事务中批量写入数据库,
+# 更新消息只在对应的数据写入数据库之后才在单独的线程中按顺序发送, 每轮检查结束时写入队列中剩下的所有数据
+ENABLE_WRITE_BEHIND: Final = False
+
+# 延迟写入队列中的条目数达到多少时立即写入(默认: 32)
+WRITE_BEHIND_MAX_SIZE: Final = 32
+
+# 延迟写入队列中的条目最多等待多久就写入(单位: 秒)(默认: 30秒)
+WRITE_BEHIND_MAX_DELAY: Final = 30
+
+# CheckUpdate.get_bs默认使用的html解析后端, 可选: "bs4"(默认)或"lxml"
+# "lxml"直接使用lxml.html构建文档树, 比BeautifulSoup快得多, 但需要安装cssselect, 否则解析时将抛出ImportError异常
+# 其返回的对象只兼容BeautifulSoup的常用接口, 建议通过CheckUpdate子类的html_parser_backend属性逐个启用
+HTML_PARSER_BACKEND: Final = "bs4"
+
 # 代理服务器, 默认从环境变量中读取http_proxy和https_proxy, 也可以根据情况自己设置
 PROXIES: Final[Dict[str, Union[str, None]]] = {
     "http": os.getenv("http_proxy", os.getenv("HTTP_PROXY", "")),
@@ -55,3 +233,13 @@ TG_SENDTO: Final[str] = os.getenv("TG_SENDTO", "")
 # 我们建议你设置一个**永不过期**且**没有任何权限**的token
 # "永不过期"意味着你不需要定期更新token, "没有任何权限"则是为了确保安全
 GITHUB_TOKEN: Final = os.getenv("GITHUB_TOKEN", "")
+
+# 配置了GITHUB_TOKEN时, 每轮检查开始前将使用GraphQL api批量获取所有GithubReleases项目的最新Release
+# 每个GraphQL查询最多包含多少个仓库(默认: 50)
+GITHUB_GRAPHQL_BATCH_SIZE: Final = 50
+
+# GitHub api的剩余配额不高于此值时, 将等待配额重置或推迟剩下的GitHub api请求(默认: 5)
+GITHUB_RATE_LIMIT_RESERVE: Final = 5
+
+# 遇到GitHub api速率限制时最多等待多少秒, 超过则将请求推迟到下一轮检查(单位: 秒)(默认: 60秒)
+GITHUB_RATE_LIMIT_MAX_WAIT: Final = 60
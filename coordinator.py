@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import abc
+import atexit
+import bisect
+import hashlib
+import os
+import socket
+import threading
+import time
+import typing
+from typing import Final, Optional
+
+from sqlalchemy import update, delete, or_
+from sqlalchemy.exc import IntegrityError
+
+from config import ENABLE_SHARDING, NODE_ID, SHARD_NODE_LEASE_TTL, SHARD_ITEM_LEASE_TTL, SHARD_VIRTUAL_NODES
+from database import DatabaseSession, NodeLease, ItemLease
+from logger import write_log_info, record_exceptions
+
+
+class LeaseLostException(Exception):
+
+    """ 本节点没有持有(或已经失去)该项目的租约 """
+
+class LeaseStore(abc.ABC):
+
+    """ 租约存储的接口
+    节点租约: 每个节点定期续约(心跳), 租约未过期的节点视为存活
+    项目租约: 同一时间只有一个节点可以持有某个项目的租约
+    所有时间均为Unix时间
+    """
+
+    @abc.abstractmethod
+    def heartbeat(self, node_id: str, expires: float):
+        """ 续约节点租约, 租约不存在时创建 """
+
+    @abc.abstractmethod
+    def remove_node(self, node_id: str):
+        """ 删除节点租约以及该节点持有的所有项目租约 """
+
+    @abc.abstractmethod
+    def get_live_nodes(self, now: float) -> list[str]:
+        """ 返回所有租约未过期的节点 """
+
+    @abc.abstractmethod
+    def acquire(self, name: str, node_id: str, expires: float, now: float) -> bool:
+        """ 获取或续约项目租约, 项目租约不存在, 已经过期或者本来就由该节点持有时成功 """
+
+    @abc.abstractmethod
+    def is_held(self, name: str, node_id: str, now: float) -> bool:
+        """ 该节点是否持有未过期的项目租约 """
+
+    @abc.abstractmethod
+    def release(self, name: str, node_id: str):
+        """ 释放项目租约, 只有该节点持有的租约才会被释放 """
+
+class SqliteLeaseStore(LeaseStore):
+
+    """ 基于SQLite数据库(database.NodeLease, database.ItemLease)的租约存储
+    所有节点需要访问同一个数据库文件
+    获取项目租约时使用带条件的UPDATE语句, 由SQLite的写锁保证同一时间只有一个节点成功
+    """
+
+    def heartbeat(self, node_id: str, expires: float):
+        with DatabaseSession() as session:
+            session.merge(NodeLease(NODE_ID=node_id, EXPIRES=expires))
+            session.commit()
+
+    def remove_node(self, node_id: str):
+        with DatabaseSession() as session:
+            session.execute(delete(NodeLease).where(NodeLease.NODE_ID == node_id))
+            session.execute(delete(ItemLease).where(ItemLease.OWNER == node_id))
+            session.commit()
+
+    def get_live_nodes(self, now: float) -> list[str]:
+        with DatabaseSession() as session:
+            return sorted(
+                node_id for node_id, in session.query(NodeLease.NODE_ID).filter(NodeLease.EXPIRES > now)
+            )
+
+    def acquire(self, name: str, node_id: str, expires: float, now: float) -> bool:
+        with DatabaseSession() as session:
+            result = session.execute(
+                update(ItemLease)
+                .where(ItemLease.ID == name, or_(ItemLease.OWNER == node_id, ItemLease.EXPIRES <= now))
+                .values(OWNER=node_id, EXPIRES=expires)
+            )
+            if result.rowcount:
+                session.commit()
+                return True
+            session.add(ItemLease(ID=name, OWNER=node_id, EXPIRES=expires))
+            try:
+                session.commit()
+            except IntegrityError:
+                # 其他节点持有该项目的租约
+                session.rollback()
+                return False
+            return True
+
+    def is_held(self, name: str, node_id: str, now: float) -> bool:
+        with DatabaseSession() as session:
+            return session.query(ItemLease).filter(
+                ItemLease.ID == name, ItemLease.OWNER == node_id, ItemLease.EXPIRES > now
+            ).count() > 0
+
+    def release(self, name: str, node_id: str):
+        with DatabaseSession() as session:
+            session.execute(delete(ItemLease).where(ItemLease.ID == name, ItemLease.OWNER == node_id))
+            session.commit()
+
+class HashRing:
+
+    """ 一致性哈希环
+    每个节点在环上有virtual_nodes个虚拟节点, 键由顺时针方向的第一个虚拟节点所属的节点负责
+    节点加入或退出时, 只有相邻区间的键需要重新分配
+    """
+
+    def __init__(self, nodes: typing.Iterable[str], virtual_nodes: int = SHARD_VIRTUAL_NODES):
+        self.nodes: Final = tuple(sorted(set(nodes)))
+        ring = sorted(
+            (self.hash("%s#%d" % (node, i)), node)
+            for node in self.nodes
+            for i in range(virtual_nodes)
+        )
+        self.__keys = [key for key, _ in ring]
+        self.__nodes = [node for _, node in ring]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        # 使用md5而不是hash(), 后者对字符串的结果在每个进程中都不同
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def get_node(self, key: str) -> Optional[str]:
+        """ 返回负责该键的节点, 环上没有节点时返回None """
+        if not self.__keys:
+            return None
+        return self.__nodes[bisect.bisect(self.__keys, self.hash(key)) % len(self.__keys)]
+
+class Coordinator:
+
+    """ 多节点模式的协调器
+    通过LeaseStore维护本节点的租约, 并根据所有存活的节点构建一致性哈希环, 以此决定本节点负责哪些项目
+    在检查一个项目之前, 还需要获得该项目的租约(acquire), 写入数据库之前再确认仍然持有该租约(holds),
+    检查完成之后释放该租约(release)
+    """
+
+    def __init__(
+            self,
+            store: LeaseStore,
+            node_id: str,
+            node_lease_ttl: typing.Union[int, float] = SHARD_NODE_LEASE_TTL,
+            item_lease_ttl: typing.Union[int, float] = SHARD_ITEM_LEASE_TTL,
+            virtual_nodes: int = SHARD_VIRTUAL_NODES,
+    ):
+        self.store: Final = store
+        self.node_id: Final = node_id
+        self.node_lease_ttl: Final = node_lease_ttl
+        self.item_lease_ttl: Final = item_lease_ttl
+        self.virtual_nodes: Final = virtual_nodes
+        self.__ring = HashRing((), virtual_nodes)
+        self.__last_refresh = 0
+        self.__stop_event = threading.Event()
+        self.__heartbeat_thread = None
+        self.threading_lock: Final = threading.RLock()
+
+    @property
+    def heartbeat_interval(self) -> float:
+        return self.node_lease_ttl / 3
+
+    def heartbeat(self) -> bool:
+        """
+        续约本节点的租约, 并根据存活的节点更新一致性哈希环
+        :return: 存活的节点是否发生了变化
+        """
+        now = time.time()
+        self.store.heartbeat(self.node_id, now + self.node_lease_ttl)
+        return self.__refresh_ring(now)
+
+    def __refresh_ring(self, now: float) -> bool:
+        """ 根据存活的节点更新一致性哈希环(只读, 不续约本节点的租约), 返回存活的节点是否发生了变化 """
+        live_nodes = tuple(self.store.get_live_nodes(now))
+        with self.threading_lock:
+            self.__last_refresh = now
+            if live_nodes == self.__ring.nodes:
+                return False
+            self.__ring = HashRing(live_nodes, self.virtual_nodes)
+            return True
+
+    def __ensure_fresh(self):
+        # 哈希环一般由心跳线程更新, 这里只在其过期时重新读取存活的节点, 不会续约本节点的租约,
+        # 因此没有启动心跳线程的进程不会被登记为存活的节点
+        if (now := time.time()) - self.__last_refresh >= self.heartbeat_interval:
+            self.__refresh_ring(now)
+
+    @property
+    def is_started(self) -> bool:
+        """ 心跳线程是否正在运行 """
+        with self.threading_lock:
+            return self.__heartbeat_thread is not None and not self.__stop_event.is_set()
+
+    def get_live_nodes(self) -> tuple[str, ...]:
+        self.__ensure_fresh()
+        return self.__ring.nodes
+
+    def owns(self, name: str) -> bool:
+        """ 根据一致性哈希, 该项目是否由本节点负责 """
+        self.__ensure_fresh()
+        return self.__ring.get_node(name) == self.node_id
+
+    def acquire(self, name: str) -> bool:
+        """ 如果该项目由本节点负责, 则获取(或续约)该项目的租约, 成功时返回True """
+        if not self.owns(name):
+            return False
+        now = time.time()
+        return self.store.acquire(name, self.node_id, now + self.item_lease_ttl, now)
+
+    def holds(self, name: str) -> bool:
+        """ 本节点是否仍然持有该项目的租约 """
+        return self.store.is_held(name, self.node_id, time.time())
+
+    def release(self, name: str):
+        """ 检查完成(并且数据已经写入数据库)之后释放该项目的租约, 其他节点接管该项目时无需等待租约过期 """
+        self.store.release(name, self.node_id)
+
+    def __heartbeat_loop(self):
+        while not self.__stop_event.wait(self.heartbeat_interval):
+            try:
+                if self.heartbeat():
+                    write_log_info("Live nodes changed: {%s}" % ", ".join(self.__ring.nodes))
+            except:
+                record_exceptions("Error while renewing the lease of node %s:" % self.node_id)
+
+    def start(self):
+        """ 启动心跳线程, 进程退出时自动释放本节点的所有租约 """
+        with self.threading_lock:
+            if self.__heartbeat_thread is not None:
+                return
+            self.heartbeat()
+            self.__heartbeat_thread = threading.Thread(target=self.__heartbeat_loop, daemon=True)
+            self.__heartbeat_thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """ 停止心跳线程, 并释放本节点的所有租约, 以便其他节点立即接管 """
+        self.__stop_event.set()
+        self.store.remove_node(self.node_id)
+
+_COORDINATOR: Optional[Coordinator] = None
+_COORDINATOR_LOCK: Final = threading.RLock()
+
+def get_coordinator() -> Optional[Coordinator]:
+    """ 返回本节点的协调器, 没有启用多节点模式时返回None """
+    global _COORDINATOR
+    if not ENABLE_SHARDING:
+        return None
+    with _COORDINATOR_LOCK:
+        if _COORDINATOR is None:
+            _COORDINATOR = Coordinator(SqliteLeaseStore(), NODE_ID or "%s-%d" % (socket.gethostname(), os.getpid()))
+        return _COORDINATOR
+
+def get_active_coordinator() -> Optional[Coordinator]:
+    """
+    返回已经启动的协调器, 没有启用多节点模式或者协调器尚未启动时返回None
+    协调器只在loop_check中启动, 只检查单个项目(命令行或Bot)时不参与分片
+    """
+    with _COORDINATOR_LOCK:
+        if _COORDINATOR is not None and _COORDINATOR.is_started:
+            return _COORDINATOR
+        return None
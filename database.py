@@ -4,13 +4,19 @@
 from __future__ import annotations
 import os
 import threading
-from collections import OrderedDict
+import time
+import typing
+from collections import OrderedDict, deque
+from types import MappingProxyType
+from typing import Union, Mapping, Callable, Optional, Final
 
-from sqlalchemy import create_engine, Column, String
+from sqlalchemy import create_engine, delete, update, Column, String, Float
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
-from config import SQLITE_FILE
+from config import SQLITE_FILE, WRITE_BEHIND_MAX_SIZE, WRITE_BEHIND_MAX_DELAY
+from logger import write_log_warning, record_exceptions
 
 
 if not os.path.isabs(SQLITE_FILE):
@@ -63,4 +69,336 @@ class Saved(_Base):
         with DatabaseSession() as session:
             return session.query(cls).filter_by(ID=name).one()
 
+    @classmethod
+    def get_saved_snapshot(cls) -> Mapping[str, Saved]:
+        """
+        一次性查询数据库中所有已存储的数据, 用于在一轮检查中代替逐个调用get_saved_info方法
+        :return: 只读的映射, 键为CheckUpdate子类的类名, 值为Saved对象
+        """
+        with DatabaseSession() as session:
+            return MappingProxyType({saved.ID: saved for saved in session.query(cls)})
+
+class Validator(_Base):
+
+    """ 保存了条件请求所需的验证器(ETag / Last-Modified)以及页面内容的指纹(BLAKE2)
+    键为(<CheckUpdate子类的类名>, <包含url参数的url>)
+    """
+
+    __tablename__ = "validators"
+    ID = Column(String, primary_key=True, nullable=False)
+    URL = Column(String, primary_key=True, nullable=False)
+    ETAG = Column(String)
+    LAST_MODIFIED = Column(String)
+    FINGERPRINT = Column(String)
+
+    @classmethod
+    def get_validator(cls, name: str, url: str) -> Union[Validator, None]:
+        """
+        根据name和url查询并返回数据库中已存储的验证器
+        :param name: CheckUpdate子类的类名
+        :param url: 包含url参数的url
+        :return: Validator对象, 如果数据不存在则返回None
+        """
+        with DatabaseSession() as session:
+            return session.query(cls).filter_by(ID=name, URL=url).one_or_none()
+
+    @classmethod
+    def get_validators(cls, name: str) -> dict[str, Validator]:
+        """
+        返回检查项目已存储的所有验证器, 即上次检查时请求过的所有url
+        :param name: CheckUpdate子类的类名
+        :return: 键为包含url参数的url, 值为Validator对象
+        """
+        with DatabaseSession() as session:
+            return {validator.URL: validator for validator in session.query(cls).filter_by(ID=name)}
+
+    @classmethod
+    def save_validators(cls, name: str, validators: dict[str, tuple[Union[str, None], ...]]):
+        """
+        保存验证器, 并删除该项目本次检查中没有请求过的url的验证器
+        :param name: CheckUpdate子类的类名
+        :param validators: 键为包含url参数的url, 值为(<ETag>, <Last-Modified>, <指纹>)
+        """
+        with DatabaseSession() as session:
+            session.execute(delete(cls).where(cls.ID == name, ~cls.URL.in_(validators.keys())))
+            for url, (etag, last_modified, fingerprint) in validators.items():
+                session.merge(cls(ID=name, URL=url, ETAG=etag, LAST_MODIFIED=last_modified, FINGERPRINT=fingerprint))
+            session.commit()
+
+class Schedule(_Base):
+
+    """ 保存了调度模式下每个检查项目下次检查的时间(Unix时间) """
+
+    __tablename__ = "schedules"
+    ID = Column(String, primary_key=True, nullable=False)
+    NEXT_CHECK_TIME = Column(Float, nullable=False)
+
+    @classmethod
+    def get_next_check_times(cls) -> dict[str, float]:
+        """
+        返回所有检查项目下次检查的时间
+        :return: 键为CheckUpdate子类的类名, 值为下次检查的时间
+        """
+        with DatabaseSession() as session:
+            return {id_: next_check_time for id_, next_check_time in session.query(cls.ID, cls.NEXT_CHECK_TIME)}
+
+    @classmethod
+    def set_next_check_time(cls, name: str, next_check_time: float):
+        """
+        保存检查项目下次检查的时间
+        :param name: CheckUpdate子类的类名
+        :param next_check_time: 下次检查的时间
+        """
+        with DatabaseSession() as session:
+            session.merge(cls(ID=name, NEXT_CHECK_TIME=next_check_time))
+            session.commit()
+
+class UpdateHistory(_Base):
+
+    """ 保存了每个检查项目实际发生更新(即write_to_database写入了新的数据)的时间(Unix时间) """
+
+    __tablename__ = "update_history"
+    ID = Column(String, primary_key=True, nullable=False)
+    UPDATE_TIME = Column(Float, primary_key=True, nullable=False)
+
+    @classmethod
+    def get_update_times(cls, name: Union[str, None] = None) -> dict[str, list[float]]:
+        """
+        返回检查项目的更新时间
+        :param name: CheckUpdate子类的类名, 为None时返回所有项目的更新时间
+        :return: 键为CheckUpdate子类的类名, 值为按时间先后排列的更新时间列表
+        """
+        with DatabaseSession() as session:
+            query = session.query(cls.ID, cls.UPDATE_TIME)
+            if name is not None:
+                query = query.filter_by(ID=name)
+            update_times = {}
+            for id_, update_time in query.order_by(cls.UPDATE_TIME):
+                update_times.setdefault(id_, []).append(update_time)
+            return update_times
+
+class NodeLease(_Base):
+
+    """ 多节点模式下每个节点的租约, 节点定期续约(心跳), 租约未过期(EXPIRES, Unix时间)的节点视为存活 """
+
+    __tablename__ = "node_leases"
+    NODE_ID = Column(String, primary_key=True, nullable=False)
+    EXPIRES = Column(Float, nullable=False)
+
+class ItemLease(_Base):
+
+    """ 多节点模式下每个检查项目的租约, 同一时间只有持有租约(OWNER)的节点可以检查该项目并写入数据库 """
+
+    __tablename__ = "item_leases"
+    ID = Column(String, primary_key=True, nullable=False)
+    OWNER = Column(String, nullable=False)
+    EXPIRES = Column(Float, nullable=False)
+
 _Base.metadata.create_all(_Engine)
+
+class WriteBehindQueue:
+
+    """ 延迟写入数据库的队列
+    各个线程要写入的数据(Saved, UpdateHistory, Validator)先暂存在队列中, 之后在同一个事务中批量写入(INSERT ... ON CONFLICT)
+    队列中的条目数达到max_size, 或者最早的条目已经等待了max_delay秒时自动写入, 也可以调用flush方法立即写入
+    还可以登记回调函数(比如发送更新消息), 回调函数只在此前进入队列的数据提交之后才会执行,
+    因此不会出现消息已经发送但数据没有写入数据库的情况, 没来得及写入的更新在下次检查时会被重新发现
+    回调函数在单独的线程中按照登记的顺序执行, 不会阻塞写入数据的线程
+    多节点模式下, 写入时指定了lease_owner的项目会在提交数据的事务中再次确认该节点仍然持有其租约,
+    已经失去租约的项目的数据和回调函数将被丢弃, 由接管该项目的节点负责
+    写入失败时数据和回调函数将放回队列, 等待下次写入
+    """
+
+    def __init__(self, max_size: int = WRITE_BEHIND_MAX_SIZE, max_delay: Union[int, float] = WRITE_BEHIND_MAX_DELAY):
+        self.max_size: Final = max_size
+        self.max_delay: Final = max_delay
+        # 键为ID, 同一项目多次写入时只保留最后一次
+        self.__saved = dict()
+        self.__update_history = list()
+        # 键为ID, 值为{<URL>: <Validator数据>}
+        self.__validators = dict()
+        # 元素为(<ID或None>, <回调函数>)
+        self.__callbacks = list()
+        # 写入时需要持有租约的项目, 键为ID, 值为节点名
+        self.__lease_owners = dict()
+        self.__timer = None
+        self.threading_lock: Final = threading.RLock()
+        # 保证各批数据按顺序提交, 回调函数也按照同样的顺序进入待执行队列
+        self.__flush_lock: Final = threading.RLock()
+        # 数据已经提交, 等待执行的回调函数, 由同一时间最多只有一个的回调线程依次执行
+        self.__pending_callbacks = deque()
+        self.__callback_thread = None
+
+    def __len__(self) -> int:
+        with self.threading_lock:
+            return len(self.__saved) + len(self.__update_history) + sum(map(len, self.__validators.values()))
+
+    def __after_put(self):
+        with self.threading_lock:
+            if self.__timer is None:
+                self.__timer = threading.Timer(self.max_delay, self.__flush_safely)
+                self.__timer.daemon = True
+                self.__timer.start()
+            is_full = len(self) >= self.max_size
+        if is_full:
+            self.__flush_safely()
+
+    def __require_lease(self, name: str, lease_owner: Optional[str]):
+        if lease_owner is not None:
+            self.__lease_owners[name] = lease_owner
+
+    def put_saved(self, row: dict, update_time: Optional[float] = None, lease_owner: Optional[str] = None):
+        """
+        写入(或更新)一条Saved数据
+        :param row: 包含Saved所有字段的字典
+        :param update_time: 不为None时同时写入一条UpdateHistory数据
+        :param lease_owner: 不为None时, 只有该节点在提交时仍然持有该项目的租约才写入
+        """
+        with self.threading_lock:
+            self.__saved[row["ID"]] = row
+            if update_time is not None:
+                self.__update_history.append({"ID": row["ID"], "UPDATE_TIME": update_time})
+            self.__require_lease(row["ID"], lease_owner)
+        self.__after_put()
+
+    def put_validators(
+            self, name: str, validators: dict[str, tuple[Union[str, None], ...]], lease_owner: Optional[str] = None,
+    ):
+        """
+        写入验证器, 参数与Validator.save_validators相同, 写入时同样删除该项目没有包含在validators中的验证器
+        lease_owner参数与put_saved方法相同
+        """
+        with self.threading_lock:
+            self.__validators[name] = {
+                url: {"ID": name, "URL": url, "ETAG": etag, "LAST_MODIFIED": last_modified, "FINGERPRINT": fingerprint}
+                for url, (etag, last_modified, fingerprint) in validators.items()
+            }
+            self.__require_lease(name, lease_owner)
+        self.__after_put()
+
+    def add_callback(self, callback: Callable[[], typing.Any], name: Optional[str] = None):
+        """
+        登记一个回调函数, 在此前进入队列的数据写入数据库之后执行
+        :param callback: 回调函数
+        :param name: 回调函数所属项目的ID, 不为None时, 如果该项目的数据由于失去租约而被丢弃, 则回调函数也被丢弃
+        """
+        with self.threading_lock:
+            self.__callbacks.append((name, callback))
+        self.__after_put()
+
+    @staticmethod
+    def __upsert(session: Session, table: type, rows: list, index_elements: list):
+        stmt = sqlite_insert(table).values(rows)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={key: stmt.excluded[key] for key in rows[0].keys() if key not in index_elements},
+        ))
+
+    @staticmethod
+    def __get_lost_leases(session: Session, lease_owners: dict[str, str]) -> set[str]:
+        """ 在当前事务中返回已经不再由对应节点持有(或已过期)租约的项目 """
+        if not lease_owners:
+            return set()
+        # 先执行一次不改变数据的UPDATE以获得数据库的写锁, 在提交之前其他节点无法获取(接管)这些项目的租约
+        session.execute(
+            update(ItemLease).where(ItemLease.ID.in_(lease_owners.keys())).values(EXPIRES=ItemLease.EXPIRES)
+        )
+        now = time.time()
+        held = {
+            (name, owner)
+            for name, owner in session.query(ItemLease.ID, ItemLease.OWNER).filter(
+                ItemLease.ID.in_(lease_owners.keys()), ItemLease.EXPIRES > now
+            )
+        }
+        return {name for name, owner in lease_owners.items() if (name, owner) not in held}
+
+    def flush(self) -> int:
+        """
+        立即将队列中的数据在同一个事务中写入数据库, 然后在回调线程中执行回调函数
+        :return: 写入的数据条数
+        """
+        with self.__flush_lock:
+            with self.threading_lock:
+                if self.__timer is not None:
+                    self.__timer.cancel()
+                    self.__timer = None
+                saved, self.__saved = self.__saved, dict()
+                update_history, self.__update_history = self.__update_history, list()
+                validators, self.__validators = self.__validators, dict()
+                callbacks, self.__callbacks = self.__callbacks, list()
+                lease_owners, self.__lease_owners = self.__lease_owners, dict()
+            lost_leases = set()
+            try:
+                if saved or update_history or validators:
+                    with DatabaseSession() as session:
+                        if lost_leases := self.__get_lost_leases(session, lease_owners):
+                            saved = {k: v for k, v in saved.items() if k not in lost_leases}
+                            update_history = [row for row in update_history if row["ID"] not in lost_leases]
+                            validators = {k: v for k, v in validators.items() if k not in lost_leases}
+                        if saved:
+                            self.__upsert(session, Saved, list(saved.values()), ["ID"])
+                        if update_history:
+                            session.execute(sqlite_insert(UpdateHistory).values(update_history).on_conflict_do_nothing())
+                        for name, rows in validators.items():
+                            session.execute(delete(Validator).where(
+                                Validator.ID == name, ~Validator.URL.in_(rows.keys())
+                            ))
+                            if rows:
+                                self.__upsert(session, Validator, list(rows.values()), ["ID", "URL"])
+                        session.commit()
+            except:
+                # 放回队列, 已经有更新的数据的条目以新的数据为准
+                with self.threading_lock:
+                    self.__saved = {**saved, **self.__saved}
+                    self.__update_history = update_history + self.__update_history
+                    self.__validators = {**validators, **self.__validators}
+                    self.__callbacks = callbacks + self.__callbacks
+                    self.__lease_owners = {**lease_owners, **self.__lease_owners}
+                raise
+            if lost_leases:
+                write_log_warning(
+                    "Leases of {%s} were lost before writing to database, dropped their data and callbacks"
+                    % ", ".join(sorted(lost_leases))
+                )
+            self.__run_callbacks_later(callback for name, callback in callbacks if name not in lost_leases)
+            return len(saved) + len(update_history) + sum(map(len, validators.values()))
+
+    def __run_callbacks_later(self, callbacks: typing.Iterable[Callable[[], typing.Any]]):
+        with self.threading_lock:
+            self.__pending_callbacks.extend(callbacks)
+            if self.__pending_callbacks and self.__callback_thread is None:
+                # 不使用守护线程, 进程退出之前仍会执行完已经提交的数据对应的回调函数
+                self.__callback_thread = threading.Thread(target=self.__callback_loop)
+                self.__callback_thread.start()
+
+    def __callback_loop(self):
+        while True:
+            with self.threading_lock:
+                if not self.__pending_callbacks:
+                    self.__callback_thread = None
+                    return
+                callback = self.__pending_callbacks.popleft()
+            try:
+                callback()
+            except:
+                record_exceptions("Error while running the callback after writing to database:")
+
+    def wait_callbacks(self):
+        """ 等待所有已经提交的数据对应的回调函数执行完毕 """
+        while True:
+            with self.threading_lock:
+                callback_thread = self.__callback_thread
+            if callback_thread is None:
+                return
+            callback_thread.join()
+
+    def __flush_safely(self):
+        try:
+            self.flush()
+        except:
+            record_exceptions("Error while writing to database, will try again later:")
+            with self.threading_lock:
+                if self.__timer is None:
+                    self.__timer = threading.Timer(self.max_delay, self.__flush_safely)
+                    self.__timer.daemon = True
+                    self.__timer.start()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import re
+import typing
+from functools import lru_cache
+from typing import Union, Final, Optional, List
+
+import lxml.html
+from bs4 import SoupStrainer
+from lxml import etree
+
+try:
+    # cssselect是可选的依赖, 没有安装时只能使用BeautifulSoup
+    from cssselect import HTMLTranslator
+except ImportError:
+    HTMLTranslator = None
+
+
+LXML_BACKEND_AVAILABLE: Final = HTMLTranslator is not None
+
+# 与BeautifulSoup一致, get_text不包括这些元素中的文本
+_SKIPPED_TEXT_TAGS: Final = frozenset({"script", "style", "template"})
+
+# 可以转换为SoupStrainer的css选择器: 单个复合选择器, 由标签名, 一个id, class和属性选择器组成
+_SELECTOR_PART_PATTERN: Final = r"""
+    \#(?P<id>[\w-]+)
+    | \.(?P<class>[\w-]+)
+    | \[(?P<attr>[\w-]+)(?:=(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[\w-]+)))?\]
+"""
+_STRAINABLE_SELECTOR_RE: Final = re.compile(r"(?P<tag>[a-zA-Z][\w-]*)?(?:%s)*" % _SELECTOR_PART_PATTERN, re.VERBOSE)
+_SELECTOR_PART_RE: Final = re.compile(_SELECTOR_PART_PATTERN, re.VERBOSE)
+
+# 与BeautifulSoup(HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES)一致, 这些属性的值是以空白字符分隔的多个值,
+# 读取时返回列表, 键为标签名, "*"适用于所有标签
+_MULTI_VALUED_ATTRIBUTES: Final = {
+    "*": frozenset({"class", "accesskey", "dropzone"}),
+    "a": frozenset({"rel", "rev"}),
+    "link": frozenset({"rel", "rev"}),
+    "td": frozenset({"headers"}),
+    "th": frozenset({"headers"}),
+    "form": frozenset({"accept-charset"}),
+    "object": frozenset({"archive"}),
+    "area": frozenset({"rel"}),
+    "icon": frozenset({"sizes"}),
+    "iframe": frozenset({"sandbox"}),
+    "output": frozenset({"for"}),
+}
+
+def _is_multi_valued(tag: str, key: str) -> bool:
+    return key in _MULTI_VALUED_ATTRIBUTES["*"] or key in _MULTI_VALUED_ATTRIBUTES.get(tag, ())
+
+def _get_attr(element: lxml.html.HtmlElement, key: str, default=None) -> Union[str, List[str], None]:
+    """ 与BeautifulSoup一致, 多值属性(比如class, rel)返回按空白字符拆分的列表 """
+    value = element.get(key)
+    if value is None:
+        return default
+    return value.split() if _is_multi_valued(element.tag, key) else value
+
+def _match_attr(element: lxml.html.HtmlElement, key: str, expected) -> bool:
+    """
+    与BeautifulSoup的find/find_all一致的属性匹配:
+    True表示属性存在, None表示属性不存在, 列表等表示与其中任意一个匹配, 正则表达式对象使用search匹配,
+    对于多值属性, 与其中任意一个值或者整个属性值(以单个空格连接)相同即可匹配, 比如"a"和"a b"都能匹配class="a b"
+    """
+    value = element.get(key)
+    if expected is True:
+        return value is not None
+    if expected is None:
+        return value is None
+    if value is None:
+        return False
+    if isinstance(expected, (list, tuple, set, frozenset)):
+        return any(_match_attr(element, key, e) for e in expected)
+    if _is_multi_valued(element.tag, key):
+        values = value.split()
+        candidates = [" ".join(values), *values]
+    else:
+        candidates = [value]
+    if isinstance(expected, re.Pattern):
+        return any(expected.search(c) for c in candidates)
+    return expected in candidates
+
+def _match_attrs(element: lxml.html.HtmlElement, attrs: Optional[dict]) -> bool:
+    return not attrs or all(_match_attr(element, k, v) for k, v in attrs.items())
+
+@lru_cache(maxsize=256)
+def _compile_selector(selector: str) -> etree.XPath:
+    # 与BeautifulSoup一致, 只匹配后代元素, 不匹配元素本身
+    return etree.XPath(HTMLTranslator().css_to_xpath(selector, prefix="descendant::"))
+
+@lru_cache(maxsize=256)
+def _compile_region_selector(selector: str) -> etree.XPath:
+    # 从文档根元素开始匹配, 因此包括根元素本身, 相当于从文档节点开始匹配
+    return etree.XPath(HTMLTranslator().css_to_xpath(selector, prefix="descendant-or-self::"))
+
+class LxmlElement:
+
+    """ 对lxml.html元素的简单包装
+    提供与BeautifulSoup的Tag兼容的常用接口: select, select_one, find, find_all, get_text, get, []
+    因此检查项目无需关心get_bs返回的是哪种对象
+    """
+
+    __slots__ = ("_element", )
+
+    def __init__(self, element: lxml.html.HtmlElement):
+        self._element = element
+
+    @property
+    def name(self) -> str:
+        return self._element.tag
+
+    @property
+    def attrs(self) -> dict:
+        return {k: _get_attr(self._element, k) for k in self._element.attrib}
+
+    @property
+    def text(self) -> str:
+        return self.get_text()
+
+    def select(self, selector: str) -> List["LxmlElement"]:
+        return [LxmlElement(e) for e in _compile_selector(selector)(self._element)]
+
+    def select_one(self, selector: str) -> Optional["LxmlElement"]:
+        results = _compile_selector(selector)(self._element)
+        return LxmlElement(results[0]) if results else None
+
+    def find_all(self, name: str, attrs: Optional[dict] = None) -> List["LxmlElement"]:
+        return [
+            LxmlElement(e)
+            for e in self._element.iterdescendants(name)
+            if _match_attrs(e, attrs)
+        ]
+
+    def find(self, name: str, attrs: Optional[dict] = None) -> Optional["LxmlElement"]:
+        for e in self._element.iterdescendants(name):
+            if _match_attrs(e, attrs):
+                return LxmlElement(e)
+        return None
+
+    def _iter_text(self) -> typing.Iterator[str]:
+        """ 与BeautifulSoup一致, 不包括<script>, <style>, <template>子元素以及注释中的文本 """
+        def _iter(element: lxml.html.HtmlElement) -> typing.Iterator[str]:
+            if element.text:
+                yield element.text
+            for child in element:
+                if isinstance(child.tag, str) and child.tag not in _SKIPPED_TEXT_TAGS:
+                    yield from _iter(child)
+                if child.tail:
+                    yield child.tail
+        return _iter(self._element)
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        texts = self._iter_text()
+        if strip:
+            texts = [t.strip() for t in texts if t.strip()]
+        return separator.join(texts)
+
+    def get(self, key: str, default=None):
+        return _get_attr(self._element, key, default)
+
+    def has_attr(self, key: str) -> bool:
+        return key in self._element.attrib
+
+    def __getitem__(self, key: str) -> Union[str, List[str]]:
+        # 与BeautifulSoup一致, 属性不存在时抛出KeyError
+        if key not in self._element.attrib:
+            raise KeyError(key)
+        return _get_attr(self._element, key)
+
+    def __bool__(self) -> bool:
+        # lxml元素在没有子元素时为假, 这与BeautifulSoup的Tag不同
+        return True
+
+    def __repr__(self) -> str:
+        return etree.tostring(self._element, encoding="unicode", with_tail=False)
+
+class LxmlDocument(LxmlElement):
+
+    """ 整个文档的LxmlElement对象, 对应BeautifulSoup对象本身
+    与BeautifulSoup一致, 选择器从文档节点开始匹配, 因此可以匹配到根元素(比如"html > body"), find方法也可以找到根元素
+    """
+
+    __slots__ = ()
+
+    @property
+    def name(self) -> str:
+        return "[document]"
+
+    def select(self, selector: str) -> List[LxmlElement]:
+        return [LxmlElement(e) for e in _compile_region_selector(selector)(self._element)]
+
+    def select_one(self, selector: str) -> Optional[LxmlElement]:
+        results = _compile_region_selector(selector)(self._element)
+        return LxmlElement(results[0]) if results else None
+
+    def find_all(self, name: str, attrs: Optional[dict] = None) -> List[LxmlElement]:
+        return [
+            LxmlElement(e)
+            for e in self._element.iter(name)
+            if _match_attrs(e, attrs)
+        ]
+
+    def find(self, name: str, attrs: Optional[dict] = None) -> Optional[LxmlElement]:
+        for e in self._element.iter(name):
+            if _match_attrs(e, attrs):
+                return LxmlElement(e)
+        return None
+
+def _document_fromstring(html_text: Union[str, bytes]) -> lxml.html.HtmlElement:
+    try:
+        return lxml.html.document_fromstring(html_text)
+    except ValueError:
+        # 带有编码声明的字符串
+        return lxml.html.document_fromstring(html_text.encode("utf-8"))
+    except etree.ParserError:
+        # 空文档
+        return lxml.html.document_fromstring("<html></html>")
+
+def prune_to_regions(root: lxml.html.HtmlElement, selector: str) -> lxml.html.HtmlElement:
+    """
+    裁剪文档树, 只保留与css选择器匹配的区域及其祖先元素, 其余元素全部丢弃
+    保留祖先元素是为了让检查项目中原有的选择器(比如"#main > article")仍然有效
+    注意: 由于与区域无关的兄弟元素会被丢弃, 选择器不能依赖兄弟关系("+", "~")或位置(":nth-child"等),
+    并且祖先元素中位于被丢弃元素之后的文本也会一同丢弃
+    :param root: 文档根元素
+    :param selector: 需要保留的区域的css选择器
+    :return: 裁剪后的文档根元素(即root本身)
+    """
+    regions = set(_compile_region_selector(selector)(root))
+    # 只保留最外层的区域
+    ancestors = set()
+    for region in regions:
+        region_ancestors = list(region.iterancestors())
+        if not regions.intersection(region_ancestors):
+            ancestors.update(region_ancestors)
+    for ancestor in ancestors:
+        for child in list(ancestor):
+            if child not in ancestors and child not in regions:
+                ancestor.remove(child)
+    if root not in ancestors and root not in regions:
+        # 没有匹配到任何区域
+        for child in list(root):
+            root.remove(child)
+    return root
+
+def _match_class_names(class_names: frozenset) -> typing.Callable[[Union[str, List[str], None]], bool]:
+    """ 返回用于SoupStrainer的函数, 与css的class选择器一致, 只要元素的class中包含所有class_names即可匹配 """
+    def _match(value: Union[str, List[str], None]) -> bool:
+        if value is None:
+            return False
+        # 解析时传入的是原始的属性值字符串, 而不是已经按空白字符拆分的列表
+        if isinstance(value, str):
+            value = value.split()
+        return class_names.issubset(value)
+    return _match
+
+@lru_cache(maxsize=64)
+def selector_to_soup_strainer(selector: str) -> SoupStrainer:
+    """
+    将css选择器转换为BeautifulSoup的SoupStrainer, 用于只为与之匹配的区域构建BeautifulSoup对象
+    SoupStrainer只能根据元素自身的标签名和属性进行匹配, 因此只支持单个复合选择器,
+    比如"article", "#main", ".CommitLog", "select[data-os-selected]", "div#main.content.wide",
+    与css一致, class选择器匹配class属性中的单个class名, 元素还有其他class时也能匹配
+    不支持组合符(" ", ">", "+", "~"), 多个选择器(","), 伪类或者与class选择器同时使用的[class=...],
+    否则抛出ValueError异常
+    :param selector: css选择器
+    :return: SoupStrainer对象
+    """
+    selector = selector.strip()
+    if not selector or (match := _STRAINABLE_SELECTOR_RE.fullmatch(selector)) is None:
+        raise ValueError(
+            "Cannot convert css selector %r to SoupStrainer: only a single compound selector made up of "
+            "a tag name, an id, a class and attribute selectors is supported" % selector
+        )
+    tag_name = match.group("tag")
+    attrs = {}
+    class_names = set()
+    for part in _SELECTOR_PART_RE.finditer(selector, match.end("tag") if tag_name else 0):
+        if part.group("id") is not None:
+            key, value = "id", part.group("id")
+        elif part.group("class") is not None:
+            class_names.add(part.group("class"))
+            continue
+        else:
+            key = part.group("attr")
+            value = next((v for v in part.group("dq", "sq", "bare") if v is not None), True)
+        if key in attrs:
+            raise ValueError("Cannot convert css selector %r to SoupStrainer: duplicate %r" % (selector, key))
+        attrs[key] = value
+    if class_names:
+        if "class" in attrs:
+            raise ValueError("Cannot convert css selector %r to SoupStrainer: duplicate 'class'" % selector)
+        attrs["class"] = _match_class_names(frozenset(class_names))
+    return SoupStrainer(tag_name, attrs)
+
+def parse_html(html_text: Union[str, bytes], parse_only: Optional[str] = None) -> LxmlDocument:
+    """
+    使用lxml.html解析html, 返回与BeautifulSoup对象兼容的LxmlDocument对象
+    需要安装cssselect
+    :param html_text: html源码
+    :param parse_only: 如果不为None, 则只保留与该css选择器匹配的区域, 参见prune_to_regions函数
+    :return: LxmlDocument对象
+    """
+    if not LXML_BACKEND_AVAILABLE:
+        raise ImportError("The lxml backend requires the cssselect package")
+    root = _document_fromstring(html_text)
+    if parse_only is not None:
+        root = prune_to_regions(root, parse_only)
+    return LxmlDocument(root)
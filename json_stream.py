@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import json
+from typing import Iterable, Iterator, Sequence, Any
+
+
+_JSON_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# 数字之后只能出现的字符, 数字后面是其他字符(或者位于缓冲区末尾)时, 它可能被截断了
+_NUMBER_DELIMITERS = _WHITESPACE + ",]}"
+
+class _JsonStreamReader:
+
+    """ 从文本块的迭代器中逐步读取json值
+    只在缓冲区中保留尚未解析的文本, 已解析的部分会被丢弃
+    """
+
+    def __init__(self, chunks: Iterable[str]):
+        self.__chunks = iter(chunks)
+        self.__buffer = ""
+        self.__pos = 0
+        self.__exhausted = False
+
+    def __fill(self) -> bool:
+        """ 读取下一个文本块, 没有更多文本时返回False """
+        if self.__exhausted:
+            return False
+        for chunk in self.__chunks:
+            if chunk:
+                break
+        else:
+            self.__exhausted = True
+            return False
+        if self.__pos:
+            # 丢弃已解析的部分
+            self.__buffer = self.__buffer[self.__pos:]
+            self.__pos = 0
+        self.__buffer += chunk
+        return True
+
+    def __fill_until(self, min_length: int) -> bool:
+        """ 读取文本块, 直到缓冲区中未解析的文本长度不小于min_length, 没有更多文本时返回False """
+        while len(self.__buffer) - self.__pos < min_length:
+            if not self.__fill():
+                return False
+        return True
+
+    def next_char(self) -> str:
+        """ 跳过空白字符, 返回并消耗下一个字符 """
+        char = self.peek_char()
+        self.__pos += 1
+        return char
+
+    def peek_char(self) -> str:
+        """ 跳过空白字符, 返回下一个字符(不消耗) """
+        while True:
+            while self.__pos < len(self.__buffer) and self.__buffer[self.__pos] in _WHITESPACE:
+                self.__pos += 1
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def expect(self, expected: str):
+        if (char := self.next_char()) != expected:
+            raise ValueError("Expecting '%s', got '%s'" % (expected, char))
+
+    def decode_value(self) -> Any:
+        """ 解析并返回下一个完整的json值 """
+        is_number = self.peek_char() in "-0123456789"
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.__buffer, self.__pos)
+            except json.JSONDecodeError:
+                value, end = None, None
+            # 位于缓冲区末尾的值可能被截断了, 需要读取更多文本再确认
+            # 数字则必须等到其后出现分隔符, 比如"1."和"2e"也能被解析为1和2, 但其后的文本可能还没有读取
+            if end is not None and (self.__exhausted or (
+                    end < len(self.__buffer) and (not is_number or self.__buffer[end] in _NUMBER_DELIMITERS)
+            )):
+                self.__pos = end
+                return value
+            # 每次至少让缓冲区加倍, 避免对较大的值反复从头解析
+            if not self.__fill_until((len(self.__buffer) - self.__pos) * 2):
+                if end is None:
+                    # 再解析一次以抛出准确的异常
+                    _JSON_DECODER.raw_decode(self.__buffer, self.__pos)
+
+def iter_json_array(chunks: Iterable[str], path: Sequence[str] = ()) -> Iterator[Any]:
+    """
+    流式解析json, 逐个返回path所指向的数组中的元素
+    每个元素在完整读取之后立即返回, 调用者可以随时停止迭代, 剩下的文本将不会被读取
+    :param chunks: json文本块的迭代器
+    :param path: 从根对象到目标数组所经过的键, 默认为空(即根元素就是数组), 比如("os_list", )
+    :return: 数组元素的迭代器
+    """
+    reader = _JsonStreamReader(chunks)
+    for key in path:
+        reader.expect("{")
+        if reader.peek_char() == "}":
+            raise KeyError(key)
+        while True:
+            current_key = reader.decode_value()
+            reader.expect(":")
+            if current_key == key:
+                break
+            # 跳过不需要的值
+            reader.decode_value()
+            if (char := reader.next_char()) == "}":
+                raise KeyError(key)
+            if char != ",":
+                raise ValueError("Expecting ',' or '}', got '%s'" % char)
+    reader.expect("[")
+    if reader.peek_char() == "]":
+        return
+    while True:
+        yield reader.decode_value()
+        if (char := reader.next_char()) == "]":
+            return
+        if char != ",":
+            raise ValueError("Expecting ',' or ']', got '%s'" % char)
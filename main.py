@@ -2,23 +2,43 @@
 # encoding: utf-8
 
 from argparse import ArgumentParser
+import asyncio
+import functools
 import json
+import random
 import time
 import sys
 import logging
+import threading
+import traceback
 import typing
+import multiprocessing
+import zlib
+from collections import Counter
+from contextlib import contextmanager
 from typing import Optional, Union, Tuple, Final
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
 from requests import exceptions as req_exceptions
 
 from config import (
-    ENABLE_SENDMESSAGE, LOOP_CHECK_INTERVAL, ENABLE_MULTI_THREAD, MAX_THREADS_NUM, LESS_LOG, PROXIES
+    ENABLE_SENDMESSAGE, LOOP_CHECK_INTERVAL, ENABLE_MULTI_THREAD, MAX_THREADS_NUM, LESS_LOG, PROXIES,
+    ENABLE_MULTI_PROCESS, MAX_PROCESSES_NUM, ENABLE_ASYNCIO, ASYNCIO_MAX_CONCURRENCY,
+    ENABLE_STAGGERED_DISPATCH, STAGGERED_DISPATCH_WINDOW_RATIO, STAGGERED_DISPATCH_JITTER, STAGGERED_PREFETCH_SLICE,
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_BACKOFF, RETRY_MAX_BACKOFF, RETRY_DEADLINE, RETRY_MAX_PER_HOST,
+    CHRONIC_FAILURE_THRESHOLD, CHECK_TIME_BUDGET, CYCLE_TIME_BUDGET, ENABLE_WRITE_BEHIND,
+    ENABLE_SCHEDULER, SCHEDULER_MAX_WORKERS, SCHEDULER_MAINTENANCE_INTERVAL, ADAPTIVE_INTERVAL_HISTORY_SIZE,
 )
-from check_init import PAGE_CACHE, CheckUpdate, CheckMultiUpdate, GithubReleases
+from check_init import PAGE_CACHE, CheckUpdate, CheckMultiUpdate, GithubReleases, SfCheck
 from check_list import CHECK_LIST
-from common import request_url
-from database import DatabaseSession, Saved
+from common import (
+    request_url, SESSION_POOL, GITHUB_RATE_LIMITER, CIRCUIT_BREAKERS, CONNECTIVITY_DETECTOR, GithubRateLimitDeferred,
+    HOST_THROTTLE, CircuitOpenException, CheckTimeoutException, CancelScope, cancel_scope, new_async_session,
+)
+from coordinator import Coordinator, LeaseLostException, get_coordinator, get_active_coordinator
+from database import DatabaseSession, Saved, Schedule, UpdateHistory, WriteBehindQueue
+from scheduler import CheckScheduler, get_static_interval, compute_check_interval
 from logger import write_log_info, print_and_log, record_exceptions
 from tgbot import retry_send_messages
 
@@ -26,6 +46,30 @@ from tgbot import retry_send_messages
 FORCE_UPDATE = False
 PROXY_TEST_URL: Final = "https://www.google.com"
 
+# 本轮检查中由于GitHub api配额不足而被推迟的项目的名字
+_DEFERRED_CHECKS: Final = set()
+_DEFERRED_CHECKS_LOCK: Final = threading.RLock()
+
+# 多进程模式使用的进程池, 在第一次使用时创建, 并在多轮检查之间复用
+_PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+
+# 本轮检查的截止时间(Unix时间), 不在循环检查中时为None
+_CYCLE_DEADLINE: Optional[float] = None
+
+# 本轮检查开始时一次性读取的数据库快照(Saved.get_saved_snapshot), 不在循环检查中时为None
+# 每个项目在一轮检查中最多写入一次数据库, 且只有检查失败(没有写入数据库)的项目才会被重试, 因此快照在本轮检查中不会过时
+_SAVED_SNAPSHOT: Optional[typing.Mapping[str, Saved]] = None
+
+# 循环检查时使用的延迟写入队列, 没有启用延迟写入或者不在循环检查中时为None
+_WRITE_QUEUE: Optional[WriteBehindQueue] = None
+
+# 正在进行中的检查的CancelScope, 用于在判定为网络异常时中断这些检查
+_RUNNING_SCOPES: Final = set()
+_RUNNING_SCOPES_LOCK: Final = threading.RLock()
+
+# 每个项目连续检查失败(包括重试)的轮数, 用于发现长期失败的项目
+_FAILURE_STREAKS: Final = dict()
+
 def database_cleanup() -> set[str]:
     """
     将数据库中存在于数据库但不存在于CHECK_LIST的项目删除掉
@@ -37,6 +81,15 @@ def database_cleanup() -> set[str]:
         drop_ids = saved_ids - checklist_ids
         for id_ in drop_ids:
             session.delete(session.query(Saved).filter(Saved.ID == id_).one())
+        session.query(Schedule).filter(~Schedule.ID.in_(checklist_ids)).delete(synchronize_session=False)
+        session.query(UpdateHistory).filter(~UpdateHistory.ID.in_(checklist_ids)).delete(synchronize_session=False)
+        # 每个项目只保留计算自适应检查间隔所需的最近的更新历史
+        for id_, update_times in UpdateHistory.get_update_times().items():
+            expired_times = update_times[:-(ADAPTIVE_INTERVAL_HISTORY_SIZE + 1)]
+            if expired_times:
+                session.query(UpdateHistory).filter(
+                    UpdateHistory.ID == id_, UpdateHistory.UPDATE_TIME <= expired_times[-1]
+                ).delete(synchronize_session=False)
         session.commit()
         return drop_ids
 
@@ -68,13 +121,8 @@ if sys.platform == "linux":
     import signal
     signal.signal(signal.SIGTERM, lambda signum, frame: _abort("Received stop signal, aborting..."))
 
-def check_one(cls: typing.Union[type, str], disable_pagecache: bool = False) -> Tuple[bool, CheckUpdate]:
-    """ 对CHECK_LIST中的一个项目进程更新检查
-
-    :param cls: 要检查的CheckUpdate类或类名
-    :param disable_pagecache: 为True时强制禁用页面缓存
-    :return: (<bool值, 顺利完成检查为True, 否则为False>, <CheckUpdate对象>)
-    """
+def _prepare_check_class(cls: typing.Union[type, str], disable_pagecache: bool, force_update: bool) -> type:
+    """ 返回要检查的CheckUpdate类, 根据参数可能返回其动态创建的子类 """
     if isinstance(cls, str):
         cls_str = cls
         cls = {cls_.__name__: cls_ for cls_ in CHECK_LIST}.get(cls_str)
@@ -88,10 +136,114 @@ def check_one(cls: typing.Union[type, str], disable_pagecache: bool = False) ->
     if disable_pagecache:
         if cls.enable_pagecache:
             cls = type(cls.__name__, (cls, ), {"enable_pagecache": False})
-    cls_obj = cls()
+    if force_update:
+        # 强制更新时不发送条件请求, 也不比较页面内容的指纹
+        if cls.enable_conditional_get or cls.enable_fingerprint:
+            cls = type(cls.__name__, (cls, ), {"enable_conditional_get": False, "enable_fingerprint": False})
+    return cls
+
+def _get_check_budget(cycle_deadline: Optional[float]) -> float:
+    """ 返回单个项目检查的时间预算, 不超过本轮检查剩余的时间 """
+    if cycle_deadline is None:
+        return CHECK_TIME_BUDGET
+    return min(CHECK_TIME_BUDGET, cycle_deadline - time.time())
+
+@contextmanager
+def _running_check_scope(cycle_deadline: Optional[float]) -> typing.ContextManager[CancelScope]:
+    """ 在当前线程中进入一个具有检查时间预算的CancelScope, 并登记为正在进行中的检查 """
+    with cancel_scope(_get_check_budget(cycle_deadline)) as scope:
+        with _RUNNING_SCOPES_LOCK:
+            _RUNNING_SCOPES.add(scope)
+        try:
+            yield scope
+        finally:
+            with _RUNNING_SCOPES_LOCK:
+                _RUNNING_SCOPES.discard(scope)
+
+def _cancel_running_checks():
+    """ 中断所有正在进行中的检查 """
+    with _RUNNING_SCOPES_LOCK:
+        scopes = list(_RUNNING_SCOPES)
+    for scope in scopes:
+        scope.cancel()
+
+def _shutdown_executor(executor: ThreadPoolExecutor):
+    """ 取消尚未开始的检查, 中断正在进行中的检查, 然后等待线程池退出 """
+    executor.shutdown(wait=False, cancel_futures=True)
+    _cancel_running_checks()
+    executor.shutdown(wait=True)
+
+class _SubprocessTraceback(Exception):
+
+    """ 保存子进程中的异常堆栈信息, 作为在主进程中重新引发的异常的__cause__ """
+
+    def __str__(self) -> str:
+        return "\n\n" + self.args[0]
+
+def check_one(
+        cls: typing.Union[type, str],
+        disable_pagecache: bool = False,
+        check_result: Optional[Tuple[Union[dict, Exception], Optional[str]]] = None,
+        prefetched: Optional[typing.Mapping[str, typing.Any]] = None,
+) -> Tuple[Optional[bool], CheckUpdate]:
+    """ 对CHECK_LIST中的一个项目进程更新检查
+
+    :param cls: 要检查的CheckUpdate类或类名
+    :param disable_pagecache: 为True时强制禁用页面缓存
+    :param check_result: 多进程模式下子进程执行do_check方法的结果,
+                         (<dump_check_state方法返回的实例状态或引发的异常>, <异常的堆栈信息>),
+                         不为None时不再执行do_check方法, 而是直接恢复实例状态或重新引发异常
+    :param prefetched: asyncio模式下由CheckUpdate.prefetch_async方法预先请求得到的响应
+    :return: (<顺利完成检查为True, 检查失败为False, 由其他节点负责而跳过检查时为None>, <CheckUpdate对象>)
+             跳过检查时没有执行do_check方法, 因此不能调用CheckUpdate对象的is_updated等方法
+    """
+    cls_obj = _prepare_check_class(cls, disable_pagecache, FORCE_UPDATE)(_SAVED_SNAPSHOT)
+    if prefetched:
+        cls_obj.set_prefetched_responses(prefetched)
+
+    # 只有loop_check启动了协调器时才参与分片, 只检查单个项目(命令行或Bot)时总是直接检查
+    if (coordinator := get_active_coordinator()) is not None and not coordinator.acquire(cls_obj.name):
+        # 该项目由其他节点负责, 不视为检查失败
+        _log_skipped(cls_obj.fullname)
+        return None, cls_obj
+    try:
+        return _check_and_save(cls_obj, check_result), cls_obj
+    finally:
+        if coordinator is not None:
+            _release_item_lease(coordinator, cls_obj.name)
+
+def _log_skipped(fullname: str):
+    no_check_string = "%s skipped (owned by another node)" % fullname
+    print("- " + no_check_string)
+    if not LESS_LOG:
+        write_log_info(no_check_string)
+
+def _release_item_lease(coordinator: Coordinator, name: str):
+    """ 检查完成之后释放项目租约, 启用了延迟写入时, 等到该项目的数据提交之后再释放 """
+    if _WRITE_QUEUE is not None:
+        # 提交数据时需要再次确认仍然持有租约, 因此不能提前释放; 失去租约时该回调函数会被丢弃
+        _WRITE_QUEUE.add_callback(functools.partial(coordinator.release, name), name=name)
+        return
+    try:
+        coordinator.release(name)
+    except:
+        # 释放失败时等待租约自然过期即可
+        record_exceptions("Error while releasing the lease of %s:" % name)
+
+def _check_and_save(cls_obj: CheckUpdate, check_result: Optional[Tuple[Union[dict, Exception], Optional[str]]]) -> bool:
+    """
+    执行(或由check_result恢复)do_check方法, 然后写入数据库并发送消息, 参数参见check_one
+    :return: 顺利完成检查为True, 检查失败为False
+    """
+    scope = None
 
     def _handle_do_check_exception(e: Exception):
-        if isinstance(e, req_exceptions.ReadTimeout):
+        if isinstance(e, CheckTimeoutException):
+            print_and_log("%s check failed! %s." % (cls_obj.fullname, e), level=logging.WARNING)
+        elif scope is not None and scope.cancelled:
+            # 连接被中断时, 正在读取响应内容的代码可能抛出其他异常
+            print_and_log("%s check failed! %s." % (cls_obj.fullname, scope.reason), level=logging.WARNING)
+        elif isinstance(e, req_exceptions.ReadTimeout):
             print_and_log("%s check failed! Timeout." % cls_obj.fullname, level=logging.WARNING)
         elif isinstance(e, (req_exceptions.SSLError, req_exceptions.ProxyError)):
             print_and_log("%s check failed! Proxy error." % cls_obj.fullname, level=logging.WARNING)
@@ -99,14 +251,30 @@ def check_one(cls: typing.Union[type, str], disable_pagecache: bool = False) ->
             print_and_log("%s check failed! Connection error." % cls_obj.fullname, level=logging.WARNING)
         elif isinstance(e, req_exceptions.HTTPError):
             print_and_log("%s check failed! %s." % (cls_obj.fullname, e), level=logging.WARNING)
+        elif isinstance(e, CircuitOpenException):
+            print_and_log("%s check failed! %s." % (cls_obj.fullname, e), level=logging.WARNING)
         else:
             record_exceptions("Error while checking %s:" % cls_obj.fullname)
 
     try:
-        cls_obj.do_check()
+        if check_result is None:
+            with _running_check_scope(_CYCLE_DEADLINE) as scope:
+                cls_obj.do_check()
+        else:
+            state, traceback_text = check_result
+            if isinstance(state, Exception):
+                if traceback_text is not None:
+                    state.__cause__ = _SubprocessTraceback(traceback_text)
+                raise state
+            cls_obj.load_check_state(state)
+    except GithubRateLimitDeferred as exc:
+        print_and_log("%s check deferred! %s." % (cls_obj.fullname, exc), level=logging.WARNING)
+        with _DEFERRED_CHECKS_LOCK:
+            _DEFERRED_CHECKS.add(cls_obj.name)
+        return False
     except Exception as exc:
         _handle_do_check_exception(exc)
-        return False, cls_obj
+        return False
     else:
         if FORCE_UPDATE or cls_obj.is_updated():
             if isinstance(cls_obj, CheckMultiUpdate):
@@ -121,58 +289,545 @@ def check_one(cls: typing.Union[type, str], disable_pagecache: bool = False) ->
                 cls_obj.after_check()
             except:
                 record_exceptions("%s: Something wrong when running after_check!" % cls_obj.fullname)
-            cls_obj.write_to_database()
+            try:
+                cls_obj.write_to_database(_WRITE_QUEUE)
+            except LeaseLostException as exc:
+                # 租约已经过期并可能被其他节点接管, 由其他节点负责写入数据库和发送消息
+                print_and_log("%s: %s, skip saving and sending." % (cls_obj.fullname, exc), level=logging.WARNING)
+                return True
+            cls_obj.save_validators(_WRITE_QUEUE)
             if ENABLE_SENDMESSAGE:
-                cls_obj.send_message()
+                if _WRITE_QUEUE is not None:
+                    # 数据写入数据库之后再发送消息
+                    _WRITE_QUEUE.add_callback(cls_obj.send_message, name=cls_obj.name)
+                else:
+                    cls_obj.send_message()
         else:
-            print("- %s no update" % cls_obj.fullname)
+            if cls_obj.is_not_modified:
+                no_update_string = "%s no update (not modified)" % cls_obj.fullname
+            else:
+                cls_obj.save_validators(_WRITE_QUEUE)
+                no_update_string = "%s no update" % cls_obj.fullname
+            print("- " + no_update_string)
             if not LESS_LOG:
-                write_log_info("%s no update" % cls_obj.fullname)
-        return True, cls_obj
+                write_log_info(no_update_string)
+        return True
+
+def _do_check_in_subprocess(
+        cls: type, force_update: bool, cycle_deadline: Optional[float],
+) -> Tuple[Union[dict, Exception], Optional[str], frozenset]:
+    """
+    在子进程中执行do_check方法
+    :return: (<实例状态或引发的异常>, <异常的堆栈信息>, <检查过程中发生网络错误的主机>)
+    """
+    CONNECTIVITY_DETECTOR.reset()
+    cls_obj = _prepare_check_class(cls, False, force_update)()
+    try:
+        # 时间预算从子进程真正开始检查时计算, 但不超过本轮检查的截止时间
+        with cancel_scope(_get_check_budget(cycle_deadline)):
+            cls_obj.do_check()
+        check_result, traceback_text = cls_obj.dump_check_state(), None
+    except Exception as exc:
+        check_result, traceback_text = exc, traceback.format_exc()
+    return check_result, traceback_text, CONNECTIVITY_DETECTOR.get_failed_hosts()
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _PROCESS_POOL
+    if _PROCESS_POOL is None:
+        # 主进程中有其他线程正在运行, 使用spawn而不是fork, 以免子进程继承被锁住的锁和共享的连接
+        _PROCESS_POOL = ProcessPoolExecutor(MAX_PROCESSES_NUM, mp_context=multiprocessing.get_context("spawn"))
+    return _PROCESS_POOL
+
+def _can_run_in_subprocess(cls: type) -> bool:
+    """
+    该项目是否可以在子进程中执行do_check方法
+    子进程中的GITHUB_RATE_LIMITER, HOST_THROTTLE和CIRCUIT_BREAKERS都是独立的,
+    因此请求GitHub api或者受主机限流的项目必须在主进程中执行, 否则配额和限流无法跨进程生效
+    """
+    if not cls.enable_subprocess or cls.enable_pagecache:
+        return False
+    if cls.request_host is None:
+        return True
+    return cls.request_host != GITHUB_RATE_LIMITER.API_HOST and not HOST_THROTTLE.is_limited(cls.request_host)
+
+def _is_failed(is_success: Optional[bool], cls: type) -> bool:
+    """ 根据check_one的结果判断该项目是否检查失败, 被跳过或被推迟的项目不视为检查失败 """
+    return is_success is False and not _is_deferred(cls)
+
+def _is_deferred(cls: type) -> bool:
+    """ 该项目是否由于GitHub api配额不足而被推迟, 被推迟的项目不视为检查失败 """
+    with _DEFERRED_CHECKS_LOCK:
+        return cls.__name__ in _DEFERRED_CHECKS
+
+def _interleave_by_host(check_list: typing.Sequence[type]) -> list:
+    """ 按request_host交错排列检查项目, 使同一主机的项目均匀分布, 避免其集中占用所有线程 """
+    groups = {}
+    for cls in check_list:
+        # 没有指定request_host的项目一般各自请求不同的主机, 把它们视为同一组均匀分布即可
+        groups.setdefault(cls.request_host, []).append(cls)
+    # 每个项目按其在所属分组中的相对位置排序
+    positions = {
+        cls: (i + 0.5) / len(group)
+        for group in groups.values()
+        for i, cls in enumerate(group)
+    }
+    return sorted(check_list, key=lambda cls_: positions[cls_])
 
 def single_thread_check(check_list: typing.Sequence[type]) -> Tuple[list, bool]:
-    # 单线程模式下连续检查失败5项则判定为网络异常, 并提前终止
-    req_failed_flag = 0
+    # 由CONNECTIVITY_DETECTOR判定为网络异常时提前终止
+    # 单个主机的故障由该主机的熔断器处理, 不会影响其他项目的检查
     check_failed_list = []
     is_network_error = False
     for cls in check_list:
         rc, _ = check_one(cls)
-        if not rc:
-            req_failed_flag += 1
+        if _is_failed(rc, cls):
             check_failed_list.append(cls)
-            if req_failed_flag == 5:
+            if CONNECTIVITY_DETECTOR.is_offline():
                 is_network_error = True
                 break
-        else:
-            req_failed_flag = 0
         _sleep(2)
     return check_failed_list, is_network_error
 
 def multi_thread_check(check_list: typing.Sequence[type]) -> Tuple[list, bool]:
-    # 多线程模式下累计检查失败10项则判定为网络异常, 并取消剩下所有的任务
+    # 由CONNECTIVITY_DETECTOR判定为网络异常时取消剩下所有的任务
+    # 单个主机的故障由该主机的熔断器处理, 不会影响其他项目的检查
     check_failed_list = []
     is_network_error = False
 
     with ThreadPoolExecutor(MAX_THREADS_NUM) as executor:
         futures = {}
-        for cls in check_list:
+        for cls in _interleave_by_host(check_list):
             future = executor.submit(check_one, cls)
             futures[future] = cls
         for future in as_completed(futures):
             is_success, _ = future.result()
-            if not is_success:
+            if _is_failed(is_success, futures[future]):
                 check_failed_list.append(futures[future])
-                if len(check_failed_list) >= 10:
+                if CONNECTIVITY_DETECTOR.is_offline():
+                    is_network_error = True
+                    _shutdown_executor(executor)
+                    break
+        return check_failed_list, is_network_error
+
+def multi_process_check(check_list: typing.Sequence[type]) -> Tuple[list, bool]:
+    # 在子进程中执行do_check方法, 然后在主进程中完成剩下的步骤(after_check, write_to_database, send_message)
+    # 启用了页面缓存, 请求GitHub api或受主机限流, 或者不允许在子进程中执行的项目, 在主进程中以多线程模式执行
+    # 由CONNECTIVITY_DETECTOR判定为网络异常时取消剩下所有的任务
+    global _PROCESS_POOL
+    check_failed_list = []
+    is_network_error = False
+    process_pool = _get_process_pool()
+    coordinator = get_active_coordinator()
+
+    with ThreadPoolExecutor(MAX_THREADS_NUM) as executor:
+        process_futures = {}
+        thread_futures = {}
+        for cls in _interleave_by_host(check_list):
+            if _can_run_in_subprocess(cls):
+                # 在子进程执行do_check方法之前获取租约, 之后check_one会再次续约, 并在写入之后释放
+                if coordinator is not None and not coordinator.acquire(cls.__name__):
+                    _log_skipped(cls.fullname)
+                    continue
+                process_futures[process_pool.submit(_do_check_in_subprocess, cls, FORCE_UPDATE, _CYCLE_DEADLINE)] = cls
+            else:
+                thread_futures[executor.submit(check_one, cls)] = cls
+        for future in as_completed({**process_futures, **thread_futures}):
+            if future in process_futures:
+                cls = process_futures[future]
+                try:
+                    check_result, traceback_text, failed_hosts = future.result()
+                except Exception as exc:
+                    # 子进程崩溃, 或者结果无法被pickle
+                    if isinstance(exc, BrokenProcessPool):
+                        _PROCESS_POOL = None
+                    check_result, traceback_text, failed_hosts = exc, traceback.format_exc(), frozenset()
+                # 子进程中的网络错误也要计入主进程的CONNECTIVITY_DETECTOR和CIRCUIT_BREAKERS
+                for host in failed_hosts:
+                    CONNECTIVITY_DETECTOR.record_failure(host)
+                    CIRCUIT_BREAKERS.record_failure(host)
+                if not failed_hosts and not isinstance(check_result, Exception):
+                    CONNECTIVITY_DETECTOR.record_success(cls.request_host)
+                is_success, _ = check_one(cls, check_result=(check_result, traceback_text))
+            else:
+                cls = thread_futures[future]
+                is_success, _ = future.result()
+            if _is_failed(is_success, cls):
+                check_failed_list.append(cls)
+                if CONNECTIVITY_DETECTOR.is_offline():
                     is_network_error = True
-                    executor.shutdown(wait=True, cancel_futures=True)
+                    for process_future, cls_ in process_futures.items():
+                        if process_future.cancel() and coordinator is not None:
+                            # 不会再检查该项目了, 立即释放已经获取的租约
+                            _release_item_lease(coordinator, cls_.__name__)
+                    _shutdown_executor(executor)
                     break
         return check_failed_list, is_network_error
 
+async def _asyncio_check(check_list: typing.Sequence[type]) -> Tuple[list, bool]:
+    check_failed_list = []
+    is_network_error = False
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(MAX_THREADS_NUM)
+
+    async def _check(cls_: type, session) -> Tuple[type, Optional[bool]]:
+        # 强制更新时不发送条件请求; 预先请求失败时do_check方法将以同步的方式重新请求
+        try:
+            prefetched = await _prepare_check_class(cls_, False, FORCE_UPDATE).prefetch_async(session)
+        except Exception:
+            prefetched = None
+        # 同步的check_one(以及do_check方法中的解析)通过线程池桥接到事件循环
+        is_success_, cls_obj = await loop.run_in_executor(
+            executor, functools.partial(check_one, cls_, prefetched=prefetched)
+        )
+        if is_success_:
+            cls_obj.update_prefetch_plan()
+        return cls_, is_success_
+
+    try:
+        async with new_async_session(ASYNCIO_MAX_CONCURRENCY) as session:
+            tasks = [asyncio.create_task(_check(cls, session)) for cls in _interleave_by_host(check_list)]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    cls, is_success = await task
+                    if _is_failed(is_success, cls):
+                        check_failed_list.append(cls)
+                        if CONNECTIVITY_DETECTOR.is_offline():
+                            is_network_error = True
+                            break
+            finally:
+                for task in tasks:
+                    task.cancel()
+                if is_network_error:
+                    # 正在线程池中执行的检查不会因为任务被取消而停止, 需要中断它们
+                    _cancel_running_checks()
+                await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        _shutdown_executor(executor)
+    return check_failed_list, is_network_error
+
+def asyncio_check(check_list: typing.Sequence[type]) -> Tuple[list, bool]:
+    # 在同一个事件循环中使用aiohttp并发地预先请求每个项目需要的页面, 然后在线程池中执行check_one,
+    # do_check方法直接解析预先请求得到的响应, 其他请求仍以同步的方式进行
+    # 由CONNECTIVITY_DETECTOR判定为网络异常时取消剩下所有的任务
+    return asyncio.run(_asyncio_check(check_list))
+
+def _get_staggered_dispatch_plan(check_list: typing.Sequence[type], window: float) -> list:
+    """
+    为错峰检查安排每个项目的启动时间
+    项目按类名的稳定哈希值排列, 均匀分布在window秒内, 每个项目的启动时间在其所在的时间段内随机抖动
+    :param check_list: 检查项目的列表
+    :param window: 用于分散启动项目的时间(单位: 秒)
+    :return: (<相对于本轮开始时间的偏移>, <CheckUpdate子类>)的列表, 按偏移先后排列
+    """
+    # 使用crc32而不是hash(), 后者对字符串的结果在每次运行时都不同
+    ordered = sorted(check_list, key=lambda cls: (zlib.crc32(cls.__name__.encode()), cls.__name__))
+    slot = window / len(ordered) if ordered else 0
+    return [
+        ((i + 0.5 + random.uniform(-0.5, 0.5) * STAGGERED_DISPATCH_JITTER) * slot, cls)
+        for i, cls in enumerate(ordered)
+    ]
+
+def staggered_check(check_list: typing.Sequence[type]) -> Tuple[list, bool]:
+    # 把检查项目均匀地分散到LOOP_CHECK_INTERVAL * STAGGERED_DISPATCH_WINDOW_RATIO秒内依次启动
+    # 由CONNECTIVITY_DETECTOR判定为网络异常时不再启动剩下的项目
+    # GitHub Release按STAGGERED_PREFETCH_SLICE分段, 在每段开始时只为该段内启动的项目预先获取
+    check_failed_list = []
+    is_network_error = False
+    start_time = time.time()
+    prefetched_until = None
+    dispatch_plan = _get_staggered_dispatch_plan(check_list, LOOP_CHECK_INTERVAL * STAGGERED_DISPATCH_WINDOW_RATIO)
+    if dispatch_plan:
+        write_log_info("Dispatching %d items until %s" % (
+            len(dispatch_plan), get_time_str(start_time + dispatch_plan[-1][0])
+        ))
+
+    with ThreadPoolExecutor(MAX_THREADS_NUM) as executor:
+        running = {}
+
+        def _handle_done(done) -> bool:
+            """ 处理已完成的检查, 判定为网络异常时返回True """
+            for future in done:
+                cls = running.pop(future)
+                is_success, _ = future.result()
+                if _is_failed(is_success, cls):
+                    check_failed_list.append(cls)
+                    if CONNECTIVITY_DETECTOR.is_offline():
+                        return True
+            return False
+
+        for offset, cls in dispatch_plan:
+            # 等待到该项目的启动时间, 期间处理已完成的检查
+            while not is_network_error and (timeout := start_time + offset - time.time()) > 0:
+                if not running:
+                    _sleep(timeout)
+                    break
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                is_network_error = _handle_done(done)
+            if is_network_error:
+                break
+            if prefetched_until is None or offset >= prefetched_until:
+                prefetched_until = offset + STAGGERED_PREFETCH_SLICE
+                if (prefetched_count := GithubReleases.prefetch_releases(
+                    [cls_ for offset_, cls_ in dispatch_plan if offset <= offset_ < prefetched_until]
+                )) > 0 and not LESS_LOG:
+                    write_log_info("Prefetched %d GitHub releases via GraphQL" % prefetched_count)
+            if not LESS_LOG:
+                write_log_info("Start checking %s" % cls.__name__)
+            running[executor.submit(check_one, cls)] = cls
+        if is_network_error:
+            _shutdown_executor(executor)
+        else:
+            for future in as_completed(list(running)):
+                if _handle_done((future, )):
+                    is_network_error = True
+                    _shutdown_executor(executor)
+                    break
+        return check_failed_list, is_network_error
+
+def _get_retry_backoff(attempt: int) -> float:
+    """ 返回第attempt次重试之前的等待时间, 按指数增长并加入随机抖动 """
+    backoff = min(RETRY_MAX_BACKOFF, RETRY_BASE_BACKOFF * 2 ** (attempt - 1))
+    return random.uniform(backoff / 2, backoff)
+
+def retry_check(check_list: typing.Sequence[type]) -> Tuple[list, bool]:
+    """
+    以多线程的方式同时重试检查失败的项目
+    每个项目的重试间隔各自按指数增长并加入随机抖动, 所在主机处于熔断状态的项目等到熔断结束之后再重试
+    同一主机最多同时重试RETRY_MAX_PER_HOST个项目, 超过RETRY_DEADLINE之后不再发起新的重试
+    由CONNECTIVITY_DETECTOR判定为网络异常时放弃剩下所有的重试
+    :return: 重试之后仍然失败的项目的列表, 以及是否为网络错误或代理错误的Bool值
+    """
+    start_time = time.time()
+    deadline = start_time + RETRY_DEADLINE
+    if _CYCLE_DEADLINE is not None:
+        deadline = min(deadline, _CYCLE_DEADLINE)
+    # 每个项目已经重试的次数
+    attempts = {cls: 0 for cls in check_list}
+    # 等待重试的项目, 值为下次重试的时间
+    waiting = {cls: start_time + _get_retry_backoff(1) for cls in check_list}
+    check_failed_list = []
+    is_network_error = False
+
+    with ThreadPoolExecutor(MAX_THREADS_NUM) as executor:
+        running = {}
+        while waiting or running:
+            now = time.time()
+            breakers = CIRCUIT_BREAKERS.get_states()
+            running_hosts = Counter(cls.request_host for cls in running.values() if cls.request_host)
+            for cls, retry_time in sorted(waiting.items(), key=lambda x: x[1]):
+                if (breaker := breakers.get(cls.request_host)) and breaker["open_until"] > retry_time:
+                    # 熔断期间的请求必然失败, 推迟到熔断结束之后
+                    retry_time = waiting[cls] = breaker["open_until"]
+                if retry_time > deadline:
+                    del waiting[cls]
+                    check_failed_list.append(cls)
+                    print_and_log(
+                        "%s: retry deadline exceeded after %d attempts" % (cls.__name__, attempts[cls]),
+                        level=logging.WARNING,
+                    )
+                    continue
+                if retry_time > now:
+                    continue
+                if cls.request_host and running_hosts[cls.request_host] >= RETRY_MAX_PER_HOST:
+                    continue
+                del waiting[cls]
+                attempts[cls] += 1
+                running_hosts[cls.request_host] += 1
+                running[executor.submit(check_one, cls)] = cls
+            if not waiting and not running:
+                break
+            # 等待到下一个项目可以重试, 或者有项目检查完成(已到期但受主机限制的项目需要等待同一主机的项目完成)
+            timeout = max(min((x for x in waiting.values() if x > now), default=deadline) - now, 0)
+            if running:
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                done = ()
+                _sleep(timeout)
+            for future in done:
+                cls = running.pop(future)
+                is_success, _ = future.result()
+                if is_success is None:
+                    # 重试期间该项目被转交给了其他节点
+                    continue
+                if is_success:
+                    print_and_log("%s: recovered after %d attempts" % (cls.__name__, attempts[cls]))
+                elif _is_deferred(cls):
+                    # GitHub api配额不足, 不再重试, 也不视为检查失败
+                    print_and_log("%s: deferred to next cycle after %d attempts" % (cls.__name__, attempts[cls]))
+                elif CONNECTIVITY_DETECTOR.is_offline():
+                    is_network_error = True
+                    check_failed_list.append(cls)
+                elif attempts[cls] >= RETRY_MAX_ATTEMPTS:
+                    check_failed_list.append(cls)
+                    print_and_log(
+                        "%s: still failed after %d attempts" % (cls.__name__, attempts[cls]),
+                        level=logging.WARNING,
+                    )
+                else:
+                    waiting[cls] = time.time() + _get_retry_backoff(attempts[cls] + 1)
+            if is_network_error:
+                _shutdown_executor(executor)
+                check_failed_list.extend(waiting)
+                check_failed_list.extend(running.values())
+                break
+        return check_failed_list, is_network_error
+
+def _update_failure_streaks(check_list: typing.Sequence[type], check_failed_list: typing.Sequence[type]):
+    """ 更新每个项目连续检查失败的轮数, 并列出长期失败的项目 """
+    check_failed_set = set(check_failed_list)
+    for cls in check_list:
+        if cls in check_failed_set:
+            _FAILURE_STREAKS[cls.__name__] = _FAILURE_STREAKS.get(cls.__name__, 0) + 1
+        elif not _is_deferred(cls):
+            _FAILURE_STREAKS.pop(cls.__name__, None)
+    chronic_failures = sorted(
+        (name, streak) for name, streak in _FAILURE_STREAKS.items() if streak >= CHRONIC_FAILURE_THRESHOLD
+    )
+    if chronic_failures:
+        print_and_log(
+            "Items failed in consecutive checks: {%s}" % ", ".join(
+                "%s: %d" % (name, streak) for name, streak in chronic_failures
+            ),
+            level=logging.WARNING,
+        )
+
+def _log_stats(deferred_checks: Optional[typing.Collection[str]] = None):
+    """
+    清理页面缓存, 并记录页面缓存, GitHub api配额, 熔断器, 连接复用等统计信息
+    :param deferred_checks: 统计期间被推迟的项目, 为None时使用本轮检查中记录的_DEFERRED_CHECKS
+    """
+    PAGE_CACHE.remove_expired()
+    page_cache_stats = PAGE_CACHE.pop_stats()
+    print_and_log(
+        "Page cache: %d hits (%d parsed), %d misses, %d evictions, %d expired, %d entries (%s)" % (
+            page_cache_stats["hits"] + page_cache_stats["parsed_hits"], page_cache_stats["parsed_hits"],
+            page_cache_stats["misses"], page_cache_stats["evictions"],
+            page_cache_stats["expired"], page_cache_stats["entries"],
+            CheckUpdate.get_human_readable_file_size(page_cache_stats["bytes"]),
+        )
+    )
+    github_rate_limit_stats = GITHUB_RATE_LIMITER.pop_stats()
+    for resource, budget in sorted(github_rate_limit_stats["budgets"].items()):
+        print_and_log("GitHub api budget (%s): %d/%d remaining, resets at %s" % (
+            resource, budget["remaining"], budget["limit"], get_time_str(budget["reset"])
+        ))
+    if deferred_checks is None:
+        with _DEFERRED_CHECKS_LOCK:
+            deferred_checks = _DEFERRED_CHECKS.copy()
+    if deferred_checks:
+        print_and_log(
+            "%d GitHub api requests deferred, items deferred to the next check: {%s}" % (
+                github_rate_limit_stats["deferred"], ", ".join(sorted(deferred_checks))
+            ),
+            level=logging.WARNING,
+        )
+    for host, breaker in sorted(CIRCUIT_BREAKERS.get_states().items()):
+        print_and_log(
+            "Circuit breaker for %s: %s (%d consecutive failures, retry after %s)" % (
+                host, breaker["state"], breaker["failures"], get_time_str(breaker["open_until"])
+            ),
+            level=logging.WARNING,
+        )
+    connection_stats = SESSION_POOL.pop_stats()
+    print_and_log(
+        "Connections: %d reused, %d newly established, %d failed" % (
+            connection_stats["reused"], connection_stats["new"], connection_stats["failed"]
+        )
+    )
+
+def scheduled_check(check_list: typing.Sequence[type]):
+    """
+    调度模式: 按照每个项目各自的检查间隔单独安排检查, 到期的项目交给线程池执行
+    每个项目检查完成之后立即安排下一次检查, 日志也以项目为单位记录
+    """
+    scheduler = CheckScheduler(check_list)
+    running = {}
+    last_maintenance_time = 0
+    # 每个项目检查完成之后就会从_DEFERRED_CHECKS中移除, 因此另外收集两次例行维护之间被推迟的项目
+    deferred_checks = set()
+    print_and_log("Scheduler started with %d items" % len(scheduler))
+    with ThreadPoolExecutor(SCHEDULER_MAX_WORKERS) as executor:
+        while True:
+            now = time.time()
+            if now - last_maintenance_time >= SCHEDULER_MAINTENANCE_INTERVAL:
+                if last_maintenance_time:
+                    _flush_write_queue()
+                    _log_stats(deferred_checks)
+                    deferred_checks = set()
+                retry_send_messages()
+                last_maintenance_time = now
+            due = scheduler.pop_due(now, limit=SCHEDULER_MAX_WORKERS - len(running))
+            if due:
+                # 同时到期的项目可以共享批量获取的数据, 多节点模式下只需要获取由本节点负责的项目的数据
+                if (coordinator := get_active_coordinator()) is not None:
+                    owned_due = [cls for cls in due if coordinator.owns(cls.__name__)]
+                else:
+                    owned_due = due
+                GithubReleases.prefetch_releases(owned_due)
+                SfCheck.prepare_shared_feeds(owned_due)
+                for cls in due:
+                    if not LESS_LOG:
+                        write_log_info("Start checking %s" % cls.__name__)
+                    running[executor.submit(check_one, cls)] = cls
+            # 等待到下一个项目到期, 或者有项目检查完成, 或者需要进行例行维护
+            timeout = last_maintenance_time + SCHEDULER_MAINTENANCE_INTERVAL - now
+            if (next_check_time := scheduler.get_next_check_time()) is not None \
+                    and len(running) < SCHEDULER_MAX_WORKERS:
+                timeout = min(timeout, next_check_time - now)
+            timeout = max(timeout, 0)
+            if running:
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            else:
+                done = ()
+                _sleep(timeout)
+            for future in done:
+                cls = running.pop(future)
+                try:
+                    is_success, _ = future.result()
+                except:
+                    record_exceptions("Error while checking %s:" % cls.__name__)
+                    is_success = False
+                is_deferred = _is_deferred(cls)
+                if is_deferred:
+                    deferred_checks.add(cls.__name__)
+                    with _DEFERRED_CHECKS_LOCK:
+                        _DEFERRED_CHECKS.discard(cls.__name__)
+                # 由其他节点负责而跳过的项目按正常的检查间隔安排
+                next_check_time = scheduler.reschedule(cls, is_success is not False)
+                write_log_info("%s: next check at %s" % (cls.__name__, get_time_str(next_check_time)))
+                if is_success is False and not is_deferred and CONNECTIVITY_DETECTOR.is_offline():
+                    print_and_log("Network or proxy error! Pause checking...", level=logging.WARNING)
+                    scheduler.postpone(time.time() + scheduler.retry_interval)
+                    CONNECTIVITY_DETECTOR.reset()
+            if not running:
+                GithubReleases.clear_prefetched_releases()
+                SfCheck.clear_shared_feeds()
+
+def _flush_write_queue():
+    """ 将延迟写入队列中剩下的数据写入数据库 """
+    if _WRITE_QUEUE is None:
+        return
+    try:
+        if (written_count := _WRITE_QUEUE.flush()) > 0:
+            write_log_info("Wrote %d rows to database in one transaction" % written_count)
+    except:
+        record_exceptions("Error while writing to database, will try again later:")
+
 def loop_check():
+    global _CYCLE_DEADLINE, _SAVED_SNAPSHOT, _WRITE_QUEUE
     write_log_info("Run database cleanup before start")
     drop_ids = database_cleanup()
     write_log_info("Abandoned items: {%s}" % ", ".join(drop_ids))
-    loop_check_func = multi_thread_check if ENABLE_MULTI_THREAD else single_thread_check
+    if ENABLE_STAGGERED_DISPATCH:
+        loop_check_func = staggered_check
+    elif ENABLE_MULTI_PROCESS:
+        loop_check_func = multi_process_check
+    elif ENABLE_ASYNCIO:
+        loop_check_func = asyncio_check
+    elif ENABLE_MULTI_THREAD:
+        loop_check_func = multi_thread_check
+    else:
+        loop_check_func = single_thread_check
     check_list = [cls for cls in CHECK_LIST if not cls._skip]
     if not GithubReleases.auth_token:
         if len([x for x in check_list if issubclass(x, GithubReleases)]) / (LOOP_CHECK_INTERVAL / (60 * 60)) >= 60:
@@ -189,7 +844,7 @@ def loop_check():
         print_and_log("Check whether the proxy is working properly")
         while True:
             try:
-                request_url(PROXY_TEST_URL)
+                request_url(PROXY_TEST_URL, use_circuit_breaker=False)
                 break
             except req_exceptions.RequestException:
                 print_and_log(
@@ -198,27 +853,80 @@ def loop_check():
                 )
                 _sleep(60)
         print_and_log("OK, the proxy works fine")
+    if (coordinator := get_coordinator()) is not None:
+        coordinator.start()
+        print_and_log("Running as node %s, live nodes: {%s}" % (
+            coordinator.node_id, ", ".join(coordinator.get_live_nodes())
+        ))
+    if ENABLE_WRITE_BEHIND:
+        _WRITE_QUEUE = WriteBehindQueue()
+    if ENABLE_SCHEDULER:
+        scheduled_check(check_list)
+        return
     while True:
-        start_time = get_time_str()
+        cycle_start_time = time.time()
+        _CYCLE_DEADLINE = cycle_start_time + CYCLE_TIME_BUDGET
+        start_time = get_time_str(cycle_start_time)
         print(" - " + start_time)
         write_log_info("=" * 64)
         retry_send_messages()
         print(" - Start...")
         write_log_info("Start checking at %s" % start_time)
+        SESSION_POOL.pop_stats()
+        GITHUB_RATE_LIMITER.pop_stats()
+        with _DEFERRED_CHECKS_LOCK:
+            _DEFERRED_CHECKS.clear()
+        CONNECTIVITY_DETECTOR.reset()
+        if coordinator is not None:
+            # 只检查根据一致性哈希分配给本节点的项目
+            cycle_check_list = [cls for cls in check_list if coordinator.owns(cls.__name__)]
+            print_and_log("Node %s is responsible for %d of %d items (%d live nodes)" % (
+                coordinator.node_id, len(cycle_check_list), len(check_list), len(coordinator.get_live_nodes())
+            ))
+        else:
+            cycle_check_list = check_list
+        _SAVED_SNAPSHOT = Saved.get_saved_snapshot()
+        # 错峰检查时由staggered_check在每段开始时分别预先获取
+        if not ENABLE_STAGGERED_DISPATCH \
+                and (prefetched_count := GithubReleases.prefetch_releases(cycle_check_list)) > 0:
+            print_and_log("Prefetched %d GitHub releases via GraphQL" % prefetched_count)
+        if (shared_feeds_count := SfCheck.prepare_shared_feeds(cycle_check_list)) > 0:
+            print_and_log("Sharing %d SourceForge feeds" % shared_feeds_count)
         # loop_check_func必须返回两个值,
         # 检查失败的项目的列表, 以及是否为网络错误或代理错误的Bool值
-        check_failed_list, is_network_error = loop_check_func(check_list)
+        check_failed_list, is_network_error = loop_check_func(cycle_check_list)
         if is_network_error:
             print_and_log("Network or proxy error! Sleep...", level=logging.WARNING)
         else:
             if check_failed_list:
-                # 对于检查失败的项目, 强制单线程检查
                 print_and_log("Check again for failed items")
-                single_thread_check(check_failed_list)
-        PAGE_CACHE.clear()
-        print(" - The next check will start at %s\n" % get_time_str(offset=LOOP_CHECK_INTERVAL))
+                check_failed_list, is_network_error = retry_check(check_failed_list)
+                if is_network_error:
+                    print_and_log("Network or proxy error! Stop retrying", level=logging.WARNING)
+            if not is_network_error:
+                _update_failure_streaks(cycle_check_list, check_failed_list)
+        if time.time() >= _CYCLE_DEADLINE:
+            print_and_log(
+                "The check took longer than %d seconds, unfinished items were timed out" % CYCLE_TIME_BUDGET,
+                level=logging.WARNING,
+            )
+        _CYCLE_DEADLINE = None
+        _SAVED_SNAPSHOT = None
+        _flush_write_queue()
+        if _WRITE_QUEUE is not None:
+            # 回调函数(发送更新消息)在单独的线程中执行, 等待其执行完毕再结束本轮检查
+            _WRITE_QUEUE.wait_callbacks()
+        GithubReleases.clear_prefetched_releases()
+        SfCheck.clear_shared_feeds()
+        _log_stats()
+        if ENABLE_STAGGERED_DISPATCH:
+            # 错峰检查时本轮检查本身已经占用了检查间隔的大部分时间, 因此以本轮的开始时间计算下一轮的开始时间
+            next_start_time = max(cycle_start_time + LOOP_CHECK_INTERVAL, time.time())
+        else:
+            next_start_time = time.time() + LOOP_CHECK_INTERVAL
+        print(" - The next check will start at %s\n" % get_time_str(next_start_time))
         write_log_info("End of check")
-        _sleep(LOOP_CHECK_INTERVAL)
+        _sleep(max(next_start_time - time.time(), 0))
 
 def get_saved_json() -> str:
     """ 以json格式返回已保存的数据 """
@@ -272,6 +980,48 @@ def show_saved_data():
 
         console.print(table)
 
+def show_interval_report():
+    """ 打印每个项目的固定检查间隔与根据更新历史得到的自适应检查间隔, 以及每天的请求数的对比 """
+    def _format_seconds(seconds: Optional[float]) -> str:
+        if seconds is None:
+            return "-"
+        if seconds >= 24 * 60 * 60:
+            return "%.1fd" % (seconds / (24 * 60 * 60))
+        if seconds >= 60 * 60:
+            return "%.1fh" % (seconds / (60 * 60))
+        return "%dm" % (seconds // 60)
+
+    now = time.time()
+    update_times = UpdateHistory.get_update_times()
+    rows = []
+    total_fixed = total_adaptive = 0.
+    for cls in sorted(CHECK_LIST, key=lambda x: x.__name__):
+        static_interval = get_static_interval(cls)
+        check_interval = compute_check_interval(cls, update_times.get(cls.__name__, []), now)
+        fixed_per_day = 24 * 60 * 60 / static_interval
+        adaptive_per_day = 24 * 60 * 60 / check_interval.interval
+        total_fixed += fixed_per_day
+        total_adaptive += adaptive_per_day
+        rows.append((
+            cls.__name__,
+            _format_seconds(static_interval),
+            _format_seconds(check_interval.typical_gap),
+            _format_seconds(check_interval.interval) + ("" if check_interval.is_adaptive else " (static)"),
+            str(check_interval.samples),
+            "%.1f" % fixed_per_day,
+            "%.1f" % adaptive_per_day,
+        ))
+    headers = ("ID", "Static", "Typical Gap", "Interval", "Samples", "Req/Day (Fixed)", "Req/Day (Adaptive)")
+    widths = [max(len(x) for x in col) for col in zip(headers, *rows)]
+    print(" | ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    print("-+-".join("-" * w for w in widths))
+    for row in rows:
+        print(" | ".join(c.ljust(w) for c, w in zip(row, widths)))
+    print()
+    print("Requests per day: %.1f (fixed) -> %.1f (adaptive), %.1f%% saved" % (
+        total_fixed, total_adaptive, (1 - total_adaptive / total_fixed) * 100 if total_fixed else 0
+    ))
+
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--force", help="Force to think it/they have updates", action="store_true")
@@ -280,6 +1030,7 @@ if __name__ == "__main__":
     parser.add_argument("-c", "--check", help="Check one item")
     parser.add_argument("-s", "--show", help="Show saved data", action="store_true")
     parser.add_argument("-j", "--json", help="Show saved data as json", action="store_true")
+    parser.add_argument("-i", "--intervals", help="Show check intervals learned from update history", action="store_true")
 
     args = parser.parse_args()
 
@@ -290,11 +1041,13 @@ if __name__ == "__main__":
     if args.auto:
         loop_check()
     elif args.check:
-        if not check_one(args.check, disable_pagecache=True)[0]:
+        if check_one(args.check, disable_pagecache=True)[0] is False:
             sys.exit(1)
     elif args.show:
         show_saved_data()
     elif args.json:
         print(get_saved_json())
+    elif args.intervals:
+        show_interval_report()
     else:
         parser.print_usage()
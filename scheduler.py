@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import heapq
+import itertools
+import statistics
+import threading
+import time
+import typing
+from typing import Final, Optional, NamedTuple
+
+from config import (
+    LOOP_CHECK_INTERVAL, SCHEDULER_RETRY_INTERVAL, ENABLE_ADAPTIVE_INTERVAL, ADAPTIVE_INTERVAL_FACTOR,
+    ADAPTIVE_INTERVAL_MIN, ADAPTIVE_INTERVAL_MAX, ADAPTIVE_INTERVAL_MIN_SAMPLES, ADAPTIVE_INTERVAL_HISTORY_SIZE,
+)
+from database import Schedule, UpdateHistory
+
+
+class CheckInterval(NamedTuple):
+    # 实际使用的检查间隔(单位: 秒)
+    interval: int
+    # 是否为根据更新历史得到的自适应检查间隔
+    is_adaptive: bool
+    # 参与计算的更新间隔的数量
+    samples: int
+    # 典型的更新间隔(单位: 秒), 更新历史不足时为None
+    typical_gap: Optional[float]
+
+def get_static_interval(cls: type) -> int:
+    """ 返回检查项目固定的检查间隔(单位: 秒) """
+    return cls.check_interval or LOOP_CHECK_INTERVAL
+
+def compute_check_interval(cls: type, update_times: typing.Sequence[float], now: float) -> CheckInterval:
+    """
+    根据检查项目的更新历史计算检查间隔
+    :param cls: CheckUpdate子类
+    :param update_times: 按时间先后排列的更新时间
+    :param now: 当前时间
+    :return: CheckInterval对象
+    """
+    static_interval = get_static_interval(cls)
+    gaps = [b - a for a, b in zip(update_times, update_times[1:])][-ADAPTIVE_INTERVAL_HISTORY_SIZE:]
+    if not ENABLE_ADAPTIVE_INTERVAL or len(gaps) < ADAPTIVE_INTERVAL_MIN_SAMPLES:
+        return CheckInterval(static_interval, False, len(gaps), None)
+    # 距离上次更新的时间超过了典型的更新间隔, 说明该项目可能变得不活跃了
+    typical_gap = max(statistics.median(gaps), now - update_times[-1])
+    interval = int(min(max(typical_gap * ADAPTIVE_INTERVAL_FACTOR, ADAPTIVE_INTERVAL_MIN), ADAPTIVE_INTERVAL_MAX))
+    return CheckInterval(interval, True, len(gaps), typical_gap)
+
+
+class CheckScheduler:
+
+    """ 基于最小堆的检查调度器
+    每个检查项目按照各自的检查间隔(CheckUpdate子类的check_interval属性, 或根据更新历史得到的自适应检查间隔)单独安排检查
+    堆顶总是最先到期的项目, 调用者取出到期的项目并执行检查, 完成之后再调用reschedule方法重新安排
+    下次检查的时间保存在数据库(database.Schedule)中, 因此重启之后仍然有效
+    数据库中没有记录的项目(比如新添加的项目)立即到期
+    """
+
+    def __init__(self, check_list: typing.Iterable[type], retry_interval: int = SCHEDULER_RETRY_INTERVAL):
+        self.retry_interval: Final = retry_interval
+        # 堆中的元素为(<下次检查的时间>, <序号>, <CheckUpdate子类>), 序号用于避免比较两个类
+        self.__heap = []
+        self.__counter = itertools.count()
+        self.threading_lock: Final = threading.RLock()
+        saved_next_check_times = Schedule.get_next_check_times()
+        now = time.time()
+        for cls in check_list:
+            self.__push(cls, saved_next_check_times.get(cls.__name__, now))
+
+    def __push(self, cls: type, next_check_time: float):
+        heapq.heappush(self.__heap, (next_check_time, next(self.__counter), cls))
+
+    @staticmethod
+    def get_check_interval(cls: type, now: Optional[float] = None) -> CheckInterval:
+        """ 返回检查项目当前的检查间隔 """
+        if now is None:
+            now = time.time()
+        update_times = UpdateHistory.get_update_times(cls.__name__).get(cls.__name__, [])
+        return compute_check_interval(cls, update_times, now)
+
+    def get_next_check_time(self) -> Optional[float]:
+        """ 返回最先到期的项目的下次检查时间, 没有等待中的项目时返回None """
+        with self.threading_lock:
+            return self.__heap[0][0] if self.__heap else None
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> list:
+        """
+        取出所有已经到期的项目, 按到期时间先后排列
+        :param now: 当前时间
+        :param limit: 最多取出多少项, 默认不限制
+        :return: CheckUpdate子类的列表
+        """
+        due = []
+        with self.threading_lock:
+            while self.__heap and self.__heap[0][0] <= now and (limit is None or len(due) < limit):
+                due.append(heapq.heappop(self.__heap)[2])
+        return due
+
+    def reschedule(self, cls: type, is_success: bool, now: Optional[float] = None) -> float:
+        """
+        在检查完成之后重新安排该项目, 并保存下次检查的时间
+        :param cls: CheckUpdate子类
+        :param is_success: 本次检查是否成功, 检查失败的项目将在retry_interval之后(不晚于正常的检查间隔)重试
+        :param now: 当前时间, 默认取当前时间
+        :return: 下次检查的时间
+        """
+        if now is None:
+            now = time.time()
+        check_interval = self.get_check_interval(cls, now).interval
+        if not is_success:
+            check_interval = min(check_interval, self.retry_interval)
+        next_check_time = now + check_interval
+        Schedule.set_next_check_time(cls.__name__, next_check_time)
+        with self.threading_lock:
+            self.__push(cls, next_check_time)
+        return next_check_time
+
+    def postpone(self, until: float):
+        """ 将所有在until之前到期的项目推迟到until, 比如网络异常时暂停检查 """
+        with self.threading_lock:
+            self.__heap = [
+                (max(next_check_time, until), counter, cls) for next_check_time, counter, cls in self.__heap
+            ]
+            heapq.heapify(self.__heap)
+
+    def __len__(self) -> int:
+        with self.threading_lock:
+            return len(self.__heap)
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+# 测试使用临时的数据库和日志文件, 必须在导入database和logger之前修改
+_TEMP_DIR = tempfile.mkdtemp(prefix="rom_update_checker_tests_")
+config.SQLITE_FILE = os.path.join(_TEMP_DIR, "saved.db")
+config.LOG_FILE = os.path.join(_TEMP_DIR, "log.txt")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import pytest
+
+import check_init
+import common
+import main
+from check_init import CheckUpdate
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+
+    """ 返回PAGES中的页面, 支持If-None-Match """
+
+    PAGES = {}
+
+    def do_GET(self):
+        body = self.PAGES[urlsplit(self.path).path].encode()
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def base_url(monkeypatch):
+    monkeypatch.setattr(common, "PROXIES", {})
+    monkeypatch.setattr(main, "ENABLE_SENDMESSAGE", False)
+    _PageHandler.PAGES = {"/a": "a1", "/b": "b1"}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:%d" % server.server_port
+    server.shutdown()
+
+@pytest.fixture
+def sync_requests(monkeypatch) -> list:
+    """ 记录do_check方法中以同步的方式发起的请求 """
+    urls = []
+    request_url = check_init._request_url
+
+    def _request_url(url, **kwargs):
+        urls.append(url)
+        return request_url(url, **kwargs)
+
+    monkeypatch.setattr(check_init, "_request_url", _request_url)
+    return urls
+
+def test_asyncio_check_parses_prefetched_pages(base_url, sync_requests):
+    class AsyncioPages(CheckUpdate):
+        fullname = "Asyncio Pages"
+
+        def do_check(self):
+            self.update_info("LATEST_VERSION", "%s-%s" % (
+                self.request_url_text(base_url + "/a"),
+                self.request_url_text(base_url + "/b", params={"x": "1"}),
+            ))
+
+    def _run() -> CheckUpdate:
+        assert main.asyncio_check([AsyncioPages]) == ([], False)
+        return AsyncioPages()
+
+    # 第一次检查时还不知道需要请求哪些页面
+    assert _run().prev_saved_info.LATEST_VERSION == "a1-b1"
+    assert len(sync_requests) == 2
+
+    # 页面没有变化: 预先请求的条件请求都返回了304, 不需要再以同步的方式请求
+    sync_requests.clear()
+    _run()
+    assert sync_requests == []
+
+    # 只有b发生了变化: b直接使用预先请求得到的内容, a返回了304, 需要重新请求完整的内容
+    _PageHandler.PAGES["/b"] = "b2"
+    sync_requests.clear()
+    assert _run().prev_saved_info.LATEST_VERSION == "a1-b2"
+    assert sync_requests == [base_url + "/a"]
+
+def test_prefetch_skips_requests_with_custom_headers(base_url, sync_requests):
+    class AsyncioHeaders(CheckUpdate):
+        fullname = "Asyncio Headers"
+
+        def do_check(self):
+            self.update_info("LATEST_VERSION", self.request_url_text(base_url + "/a", headers={"X-Test": "1"}))
+
+    for _ in range(2):
+        assert main.asyncio_check([AsyncioHeaders]) == ([], False)
+    assert len(sync_requests) == 2
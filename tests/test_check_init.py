@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+from contextlib import contextmanager
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+import check_init
+import main
+from check_init import SfCheck
+
+RSS = b"""<?xml version="1.0" encoding="utf-8"?>
+<rss xmlns:media="http://search.yahoo.com/mrss/" version="2.0"><channel>
+<item>
+  <guid>https://sourceforge.net/projects/shared-feed/files/roms/rom-1.zip/download</guid>
+  <pubDate>Wed, 12 Feb 2020 12:34:56 UT</pubDate>
+  <media:content filesize="600000000"><media:hash algo="md5">0123</media:hash></media:content>
+</item>
+</channel></rss>
+"""
+
+
+class SharedFeedA(SfCheck):
+    fullname = "Shared Feed A"
+    project_name = "shared-feed"
+    sub_path = "roms"
+
+class SharedFeedB(SharedFeedA):
+    fullname = "Shared Feed B"
+
+@pytest.fixture
+def feed_requests(monkeypatch) -> list:
+    """ 代替SourceForge返回RSS, 并记录请求的参数 """
+    requests_ = []
+
+    class _Response:
+        headers = CaseInsensitiveDict({"ETag": '"rss"'})
+        status_code = 200
+
+        @staticmethod
+        def iter_content(chunk_size):
+            for i in range(0, len(RSS), 100):
+                yield RSS[i:i+100]
+
+    @contextmanager
+    def _request_url_stream(url, **kwargs):
+        requests_.append(kwargs)
+        yield _Response()
+
+    monkeypatch.setattr(check_init, "_request_url_stream", _request_url_stream)
+    monkeypatch.setattr(main, "ENABLE_SENDMESSAGE", False)
+    yield requests_
+    SfCheck.clear_shared_feeds()
+
+def _check_cycle() -> list:
+    SfCheck.clear_shared_feeds()
+    assert SfCheck.prepare_shared_feeds([SharedFeedA, SharedFeedB]) == 1
+    return [main.check_one(cls) for cls in (SharedFeedA, SharedFeedB)]
+
+def test_shared_feed_is_fetched_once_per_cycle(feed_requests):
+    for is_success, cls_obj in _check_cycle():
+        assert is_success and cls_obj.info_dic["LATEST_VERSION"] == "rom-1.zip"
+    assert len(feed_requests) == 1
+    # 共享的RSS不发送条件请求
+    assert "headers" not in feed_requests[0]
+
+    # 内容没有变化时每个项目各自提前结束, 但第一个项目提前结束不会导致其他项目重新请求
+    results = _check_cycle()
+    assert [cls_obj.is_not_modified for _, cls_obj in results] == [True, True]
+    assert len(feed_requests) == 2
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import common
+from check_init import CheckUpdate
+
+
+class _BodyHandler(BaseHTTPRequestHandler):
+
+    BODY = b"0123456789" * 100000
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.BODY)))
+        self.end_headers()
+        try:
+            self.wfile.write(self.BODY)
+        except OSError:
+            # 客户端提前关闭了连接
+            pass
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def url(monkeypatch):
+    monkeypatch.setattr(common, "PROXIES", {})
+    # 每次只允许一个请求
+    monkeypatch.setattr(common, "HOST_THROTTLE", common.HostThrottle({"127.0.0.1": 1}, {}))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BodyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:%d/" % server.server_port
+    server.shutdown()
+
+def test_request_url_refuses_stream(url):
+    with pytest.raises(ValueError):
+        common.request_url(url, stream=True)
+
+def test_stream_holds_host_slot_and_session_until_closed(url):
+    common.SESSION_POOL.pop_stats()
+    chunks = CheckUpdate.iter_url_content(url, chunk_size=10)
+    assert next(chunks) == b"0123456789"
+
+    # 流式响应还没有关闭, 同一主机的其他请求需要等待
+    results = []
+    thread = threading.Thread(target=lambda: results.append(common.request_url(url).content))
+    thread.start()
+    thread.join(0.5)
+    assert thread.is_alive()
+
+    chunks.close()
+    thread.join(10)
+    assert results == [_BodyHandler.BODY]
+    # 提前停止迭代不算作请求失败, Session被正常归还
+    assert common.SESSION_POOL.pop_stats()["failed"] == 0
+
+def test_request_url_stream_closes_response(url):
+    with common.request_url_stream(url) as req:
+        assert req.raw.read(10) == b"0123456789"
+    assert req.raw.closed
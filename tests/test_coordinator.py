@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import time
+from collections import Counter
+
+from coordinator import HashRing, SqliteLeaseStore
+
+KEYS = ["Item%d" % i for i in range(2000)]
+
+
+def test_hash_ring_is_deterministic_and_balanced():
+    ring = HashRing(["node-b", "node-a", "node-c", "node-a"], virtual_nodes=64)
+    assert ring.nodes == ("node-a", "node-b", "node-c")
+    assignment = {key: ring.get_node(key) for key in KEYS}
+    assert assignment == {key: HashRing(["node-c", "node-b", "node-a"], 64).get_node(key) for key in KEYS}
+    counts = Counter(assignment.values())
+    assert set(counts) == {"node-a", "node-b", "node-c"}
+    assert min(counts.values()) > len(KEYS) / 3 * 0.6
+
+def test_hash_ring_only_moves_keys_of_changed_node():
+    before = HashRing(["node-a", "node-b", "node-c"])
+    after = HashRing(["node-a", "node-b", "node-c", "node-d"])
+    for key in KEYS:
+        # 新节点加入时, 只有分配给新节点的键发生了变化
+        if after.get_node(key) != before.get_node(key):
+            assert after.get_node(key) == "node-d"
+    removed = HashRing(["node-a", "node-c"])
+    for key in KEYS:
+        if before.get_node(key) != "node-b":
+            assert removed.get_node(key) == before.get_node(key)
+
+def test_empty_hash_ring():
+    assert HashRing([]).get_node("Item") is None
+
+def test_sqlite_lease_store_release():
+    store = SqliteLeaseStore()
+    now = time.time()
+    assert store.acquire("LeaseItem", "node-a", now + 180, now)
+    assert not store.acquire("LeaseItem", "node-b", now + 180, now)
+    # 只能释放本节点持有的租约
+    store.release("LeaseItem", "node-b")
+    assert store.is_held("LeaseItem", "node-a", now)
+    store.release("LeaseItem", "node-a")
+    assert not store.is_held("LeaseItem", "node-a", now)
+    # 释放之后其他节点可以立即接管
+    assert store.acquire("LeaseItem", "node-b", now + 180, now)
+    store.release("LeaseItem", "node-b")
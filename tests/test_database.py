@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import time
+
+from database import DatabaseSession, ItemLease, Saved, UpdateHistory, Validator, WriteBehindQueue
+
+
+def _row(name: str, version: str) -> dict:
+    row = dict.fromkeys(Saved().get_kv().keys())
+    row.update(ID=name, FULL_NAME=name, LATEST_VERSION=version)
+    return row
+
+def _set_lease(name: str, owner: str, expires: float):
+    with DatabaseSession() as session:
+        session.merge(ItemLease(ID=name, OWNER=owner, EXPIRES=expires))
+        session.commit()
+
+def test_write_behind_queue_upserts_and_keeps_last_write():
+    queue = WriteBehindQueue(max_size=100, max_delay=60)
+    queue.put_saved(_row("WbqUpsert", "1"), update_time=1.0)
+    queue.put_validators("WbqUpsert", {"u1": ("e1", None, "f1"), "u2": ("e2", None, None)})
+    assert queue.flush() == 4
+    assert Saved.get_saved_info("WbqUpsert").LATEST_VERSION == "1"
+
+    # 同一项目在一次写入之前多次写入时只保留最后一次, 已存在的数据被更新, 没有再次写入的验证器被删除
+    queue.put_saved(_row("WbqUpsert", "2"), update_time=2.0)
+    queue.put_saved(_row("WbqUpsert", "3"), update_time=3.0)
+    queue.put_validators("WbqUpsert", {"u1": ("e1-new", "lm", "f1-new")})
+    assert len(queue) == 4
+    queue.flush()
+    assert Saved.get_saved_info("WbqUpsert").LATEST_VERSION == "3"
+    assert UpdateHistory.get_update_times("WbqUpsert")["WbqUpsert"] == [1.0, 2.0, 3.0]
+    validators = Validator.get_validators("WbqUpsert")
+    assert list(validators) == ["u1"]
+    assert (validators["u1"].ETAG, validators["u1"].LAST_MODIFIED) == ("e1-new", "lm")
+
+def test_write_behind_queue_runs_callbacks_after_commit():
+    queue = WriteBehindQueue(max_size=100, max_delay=60)
+    seen = []
+    queue.put_saved(_row("WbqCallback", "1"))
+    queue.add_callback(lambda: seen.append(Saved.get_saved_info("WbqCallback").LATEST_VERSION), "WbqCallback")
+    assert seen == []
+    queue.flush()
+    queue.wait_callbacks()
+    assert seen == ["1"]
+
+def test_write_behind_queue_drops_items_whose_lease_was_lost():
+    now = time.time()
+    _set_lease("WbqHeld", "node-a", now + 60)
+    _set_lease("WbqTakenOver", "node-b", now + 60)
+    _set_lease("WbqExpired", "node-a", now - 1)
+    queue = WriteBehindQueue(max_size=100, max_delay=60)
+    seen = []
+    for name in ("WbqHeld", "WbqTakenOver", "WbqExpired"):
+        queue.put_saved(_row(name, "1"), lease_owner="node-a")
+        queue.put_validators(name, {"u": ("e", None, None)}, lease_owner="node-a")
+        queue.add_callback(lambda name=name: seen.append(name), name)
+    queue.add_callback(lambda: seen.append(None))
+    queue.flush()
+    queue.wait_callbacks()
+    assert seen == ["WbqHeld", None]
+    snapshot = Saved.get_saved_snapshot()
+    assert "WbqHeld" in snapshot
+    assert "WbqTakenOver" not in snapshot and "WbqExpired" not in snapshot
+    assert Validator.get_validators("WbqTakenOver") == {}
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import re
+
+import pytest
+
+from check_init import CheckUpdate
+from html_parser import LXML_BACKEND_AVAILABLE, selector_to_soup_strainer
+
+HTML = """
+<html><body>
+<div id="main" class="content wide">
+  <ol class="CommitLog x"><li>a</li></ol>
+  <ol class="CommitLog"><li>b</li></ol>
+  <ol class="CommitLogs"><li>c</li></ol>
+  <article data-id="1">first</article>
+</div>
+<article data-id="2">second</article>
+<a href="/x" rel="nofollow  noopener" class="">x</a>
+<table><tr><td headers="h1 h2" title="a b">cell</td></tr></table>
+</body></html>
+"""
+
+def _strain(selector: str) -> list:
+    """ 返回被保留的每个区域的文本 """
+    return [tag.get_text() for tag in CheckUpdate.get_bs(HTML, parse_only=selector, backend="bs4").children]
+
+@pytest.mark.parametrize("selector, expected", [
+    ("article", ["first", "second"]),
+    ("article[data-id='2']", ["second"]),
+    ("ol.CommitLog", ["a", "b"]),
+    (".CommitLog.x", ["a"]),
+])
+def test_soup_strainer_matches_like_css(selector, expected):
+    assert _strain(selector) == expected
+
+def test_soup_strainer_matches_class_tokens_of_multi_class_elements():
+    soup = CheckUpdate.get_bs(HTML, parse_only=".CommitLog", backend="bs4")
+    assert [ol["class"] for ol in soup.select("ol")] == [["CommitLog", "x"], ["CommitLog"]]
+    soup = CheckUpdate.get_bs(HTML, parse_only="div.wide#main", backend="bs4")
+    assert len(soup.select("#main > article")) == 1
+
+@pytest.mark.parametrize("selector", [
+    "#main > article", "div article", "a, b", "li:first-child", "", ".a[class=b]", "#a#b",
+])
+def test_soup_strainer_rejects_unsupported_selectors(selector):
+    with pytest.raises(ValueError):
+        selector_to_soup_strainer(selector)
+
+@pytest.mark.skipif(not LXML_BACKEND_AVAILABLE, reason="cssselect is not installed")
+@pytest.mark.parametrize("name, attrs", [
+    ("ol", None),
+    ("ol", {"class": "CommitLog"}),
+    ("ol", {"class": "x"}),
+    ("ol", {"class": "CommitLog x"}),
+    ("ol", {"class": "x CommitLog"}),
+    ("ol", {"class": ["x", "CommitLogs"]}),
+    ("ol", {"class": re.compile("Logs$")}),
+    ("div", {"class": "wide", "id": "main"}),
+    ("a", {"rel": "noopener"}),
+    ("a", {"class": ""}),
+    ("a", {"class": True}),
+    ("article", {"class": None}),
+    ("article", {"data-id": "2"}),
+    ("td", {"headers": "h2"}),
+    ("td", {"title": "a"}),
+])
+def test_lxml_backend_matches_bs4(name, attrs):
+    results = []
+    for backend in ("bs4", "lxml"):
+        doc = CheckUpdate.get_bs(HTML, backend=backend)
+        found = doc.find_all(name, attrs=attrs)
+        first = doc.find(name, attrs=attrs)
+        results.append((
+            [(tag.get_text(strip=True), tag.attrs) for tag in found],
+            None if first is None else first.attrs,
+        ))
+    assert results[0] == results[1]
+
+@pytest.mark.skipif(not LXML_BACKEND_AVAILABLE, reason="cssselect is not installed")
+def test_lxml_backend_returns_multi_valued_attributes_as_lists():
+    for backend in ("bs4", "lxml"):
+        doc = CheckUpdate.get_bs(HTML, backend=backend)
+        div, a, td = doc.select_one("#main"), doc.select_one("a"), doc.select_one("td")
+        assert (div["class"], div.get("class"), div["id"]) == (["content", "wide"], ["content", "wide"], "main")
+        assert (a["rel"], a["class"], a["href"]) == (["nofollow", "noopener"], [], "/x")
+        assert (td["headers"], td["title"]) == (["h1", "h2"], "a b")
+        assert div.get("missing", "default") == "default"
+        with pytest.raises(KeyError):
+            div["missing"]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import json
+
+import pytest
+
+from json_stream import iter_json_array
+
+
+DOCUMENT = json.dumps({
+    "skip": {"nested": [1, 2.5, "x]}", None]},
+    "os_list": [
+        {"name": "a", "size": 123},
+        -1.25e+3,
+        10,
+        "str with \\\" and ]",
+        True,
+        None,
+        [1, [2, {}]],
+        0,
+    ],
+    "tail": 1,
+})
+EXPECTED = json.loads(DOCUMENT)["os_list"]
+
+def _split(text: str, *offsets: int) -> list:
+    bounds = [0, *offsets, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+@pytest.mark.parametrize("offset", range(len(DOCUMENT) + 1))
+def test_split_at_every_offset(offset):
+    assert list(iter_json_array(_split(DOCUMENT, offset), path=("os_list", ))) == EXPECTED
+
+def test_one_char_chunks():
+    assert list(iter_json_array(DOCUMENT, path=("os_list", ))) == EXPECTED
+
+@pytest.mark.parametrize("text", ["[1.5, 2e3, -0]", "[12345]", "[true,false,null]", "[]", " [ ] "])
+def test_root_array_split_everywhere(text):
+    for offset in range(len(text) + 1):
+        assert list(iter_json_array(_split(text, offset))) == json.loads(text)
+
+def test_stops_reading_after_break():
+    read = []
+
+    def _chunks():
+        for chunk in _split(DOCUMENT, *range(8, len(DOCUMENT), 8)):
+            read.append(chunk)
+            yield chunk
+
+    assert next(iter(iter_json_array(_chunks(), path=("os_list", )))) == EXPECTED[0]
+    assert "".join(read) != DOCUMENT
+
+def test_missing_key():
+    with pytest.raises(KeyError):
+        list(iter_json_array(['{"a": [1]}'], path=("os_list", )))
+    with pytest.raises(KeyError):
+        list(iter_json_array(['{}'], path=("os_list", )))
+
+@pytest.mark.parametrize("text", ['[1, 2', '[1 2]', '{"os_list": 1}', '[1.]', '["abc'])
+def test_invalid_or_truncated(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array([text], path=("os_list", ) if text.startswith("{") else ()))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+from check_init import CheckUpdate
+from coordinator import Coordinator, SqliteLeaseStore
+from check_list import AckAndroid12510LTS, GoogleClangPrebuilt, RaspberryPi4EepromStable
+
+
+@pytest.mark.parametrize("cls", [AckAndroid12510LTS, GoogleClangPrebuilt, RaspberryPi4EepromStable])
+def test_throttled_hosts_stay_in_main_process(cls):
+    assert not main._can_run_in_subprocess(cls)
+
+def test_staggered_check_prefetches_releases_per_slice(monkeypatch):
+    check_list = [type("Staggered%d" % i, (), {}) for i in range(12)]
+    prefetch_calls = []
+    dispatched = []
+
+    def _prefetch_releases(items):
+        prefetch_calls.append(list(items))
+        return 0
+
+    def _check_one(cls):
+        dispatched.append(cls)
+        return True, None
+
+    monkeypatch.setattr(main.GithubReleases, "prefetch_releases", _prefetch_releases)
+    monkeypatch.setattr(main, "check_one", _check_one)
+    monkeypatch.setattr(main, "LOOP_CHECK_INTERVAL", 1)
+    monkeypatch.setattr(main, "STAGGERED_PREFETCH_SLICE", 0.25)
+    assert main.staggered_check(check_list) == ([], False)
+
+    # 每段只为该段内启动的项目预先获取, 每个项目都在启动之前被预先获取过一次
+    assert len(prefetch_calls) > 1
+    assert sorted(cls.__name__ for call in prefetch_calls for cls in call) == sorted(cls.__name__ for cls in check_list)
+    assert sorted(map(id, dispatched)) == sorted(map(id, check_list))
+
+def test_retry_check_logs_deferred_items_separately(monkeypatch):
+    recovered = type("RetryRecovered", (), {"request_host": None})
+    deferred = type("RetryDeferred", (), {"request_host": None})
+    logs = []
+
+    def _check_one(cls):
+        if cls is deferred:
+            main._DEFERRED_CHECKS.add(cls.__name__)
+            return False, None
+        return True, None
+
+    monkeypatch.setattr(main, "check_one", _check_one)
+    monkeypatch.setattr(main, "print_and_log", lambda text, **kwargs: logs.append(text))
+    monkeypatch.setattr(main, "RETRY_BASE_BACKOFF", 0.01)
+    monkeypatch.setattr(main, "RETRY_MAX_BACKOFF", 0.01)
+    try:
+        assert main.retry_check([recovered, deferred]) == ([], False)
+    finally:
+        main._DEFERRED_CHECKS.discard(deferred.__name__)
+    assert sorted(logs) == [
+        "RetryDeferred: deferred to next cycle after 1 attempts",
+        "RetryRecovered: recovered after 1 attempts",
+    ]
+
+def test_log_stats_reports_deferred_checks_of_the_whole_window(monkeypatch):
+    logs = []
+    monkeypatch.setattr(main, "print_and_log", lambda text, **kwargs: logs.append(text))
+    main._log_stats({"DeferredB", "DeferredA"})
+    assert any(text.endswith("items deferred to the next check: {DeferredA, DeferredB}") for text in logs)
+
+class LeasedItem(CheckUpdate):
+    fullname = "Leased Item"
+
+    def do_check(self):
+        self.update_info("LATEST_VERSION", "1")
+
+@pytest.fixture
+def coordinator(monkeypatch):
+    coordinator = Coordinator(SqliteLeaseStore(), "test-node")
+    coordinator.heartbeat()
+    monkeypatch.setattr(main, "get_active_coordinator", lambda: coordinator)
+    monkeypatch.setattr(main, "ENABLE_SENDMESSAGE", False)
+    yield coordinator
+    coordinator.store.remove_node(coordinator.node_id)
+
+def test_check_one_releases_item_lease(coordinator):
+    assert main.check_one(LeasedItem)[0] is True
+    assert not coordinator.holds(LeasedItem.__name__)
+
+def test_multi_process_check_acquires_lease_before_dispatch(coordinator, monkeypatch):
+    held_at_submit = []
+
+    class _Pool(ThreadPoolExecutor):
+        def submit(self, fn, cls, *args):
+            held_at_submit.append(coordinator.holds(cls.__name__))
+            return super().submit(fn, cls, *args)
+
+    with _Pool(1) as pool:
+        monkeypatch.setattr(main, "_get_process_pool", lambda: pool)
+        monkeypatch.setattr(main, "_can_run_in_subprocess", lambda cls: True)
+        assert main.multi_process_check([LeasedItem]) == ([], False)
+    assert held_at_submit == [True]
+    assert not coordinator.holds(LeasedItem.__name__)
+
+def test_multi_process_check_skips_items_leased_by_other_nodes(coordinator, monkeypatch):
+    now = time.time()
+    coordinator.store.acquire(LeasedItem.__name__, "other-node", now + 60, now)
+    class _Pool:
+        def submit(self, *args):
+            pytest.fail("Items leased by other nodes should not be dispatched")
+
+    monkeypatch.setattr(main, "_get_process_pool", _Pool)
+    monkeypatch.setattr(main, "_can_run_in_subprocess", lambda cls: True)
+    try:
+        assert main.multi_process_check([LeasedItem]) == ([], False)
+    finally:
+        coordinator.store.release(LeasedItem.__name__, "other-node")
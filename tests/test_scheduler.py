@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+import scheduler
+from scheduler import CheckInterval, CheckScheduler, compute_check_interval
+
+
+def _item(name: str, check_interval: int) -> type:
+    return type(name, (), {"check_interval": check_interval})
+
+def test_new_items_are_due_immediately_and_pop_in_order():
+    items = [_item("SchedulerA%d" % i, 3600) for i in range(3)]
+    check_scheduler = CheckScheduler(items, retry_interval=600)
+    assert len(check_scheduler) == 3
+    now = check_scheduler.get_next_check_time()
+    assert check_scheduler.pop_due(now - 1) == []
+    assert check_scheduler.pop_due(now + 1, limit=2) == items[:2]
+    assert check_scheduler.pop_due(now + 1) == items[2:]
+    assert check_scheduler.get_next_check_time() is None
+
+def test_reschedule_uses_check_interval_and_retry_interval():
+    ok, failed = _item("SchedulerOk", 3600), _item("SchedulerFailed", 3600)
+    check_scheduler = CheckScheduler([ok, failed], retry_interval=600)
+    check_scheduler.pop_due(float("inf"))
+    assert check_scheduler.reschedule(ok, True, now=1000) == 4600
+    assert check_scheduler.reschedule(failed, False, now=1000) == 1600
+    assert check_scheduler.pop_due(2000) == [failed]
+    assert check_scheduler.pop_due(5000) == [ok]
+
+    # 下次检查的时间保存在数据库中, 重新创建调度器之后仍然有效
+    check_scheduler = CheckScheduler([ok, failed])
+    assert check_scheduler.pop_due(1599) == []
+    assert check_scheduler.pop_due(4600) == [failed, ok]
+
+def test_postpone_delays_due_items_only():
+    early, late = _item("SchedulerEarly", 100), _item("SchedulerLate", 10000)
+    check_scheduler = CheckScheduler([early, late], retry_interval=600)
+    check_scheduler.pop_due(float("inf"))
+    check_scheduler.reschedule(early, True, now=0)
+    check_scheduler.reschedule(late, True, now=0)
+    check_scheduler.postpone(500)
+    assert check_scheduler.get_next_check_time() == 500
+    assert check_scheduler.pop_due(500) == [early]
+    assert check_scheduler.get_next_check_time() == 10000
+
+def test_compute_check_interval_falls_back_to_static_interval(monkeypatch):
+    item = _item("IntervalStatic", 7200)
+    # 3次更新只有2个更新间隔, 少于ADAPTIVE_INTERVAL_MIN_SAMPLES
+    assert compute_check_interval(item, [0, 86400, 172800], 172800) == CheckInterval(7200, False, 2, None)
+    monkeypatch.setattr(scheduler, "ENABLE_ADAPTIVE_INTERVAL", False)
+    days = [i * 86400 for i in range(10)]
+    assert compute_check_interval(item, days, days[-1]) == CheckInterval(7200, False, 9, None)
+
+def test_compute_check_interval_uses_median_gap():
+    item = _item("IntervalAdaptive", 7200)
+    # 更新间隔为1, 1, 10天, 中位数为1天
+    update_times = [0, 86400, 172800, 1036800]
+    interval = compute_check_interval(item, update_times, update_times[-1])
+    assert interval == CheckInterval(int(86400 * scheduler.ADAPTIVE_INTERVAL_FACTOR), True, 3, 86400)
+
+def test_compute_check_interval_backs_off_for_inactive_items():
+    item = _item("IntervalInactive", 7200)
+    update_times = [0, 3600, 7200, 10800]
+    # 距离上次更新已经过了30天, 以此代替典型的更新间隔, 但不超过ADAPTIVE_INTERVAL_MAX
+    interval = compute_check_interval(item, update_times, update_times[-1] + 30 * 86400)
+    assert interval.typical_gap == 30 * 86400
+    assert interval.interval == scheduler.ADAPTIVE_INTERVAL_MAX
+    # 更新很频繁时也不低于ADAPTIVE_INTERVAL_MIN
+    assert compute_check_interval(item, update_times, update_times[-1]).interval == scheduler.ADAPTIVE_INTERVAL_MIN
+
+def test_compute_check_interval_only_uses_recent_history():
+    item = _item("IntervalHistory", 7200)
+    # 早期频繁更新, 最近的ADAPTIVE_INTERVAL_HISTORY_SIZE个更新间隔都是2天
+    recent = [i * 2 * 86400 for i in range(1, scheduler.ADAPTIVE_INTERVAL_HISTORY_SIZE + 2)]
+    update_times = [i * 60 for i in range(50)] + [50 * 60 + t for t in recent]
+    interval = compute_check_interval(item, update_times, update_times[-1])
+    assert (interval.samples, interval.typical_gap) == (scheduler.ADAPTIVE_INTERVAL_HISTORY_SIZE, 2 * 86400)
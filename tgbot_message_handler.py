@@ -68,6 +68,9 @@ def _check(message):
 
     rt += "\n\n*Result:* "
     rc, check_update_obj = check_one(check_item_name, disable_pagecache=True)
+    if rc is None:
+        _edit_message(m, rt + "Skipped, this item is checked by another node.")
+        return
     if not rc:
         rt += "Check failed!"
         if ENABLE_LOGGER: